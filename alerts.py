@@ -0,0 +1,337 @@
+"""
+تنبيهات الطلبات القائمة: عند حفظ عرض جديد يُقارن بالطلبات التي قد تطابقه، ويصل إشعار
+إلى صندوق وارد مسوق كل طلب مطابق (جدول notification).
+
+بدلاً من مقارنة العرض بكل الطلبات، يحتفظ كل عامل بفهرس مقلوب في الذاكرة:
+المفتاح (كلمة من نوع الوحدة، شريحة السعر، شريحة المساحة) ← أرقام الطلبات.
+الشرائح لوغاريتمية (كل شريحة أكبر من سابقتها بنسبة BUCKET_RATIO)، والطلب يُسجل في كل
+الشرائح التي يغطيها مداه (price_min - price_max) موسعاً بالسماحية، أو في شريحة None إذا
+لم يحدده أو كان مفتوحاً ("أقل من 500").
+العرض يبحث في شريحة سعره وشريحة مساحته (وNone) فقط، ثم يُقيّم المرشحون دفعة واحدة
+بمصفوفات NumPy (matching.score_orders) ولا يُنبه إلا من تجاوزت درجته ALERT_MIN_SCORE.
+
+الطلب الذي يحفظ العرض لا يطابق شيئاً: تُضاف مهمة check_offers (jobs.py) في نفس معاملته،
+فالفهرس يعيش في عامل المهام (flask worker، أو خيط JOBS_INLINE).
+
+تحديث الفهرس:
+- يُبنى من جدول orders عند أول مهمة فحص في العامل (أو flask alerts-rebuild).
+- تغييرات الطلبات في نفس العامل تُطبق من أحداث SQLAlchemy بعد نجاح commit.
+- تغييرات العمال الآخرين تُلتقط من entity_change (history.py) قبل كل فحص: استعلام واحد
+  على الفهرس (entity_type, timestamp) لآخر ALERT_CATCH_UP_OVERLAP ثانية.
+- القفل يحمي الفهرس في الذاكرة فقط؛ الاستعلامات وكتابة الإشعارات خارجه.
+"""
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+import numpy as np
+from flask import has_request_context, url_for
+from sqlalchemy import event, insert, or_, select
+
+import jobs
+import matching
+from extensions import db
+from models import EntityChange, Employee, Notification, Orders, RentalOffer, SaleOffer
+from search import normalize_arabic, tokenize
+
+BUCKET_RATIO = 1.25
+
+NEW_OFFERS_KEY = 'alerts_new_offers'
+ORDER_CHANGES_KEY = 'alerts_order_changes'
+
+OFFER_KINDS = {RentalOffer: 'rental', SaleOffer: 'sale'}
+ORDER_COLUMNS = (Orders.id, Orders.unit_type, Orders.price_min, Orders.price_max, Orders.area_min, Orders.area_max,
+                 Orders.location, Orders.marketer, Orders.customer_name)
+
+_config = {'min_score': 0.7, 'price_tolerance': 0.25, 'area_tolerance': 0.3, 'catch_up_overlap': 300}
+_lock = threading.Lock()
+
+
+def _bucket(value):
+    return math.floor(math.log(value, BUCKET_RATIO))
+
+
+def _buckets(bounds, tolerance):
+    """شرائح المدى [low*(1-t), high*(1+t)]، أو [None] لمدى غير محدد أو مفتوح ("أقل من 500")"""
+    if bounds is None or bounds[0] <= 0 or bounds[1] == math.inf:
+        return [None]
+    low, high = bounds
+    return list(range(_bucket(low * (1 - tolerance)), _bucket(high * (1 + tolerance)) + 1))
+
+
+def _unit_tokens(unit_type):
+    """كلمات نوع الوحدة بدون "ال" ("الشقة" = "شقة")"""
+    tokens = {t[2:] if t.startswith('ال') and len(t) > 4 else t for t in tokenize(unit_type)}
+    return tokens or {None}
+
+
+class OrderIndex:
+    """فهرس مقلوب للطلبات: (كلمة، شريحة سعر، شريحة مساحة) ← أرقام الطلبات"""
+
+    def __init__(self, price_tolerance, area_tolerance):
+        self.price_tolerance = price_tolerance
+        self.area_tolerance = area_tolerance
+        self.orders = {}
+        self.buckets = defaultdict(set)
+
+    def __len__(self):
+        return len(self.orders)
+
+    def put(self, order_id, unit_type, price_min, price_max, area_min, area_max, location, marketer, customer_name):
+        self.remove(order_id)
+        target = matching.make_target((price_min, price_max), (area_min, area_max), unit_type, location)
+        keys = [
+            (token, p, a)
+            for token in _unit_tokens(unit_type)
+            for p in _buckets(target['price'], self.price_tolerance)
+            for a in _buckets(target['area'], self.area_tolerance)
+        ]
+        for key in keys:
+            self.buckets[key].add(order_id)
+        self.orders[order_id] = {'target': target, 'marketer': marketer, 'customer_name': customer_name, 'keys': keys}
+
+    def remove(self, order_id):
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            bucket = self.buckets[key]
+            bucket.discard(order_id)
+            if not bucket:
+                del self.buckets[key]
+
+    def candidates(self, unit_type, price, area):
+        """الطلبات التي قد تطابق عرضاً (قبل التقييم)"""
+        price, area = (v if v and v > 0 else None for v in (price, area))
+        prices = [None] if price is None else [_bucket(price), None]
+        areas = [None] if area is None else [_bucket(area), None]
+        found = set()
+        for token in _unit_tokens(unit_type) | {None}:
+            for p in prices:
+                for a in areas:
+                    found |= self.buckets.get((token, p, a), set())
+        return found
+
+    def matches(self, offer, min_score):
+        """[(رقم الطلب، الدرجة)] للطلبات التي تطابق العرض بدرجة min_score أو أكثر"""
+        ids = list(self.candidates(offer['unit_type'], offer['price'], offer['area']))
+        if not ids:
+            return []
+        targets = [self.orders[order_id]['target'] for order_id in ids]
+        price, area = (v if v and v > 0 else None for v in (offer['price'], offer['area']))
+        # كل المرشحين دفعة واحدة بمصفوفات NumPy (matching.score_orders) بدلاً من تقييم كل طلب وحده
+        scores = matching.score_orders(
+            price, area, normalize_arabic(offer['unit_type']).strip(),
+            normalize_arabic(f"{offer['location']} {offer['district']}"),
+            _bound_arrays(t['price'] for t in targets), _bound_arrays(t['area'] for t in targets),
+            np.array([t['unit_type'] for t in targets], dtype=str), [t['location_tokens'] for t in targets],
+        )
+        return [(ids[i], float(scores[i])) for i in np.argsort(-scores, kind='stable') if scores[i] >= min_score]
+
+
+def _bound_arrays(bounds):
+    """مصفوفات (الأدنى، الأعلى، غير محدد) من مديات الطلبات في الفهرس بالصيغة التي تستعملها score_orders"""
+    bounds = list(bounds)
+    lows = np.array([b[0] if b is not None else np.nan for b in bounds], dtype=float)
+    highs = np.array([b[1] if b is not None else np.nan for b in bounds], dtype=float)
+    return lows, highs, np.isnan(lows)
+
+
+_state = {'index': None, 'since': None, 'seen': {}}
+
+
+def _load(connection):
+    """فهرس جديد من كل الطلبات، مع وقت بدء البناء: ما تغير بعده يُلتقط في _catch_up"""
+    since = datetime.utcnow()
+    index = OrderIndex(_config['price_tolerance'], _config['area_tolerance'])
+    for row in connection.execute(select(*ORDER_COLUMNS)):
+        index.put(*row)
+    return index, since
+
+
+def _catch_up():
+    """
+    تطبيق تغييرات الطلبات التي سجلها عمال آخرون منذ آخر فحص.
+    تُقرأ بالوقت لا برقم التغيير: الرقم يُحجز عند الإدراج، فمعاملة أبطأ قد تُكمل commit برقم
+    أصغر من آخر رقم قُرئ وتُتخطى. النافذة تبدأ قبل آخر تغيير بـ catch_up_overlap ثانية (تغطي
+    المدة بين flush وcommit واختلاف ساعات العمال)، وما طُبق منها سابقاً يُتخطى برقمه (seen).
+    """
+    overlap = timedelta(seconds=_config['catch_up_overlap'])
+    with _lock:
+        since, seen = _state['since'], set(_state['seen'])
+
+    rows = db.session.execute(
+        select(EntityChange.id, EntityChange.entity_id, EntityChange.timestamp)
+        .where(EntityChange.entity_type == 'orders', EntityChange.timestamp >= since - overlap)
+    ).all()
+    rows = [row for row in rows if row[0] not in seen]
+    ids = {entity_id for _, entity_id, _ in rows}
+    current = {}
+    if ids:
+        current = {row[0]: row for row in db.session.execute(select(*ORDER_COLUMNS).where(Orders.id.in_(ids)))}
+
+    with _lock:
+        index, seen = _state['index'], _state['seen']
+        for order_id in ids:
+            if order_id in current:
+                index.put(*current[order_id])
+            else:
+                index.remove(order_id)
+        for change_id, _, timestamp in rows:
+            seen[change_id] = timestamp
+        if rows:
+            _state['since'] = max(_state['since'], max(timestamp for _, _, timestamp in rows))
+        horizon = _state['since'] - overlap
+        for change_id in [change_id for change_id, timestamp in seen.items() if timestamp < horizon]:
+            del seen[change_id]
+
+
+def _install(index, since):
+    with _lock:
+        _state.update(index=index, since=since, seen={})
+
+
+def rebuild():
+    with db.engine.connect() as connection:
+        index, since = _load(connection)
+    _install(index, since)
+    return len(index)
+
+
+# ================== الإشعارات ==================
+def _offer_link(offer):
+    if not has_request_context():
+        return None
+    endpoint = 'rental_offer_detail' if offer['kind'] == 'rental' else 'sales_offer_detail'
+    return url_for(endpoint, district=offer['district'], offer_id=offer['id'])
+
+
+def _matches(offers):
+    """[(المسوق، اسم العميل، العرض، الدرجة)] لكل طلب يطابق أحد العروض؛ قراءة الفهرس فقط"""
+    index = _state['index']
+    rows = []
+    for offer in offers:
+        for order_id, score in index.matches(offer, _config['min_score']):
+            entry = index.orders[order_id]
+            if entry['marketer']:
+                rows.append((entry['marketer'], entry['customer_name'], offer, score))
+    return rows
+
+
+def _notifications(rows):
+    if not rows:
+        return []
+
+    # المسوق في الطلب نص حر: يُطابق باسم الموظف أو اسم المستخدم
+    recipients = {}
+    marketers = {marketer for marketer, *_ in rows}
+    for employee_id, name, username in db.session.execute(
+        select(Employee.id, Employee.name, Employee.username)
+        .where(or_(Employee.name.in_(marketers), Employee.username.in_(marketers)))
+    ):
+        recipients.setdefault(username, employee_id)
+        recipients.setdefault(name, employee_id)
+
+    notifications = []
+    for marketer, customer_name, offer, score in rows:
+        employee_id = recipients.get(marketer)
+        if employee_id is None:
+            continue
+        kind = 'إيجار' if offer['kind'] == 'rental' else 'بيع'
+        notifications.append({
+            'employee_id': employee_id,
+            'message': (
+                f"عرض {kind} جديد ({offer['unit_type']}، {offer['district']}) "
+                f"يطابق طلب {customer_name} بنسبة {round(score * 100)}%"
+            )[:500],
+            'link': offer['link'],
+        })
+    return notifications
+
+
+def check_offers(offers):
+    """مقارنة عروض جديدة بالطلبات وإضافة الإشعارات إلى المعاملة الحالية؛ يرجع عددها"""
+    if _state['index'] is None:
+        rebuild()
+    _catch_up()
+    with _lock:
+        rows = _matches(offers)
+    notifications = _notifications(rows)
+    if notifications:
+        db.session.execute(insert(Notification), notifications)
+    return len(notifications)
+
+
+@jobs.task('check_offers', max_attempts=3)
+def check_offers_job(offers):
+    check_offers(offers)
+
+
+# ================== أحداث SQLAlchemy ==================
+def _offer_snapshot(kind, offer):
+    # الكائنات تنتهي صلاحيتها بعد commit؛ تُنسخ القيم هنا، والرابط أيضاً لأن الفحص يتم
+    # لاحقاً في عامل المهام خارج سياق الطلب
+    snapshot = {
+        'kind': kind, 'id': offer.id, 'unit_type': offer.unit_type, 'price': offer.price,
+        'area': offer.area, 'district': offer.district, 'location': offer.location,
+    }
+    snapshot['link'] = _offer_link(snapshot)
+    return snapshot
+
+
+def _after_flush(session, flush_context):
+    for obj in session.new:
+        kind = OFFER_KINDS.get(type(obj))
+        if kind is not None:
+            session.info.setdefault(NEW_OFFERS_KEY, []).append(_offer_snapshot(kind, obj))
+        elif isinstance(obj, Orders):
+            session.info.setdefault(ORDER_CHANGES_KEY, {})[obj.id] = tuple(getattr(obj, c.key) for c in ORDER_COLUMNS)
+    for obj in session.dirty:
+        if isinstance(obj, Orders):
+            session.info.setdefault(ORDER_CHANGES_KEY, {})[obj.id] = tuple(getattr(obj, c.key) for c in ORDER_COLUMNS)
+    for obj in session.deleted:
+        if isinstance(obj, Orders):
+            session.info.setdefault(ORDER_CHANGES_KEY, {})[obj.id] = None
+
+
+def _before_commit(session):
+    # العروض الجديدة تُلتقط في after_flush؛ flush هنا حتى تُضاف مهمة فحصها في نفس المعاملة
+    session.flush()
+    offers = session.info.pop(NEW_OFFERS_KEY, None)
+    if offers:
+        jobs.enqueue('check_offers', offers=offers)
+
+
+def _after_commit(session):
+    changes = session.info.pop(ORDER_CHANGES_KEY, None)
+    if changes and _state['index'] is not None:
+        with _lock:
+            for order_id, row in changes.items():
+                if row is None:
+                    _state['index'].remove(order_id)
+                else:
+                    _state['index'].put(*row)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(NEW_OFFERS_KEY, None)
+    session.info.pop(ORDER_CHANGES_KEY, None)
+
+
+def init_app(app):
+    _config['min_score'] = app.config['ALERT_MIN_SCORE'] / 100
+    _config['price_tolerance'] = app.config['MATCH_PRICE_TOLERANCE']
+    _config['area_tolerance'] = app.config['MATCH_AREA_TOLERANCE']
+    _config['catch_up_overlap'] = app.config['ALERT_CATCH_UP_OVERLAP']
+
+    event.listen(db.session, 'after_flush', _after_flush)
+    event.listen(db.session, 'before_commit', _before_commit)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_soft_rollback', _after_rollback)
+
+    @app.cli.command('alerts-rebuild')
+    def alerts_rebuild_command():
+        """بناء فهرس تنبيهات الطلبات والتحقق من حجمه"""
+        click.echo(f"✅ {rebuild()} طلب في الفهرس")
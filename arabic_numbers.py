@@ -0,0 +1,66 @@
+"""
+قراءة الأرقام كما يكتبها الموظفون في حقلي المساحة والمبلغ للطلبات:
+الأرقام العربية (٠-٩) والفارسية (۰-۹)، فواصل الآلاف (, ٬ ، وكذلك النقطة إذا قسمت الرقم
+إلى مجموعات من ثلاثة: "1.500.000")، الفاصلة العشرية (٫ أو النقطة: "1.5 مليون")،
+الكلمات "ألف" و"مليون"، والمدى ("200-300"، "من ٢٠٠ إلى ٣٠٠"، "أقل من 500").
+
+parse_range يرجع (الأدنى، الأعلى)؛ رقم واحد يعطي أدنى = أعلى، و"أقل من" / "أكثر من"
+تترك أحد الطرفين None.
+"""
+import re
+
+_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+_WORDS = r'ألف|الف|آلاف|الاف|مليون|ملايين'
+# رقم مقسم بفواصل آلاف: 1,500 / ١٬٥٠٠ / 1،500 / 1.500.000 (النقطة تُكتب فاصلة آلاف أيضاً)
+_GROUPED = re.compile(r'(?<![\d.,٬،])(\d{1,3})((?:[.,٬،]\d{3})+)(?!\d)(\s*(?:' + _WORDS + r'))?')
+# وحدات تُكتب بجانب الرقم ("120 م2"، "500 ريال")؛ تُحذف حتى لا يُقرأ 2 في م2 رقماً
+_UNITS = re.compile(r'م\s*[2²]|متر\s*مربع|متر|ريال|ر\.س|m2|sar', re.IGNORECASE)
+_NUMBER = re.compile(r'(\d+(?:\.\d+)?)\s*(' + _WORDS + r')?')
+_MULTIPLIERS = {'ألف': 1e3, 'الف': 1e3, 'آلاف': 1e3, 'الاف': 1e3, 'مليون': 1e6, 'ملايين': 1e6}
+_AT_MOST = re.compile(r'(أقل|اقل|حتى|لا يزيد|بحد أقصى|بحد اقصى|الى حد|max)')
+_AT_LEAST = re.compile(r'(أكثر|اكثر|فوق|من فوق|لا يقل|بحد أدنى|بحد ادنى|min|\+)')
+
+
+def _ungroup(match):
+    head, groups, word = match.group(1), match.group(2), match.group(3) or ''
+    # نقطة واحدة قبل "ألف" / "مليون" أو بعد صفر عشرية: "2.750 مليون"، "0.500"
+    if groups[0] == '.' and len(groups) == 4 and (word or head == '0'):
+        return match.group()
+    return head + re.sub(r'\D', '', groups) + word
+
+
+def normalize_digits(value):
+    """الأرقام العربية إلى 0-9 وحذف فواصل الآلاف؛ الفاصلة العشرية العربية (٫) تصبح نقطة"""
+    text = _GROUPED.sub(_ungroup, str(value or '').translate(_DIGITS))
+    return text.replace('٫', '.')
+
+
+def _numbers(value):
+    text = _UNITS.sub(' ', normalize_digits(value))
+    found = [(float(n), _MULTIPLIERS.get(word)) for n, word in _NUMBER.findall(text)]
+    if not found:
+        return []
+    # "80-100 ألف": الكلمة بعد آخر رقم تنطبق على ما قبله إذا لم يكن له كلمته
+    trailing = found[-1][1]
+    return [n * (m or trailing or 1) for n, m in found]
+
+
+def parse_number(value):
+    """أول رقم في النص أو None"""
+    numbers = _numbers(value)
+    return numbers[0] if numbers else None
+
+
+def parse_range(value):
+    """(الأدنى، الأعلى) من نص حر؛ (None, None) إذا لم يوجد رقم"""
+    numbers = _numbers(value)
+    if not numbers:
+        return None, None
+    if len(numbers) >= 2:
+        return min(numbers[:2]), max(numbers[:2])
+    text = str(value)
+    if _AT_MOST.search(text):
+        return None, numbers[0]
+    if _AT_LEAST.search(text):
+        return numbers[0], None
+    return numbers[0], numbers[0]
@@ -0,0 +1,134 @@
+"""
+سجل النشاطات (جدول log) داخل نفس معاملة التعديل.
+
+add_log في main.py لا يعمل commit، بل يضيف السطر إلى session.info، ويُكتب
+في حدث before_commit ضمن نفس المعاملة، فكل عملية تكلف commit واحداً بدلاً من اثنين،
+ولا يُسجل نشاط لتعديل أُلغي (rollback).
+
+الوضع المؤجل (AUDIT_BUFFERED): بعد نجاح المعاملة تُجمع الأسطر في ذاكرة العامل،
+وتُكتب دفعة واحدة (insert واحد لعدة أسطر) مع أول commit لاحق عندما يصل عددها إلى
+AUDIT_BATCH_SIZE أو يمر AUDIT_FLUSH_INTERVAL ثانية على أقدمها، وعند إيقاف العامل.
+الثمن: قد يضيع آخر دفعة إذا توقف العامل فجأة، وتتأخر الأسطر قليلاً في صفحة السجل.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, insert
+
+from extensions import db
+from models import Log
+
+PENDING_KEY = 'pending_audit'
+FLUSHING_KEY = 'flushing_audit'
+
+_config = {'buffered': False, 'batch_size': 50, 'flush_interval': 5.0}
+_buffer = []
+_buffer_since = None
+_lock = threading.Lock()
+
+
+def record(user, action):
+    """إضافة سطر إلى المعاملة الحالية؛ يُكتب مع commit التالي"""
+    session = db.session()
+    if not session.in_transaction():
+        # بدون معاملة لا يُطلق rollback أي حدث، فيبقى السطر ويُكتب مع commit لاحق
+        session.begin()
+    session.info.setdefault(PENDING_KEY, []).append({
+        'user': user,
+        'action': (action or '')[:500],
+        'timestamp': datetime.utcnow(),
+    })
+
+
+def _take_due_batch():
+    """أسطر الذاكرة إذا حان وقت كتابتها، وإلا قائمة فارغة"""
+    global _buffer, _buffer_since
+    with _lock:
+        if not _buffer:
+            return []
+        due = (
+            len(_buffer) >= _config['batch_size']
+            or time.monotonic() - _buffer_since >= _config['flush_interval']
+        )
+        if not due:
+            return []
+        batch, _buffer, _buffer_since = _buffer, [], None
+        return batch
+
+
+def _return_to_buffer(rows):
+    global _buffer, _buffer_since
+    with _lock:
+        _buffer = rows + _buffer
+        if _buffer_since is None:
+            _buffer_since = time.monotonic()
+
+
+def _before_commit(session):
+    if not _config['buffered']:
+        rows = session.info.pop(PENDING_KEY, None)
+        if rows:
+            session.execute(insert(Log), rows)
+        return
+
+    batch = _take_due_batch()
+    if batch:
+        session.info[FLUSHING_KEY] = batch
+        session.execute(insert(Log), batch)
+
+
+def _after_commit(session):
+    session.info.pop(FLUSHING_KEY, None)
+    rows = session.info.pop(PENDING_KEY, None)
+    if rows and _config['buffered']:
+        global _buffer_since
+        with _lock:
+            _buffer.extend(rows)
+            if _buffer_since is None:
+                _buffer_since = time.monotonic()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    batch = session.info.pop(FLUSHING_KEY, None)
+    if batch:
+        _return_to_buffer(batch)  # أسطر معاملات سابقة ناجحة، لا تُلغى مع هذه المعاملة
+
+
+def flush():
+    """كتابة كل أسطر الذاكرة الآن في معاملة مستقلة"""
+    global _buffer, _buffer_since
+    with _lock:
+        batch, _buffer, _buffer_since = _buffer, [], None
+    if not batch:
+        return 0
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(insert(Log), batch)
+    except Exception:
+        _return_to_buffer(batch)  # تُكتب مع commit لاحق أو المحاولة التالية
+        raise
+    return len(batch)
+
+
+def _flush_at_exit(app):
+    try:
+        with app.app_context():
+            flush()
+    except Exception as e:
+        print(f"Error flushing audit log: {e}")
+
+
+def init_app(app):
+    _config['buffered'] = app.config['AUDIT_BUFFERED']
+    _config['batch_size'] = app.config['AUDIT_BATCH_SIZE']
+    _config['flush_interval'] = app.config['AUDIT_FLUSH_INTERVAL']
+
+    event.listen(db.session, 'before_commit', _before_commit)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_soft_rollback', _after_rollback)
+
+    if _config['buffered']:
+        atexit.register(_flush_at_exit, app)
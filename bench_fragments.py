@@ -0,0 +1,60 @@
+"""
+قياس زمن عرض قائمة العروض مع ذاكرة الصفوف (fragment_cache.py):
+أول عرض (كل الصفوف تُولد)، ثم عرض متكرر (كل الصفوف من الذاكرة)،
+ثم عرض بعد تعديل 5% من العروض (تُولد الصفوف المعدلة فقط).
+
+الاستخدام:
+    python bench_fragments.py [عدد_الصفوف] [عدد_التكرارات]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import render_template
+from flask_login import login_user
+
+import main
+from main import app, AVAILABLE_PERMISSIONS
+from models import Employee, RentalOffer
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+
+def render_list(offers):
+    start = time.perf_counter()
+    render_template('rental_offers/list.html', offers=offers, page=None, district='وسط', district_name='وسط')
+    return (time.perf_counter() - start) * 1000
+
+
+def main_():
+    user = Employee(id=1, name='bench', role='bench', username='bench', password='-')
+    user.set_permissions([p for p, _ in AVAILABLE_PERMISSIONS])
+
+    now = datetime.utcnow()
+    offers = [
+        RentalOffer(id=i, unit_type='شقة', floor='1', area=120, price=50000 + i, details='-',
+                    owner_type='مالك', location='الرياض حي النخيل', marketer='مسوق', notes='', status='متاح',
+                    district='وسط', images=[], created_at=now, updated_at=now)
+        for i in range(ROWS)
+    ]
+
+    with app.test_request_context('/rentalm_offers'):
+        login_user(user)
+        cold, warm, partial = [], [], []
+        for run in range(RUNS):
+            main.fragment_cache.clear()
+            cold.append(render_list(offers))
+            warm.append(render_list(offers))
+            for offer in offers[::20]:
+                offer.updated_at = now + timedelta(seconds=run + 1)
+            partial.append(render_list(offers))
+
+    print(f"صفوف: {ROWS}، تكرارات: {RUNS}")
+    print(f"بدون ذاكرة (أول عرض): {sum(cold) / RUNS:.2f} ms")
+    print(f"كل الصفوف من الذاكرة: {sum(warm) / RUNS:.2f} ms")
+    print(f"بعد تعديل 5% من العروض: {sum(partial) / RUNS:.2f} ms")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,69 @@
+"""
+قياس زمن تقييم المرشحين في matching.py: مصفوفات NumPy مقابل حلقة Python لكل عرض،
+على عروض عشوائية (بدون قاعدة بيانات).
+
+الاستخدام:
+    python bench_matching.py [عدد_العروض] [عدد_التكرارات]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+import matching
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+UNIT_TYPES = ['شقه', 'شقه مفروشه', 'فيلا', 'دور', 'ارض', 'محل', 'عماره']
+DISTRICTS = ['وسط', 'جنوب']
+PLACES = ['النخيل', 'الياسمين', 'الملقا', 'العليا', 'السليمانيه', 'الروضه', 'الشفا', 'العزيزيه']
+
+
+def python_score(rows, target):
+    """نفس الحساب صفاً صفاً"""
+    tolerance_price, tolerance_area = matching._config['price_tolerance'], matching._config['area_tolerance']
+    (price_low, price_high), (area_low, area_high) = target['price'], target['area']
+    scores = []
+    for price, area, unit_type, location in rows:
+        s = 0.4 * max(0.0, 1 - max(price_low - price, 0) / (price_low * tolerance_price)
+                      - max(price - price_high, 0) / (price_high * tolerance_price))
+        s += 0.25 * max(0.0, 1 - max(area_low - area, 0) / (area_low * tolerance_area)
+                        - max(area - area_high, 0) / (area_high * tolerance_area))
+        s += 0.2 * (1.0 if unit_type == target['unit_type'] else 0.6 if target['unit_type'] in unit_type else 0.0)
+        s += 0.15 * float(any(t in location for t in target['location_tokens']))
+        scores.append(s)
+    return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:10]
+
+
+def main():
+    random.seed(1)
+    rows = [
+        (random.uniform(20000, 200000), random.uniform(60, 600), random.choice(UNIT_TYPES),
+         f"{random.choice(PLACES)} {random.choice(DISTRICTS)}")
+        for _ in range(ROWS)
+    ]
+    target = matching.make_target((70000, 90000), (150, 150), 'شقة', 'النخيل، الملقا')
+    prices = np.array([r[0] for r in rows])
+    areas = np.array([r[1] for r in rows])
+    unit_types = np.array([r[2] for r in rows])
+    locations = np.array([r[3] for r in rows])
+
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        matching.top_k(matching.score(prices, areas, unit_types, locations, target), 10)
+    vectorized = (time.perf_counter() - start) * 1000 / RUNS
+
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        python_score(rows, target)
+    loop = (time.perf_counter() - start) * 1000 / RUNS
+
+    print(f"عروض: {ROWS}، تكرارات: {RUNS}")
+    print(f"NumPy: {vectorized:.2f} ms")
+    print(f"حلقة Python: {loop:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
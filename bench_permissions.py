@@ -0,0 +1,79 @@
+"""
+قياس زمن عرض قائمة من 1000 عرض مع فحص الصلاحيات القديم (json.loads في كل استدعاء)
+والجديد (frozenset يُفك مرة واحدة لكل طلب).
+
+يقيس أيضاً نمط الاستدعاء القديم للقالب (فحصان لكل صف + قائمة التنقل) بمعزل عن Jinja.
+
+الاستخدام:
+    python bench_permissions.py [عدد_الصفوف] [عدد_التكرارات]
+"""
+import sys
+import time
+from datetime import datetime
+
+from flask import render_template
+from flask_login import login_user
+
+from main import app, AVAILABLE_PERMISSIONS
+from models import Employee, RentalOffer
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+
+def legacy_has_permission(self, perm):
+    """الطريقة السابقة: فك JSON في كل فحص"""
+    return str(perm) in self.get_permissions()
+
+
+def check_pattern(user, rows):
+    """نفس عدد الفحوص التي كان القالب القديم يجريها: فحصان لكل صف + 12 في base.html"""
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        for _ in range(rows):
+            user.has_permission('rentalm_offers_edit')
+            user.has_permission('rentalm_offers_delete')
+        for _ in range(12):
+            user.has_permission('orders_view')
+    return (time.perf_counter() - start) * 1000 / RUNS
+
+
+def render_list(offers):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        render_template('rental_offers/list.html', offers=offers, page=None,
+                        district='وسط', district_name='وسط')
+    return (time.perf_counter() - start) * 1000 / RUNS
+
+
+def main():
+    user = Employee(id=1, name='bench', role='bench', username='bench', password='-')
+    user.set_permissions([p for p, _ in AVAILABLE_PERMISSIONS])
+
+    offers = [
+        RentalOffer(id=i, unit_type='شقة', floor='1', area=120, price=50000 + i, details='-',
+                    owner_type='مالك', location='الرياض', marketer='مسوق', notes='', status='متاح',
+                    district='وسط', images=[], created_at=datetime.utcnow())
+        for i in range(ROWS)
+    ]
+
+    with app.test_request_context('/rentalm_offers'):
+        login_user(user)
+
+        current = Employee.has_permission
+        Employee.has_permission = legacy_has_permission
+        try:
+            legacy_checks = check_pattern(user, ROWS)
+            legacy_render = render_list(offers)
+        finally:
+            Employee.has_permission = current
+        cached_checks = check_pattern(user, ROWS)
+        cached_render = render_list(offers)
+
+    print(f"صفوف: {ROWS}، تكرارات: {RUNS}")
+    print(f"فحوص القالب القديم   json.loads: {legacy_checks:.2f} ms   frozenset: {cached_checks:.2f} ms")
+    print(f"عرض القالب الحالي    json.loads: {legacy_render:.2f} ms   frozenset: {cached_render:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+قياس أداء استعلامات المسارات الساخنة وعرض خطة التنفيذ لكل منها.
+
+الاستخدام: شغّل السكربت قبل ترحيل الفهارس وبعده وقارن النتائج
+    python bench_queries.py            # قبل
+    flask db upgrade
+    python bench_queries.py            # بعد
+"""
+import sys
+import time
+
+from sqlalchemy import select, text
+
+from main import app, db
+from models import RentalOffer, SaleOffer, Orders, Log
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def hot_queries():
+    """الاستعلامات كما تنفذها مسارات القوائم"""
+    queries = []
+    for model in (RentalOffer, SaleOffer):
+        name = model.__tablename__
+        queries.append((
+            f"{name}: district + created_at",
+            select(model).where(model.district == 'وسط')
+            .order_by(model.created_at.desc(), model.id.desc()).limit(50),
+        ))
+        queries.append((
+            f"{name}: district + status + price",
+            select(model).where(model.district == 'وسط', model.status == 'متاح',
+                                model.price.between(0, 1_000_000))
+            .order_by(model.created_at.desc(), model.id.desc()).limit(50),
+        ))
+    queries.append(("orders: created_at", select(Orders).order_by(Orders.created_at.desc()).limit(50)))
+    queries.append(("log: timestamp", select(Log).order_by(Log.timestamp.desc()).limit(100)))
+    return queries
+
+
+def explain(conn, sql):
+    if conn.dialect.name == 'postgresql':
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).fetchall()
+        return [r[0] for r in rows]
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return [str(r[-1]) for r in rows]
+
+
+def main():
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for label, stmt in hot_queries():
+                sql = str(stmt.compile(conn, compile_kwargs={"literal_binds": True}))
+                start = time.perf_counter()
+                for _ in range(RUNS):
+                    conn.execute(stmt).fetchall()
+                avg_ms = (time.perf_counter() - start) * 1000 / RUNS
+
+                print(f"== {label}  ({avg_ms:.2f} ms / استعلام)")
+                for line in explain(conn, sql):
+                    print(f"   {line}")
+                print()
+
+
+if __name__ == "__main__":
+    main()
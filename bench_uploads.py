@@ -0,0 +1,52 @@
+"""
+قياس زمن رفع صور عرض واحد بدون شبكة باستخدام التخزين في الذاكرة
+مع زمن استجابة مصطنع لكل ملف (يحاكي رحلة S3).
+
+الاستخدام:
+    python bench_uploads.py [عدد_الصور] [زمن_كل_رفع_بالثواني]
+"""
+import io
+import sys
+import time
+
+from werkzeug.datastructures import FileStorage, MultiDict
+
+from main import app, upload_images, save_file
+from storage import MemoryStorage
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+
+def make_files():
+    return MultiDict({
+        # محتوى مختلف لكل ملف حتى لا يتخطى منع التكرار (image_refs) رفعها
+        f'image{i}': FileStorage(io.BytesIO(bytes([i]) * 200_000), filename=f'photo{i}.jpg', content_type='image/jpeg')
+        for i in range(1, FILES + 1)
+    })
+
+
+def main():
+    with app.test_request_context():
+        app.extensions['storage'] = MemoryStorage(latency=LATENCY)
+
+        files = make_files()
+        start = time.perf_counter()
+        for i in range(1, FILES + 1):
+            save_file(files.get(f'image{i}'))
+        serial_ms = (time.perf_counter() - start) * 1000
+
+        # تشغيل مجمع عمليات معالجة الصور (spawn) قبل القياس
+        upload_images(MultiDict({'image1': FileStorage(io.BytesIO(b'warmup'), filename='warmup.jpg')}))
+
+        start = time.perf_counter()
+        urls, _variants, failed = upload_images(make_files())
+        parallel_ms = (time.perf_counter() - start) * 1000
+
+    print(f"صور: {FILES}، زمن كل رفع: {LATENCY * 1000:.0f} ms")
+    print(f"بالتتابع : {serial_ms:.0f} ms")
+    print(f"بالتوازي : {parallel_ms:.0f} ms  (نجح {len(urls)}، فشل {len(failed)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+عدادات لوحة التحكم.
+
+بدلاً من ستة استعلامات COUNT(*) في كل طلب لـ "/" تُحفظ الأعداد في صف واحد
+من جدول dashboard_stats، وتُحدّث داخل نفس المعاملة عبر أحداث SQLAlchemy
+(after_insert / after_delete / after_update). المطابقة مع COUNT(*) تصحح أي انحراف
+(مثلاً تعديلات مباشرة على قاعدة البيانات)، وتعمل كمهمة دورية في عامل المهام
+كل COUNTERS_RECONCILE_SECONDS أو يدوياً بـ flask reconcile-counters.
+"""
+from datetime import datetime
+
+import click
+from sqlalchemy import event, func, inspect, select
+
+import jobs
+from extensions import db
+from models import DashboardStats, Employee, RentalOffer, SaleOffer, Orders
+
+STATS_ID = 1
+DISTRICT_CODES = {'وسط': 'm', 'جنوب': 'w'}
+
+
+def _counter_for(target, district=None):
+    """اسم عمود العداد الذي يخص السجل، أو None إذا لم يكن له عداد"""
+    if isinstance(target, Employee):
+        return 'employees_count'
+    if isinstance(target, Orders):
+        return 'orders_count'
+    code = DISTRICT_CODES.get(district)
+    if code is None:
+        return None
+    prefix = 'rental' if isinstance(target, RentalOffer) else 'sales'
+    return f"{prefix}{code}_offers_count"
+
+
+def _bump(connection, column, delta):
+    if column is None:
+        return
+    table = DashboardStats.__table__
+    connection.execute(
+        table.update().where(table.c.id == STATS_ID).values({column: table.c[column] + delta})
+    )
+
+
+def _after_insert(mapper, connection, target):
+    _bump(connection, _counter_for(target, getattr(target, 'district', None)), 1)
+
+
+def _after_delete(mapper, connection, target):
+    _bump(connection, _counter_for(target, getattr(target, 'district', None)), -1)
+
+
+def _after_update(mapper, connection, target):
+    # العرض ينتقل بين العدادات فقط إذا تغيرت منطقته
+    history = inspect(target).attrs.district.history
+    if not history.has_changes():
+        return
+    old = history.deleted[0] if history.deleted else None
+    _bump(connection, _counter_for(target, old), -1)
+    _bump(connection, _counter_for(target, target.district), 1)
+
+
+def _count(model, *conditions):
+    return select(func.count()).select_from(model).where(*conditions).scalar_subquery()
+
+
+def reconcile():
+    """
+    إعادة حساب العدادات من الجداول الأصلية بجملة UPDATE واحدة، فلا يضيع _bump متزامن
+    بين قراءة العدد وكتابته.
+    """
+    table = DashboardStats.__table__
+    counts = {
+        'employees_count': _count(Employee),
+        'rentalm_offers_count': _count(RentalOffer, RentalOffer.district == 'وسط'),
+        'rentalw_offers_count': _count(RentalOffer, RentalOffer.district == 'جنوب'),
+        'salesm_offers_count': _count(SaleOffer, SaleOffer.district == 'وسط'),
+        'salesw_offers_count': _count(SaleOffer, SaleOffer.district == 'جنوب'),
+        'orders_count': _count(Orders),
+        'reconciled_at': datetime.utcnow(),
+    }
+    update = table.update().where(table.c.id == STATS_ID).values(counts)
+    if not db.session.execute(update).rowcount:
+        # قاعدة جديدة بدون الصف (الترحيل c5b054c830ea ينشئه)
+        db.session.execute(table.insert().values(id=STATS_ID))
+        db.session.execute(update)
+    db.session.commit()
+    return db.session.get(DashboardStats, STATS_ID, populate_existing=True)
+
+
+@jobs.task('reconcile_counters', max_attempts=1)
+def reconcile_job():
+    reconcile()
+
+
+def get_stats():
+    """قراءة العدادات بمفتاح أساسي واحد؛ المطابقة لا تتم هنا بل في عامل المهام"""
+    stats = db.session.get(DashboardStats, STATS_ID)
+    if stats is None:
+        stats = reconcile()
+    return stats
+
+
+def init_app(app):
+    jobs.periodic('reconcile_counters', app.config['COUNTERS_RECONCILE_SECONDS'])
+    for model in (Employee, RentalOffer, SaleOffer, Orders):
+        event.listen(model, 'after_insert', _after_insert)
+        event.listen(model, 'after_delete', _after_delete)
+    for model in (RentalOffer, SaleOffer):
+        event.listen(model, 'after_update', _after_update)
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """مطابقة عدادات لوحة التحكم مع الجداول"""
+        stats = reconcile()
+        click.echo(f"✅ تمت المطابقة: {stats.reconciled_at:%Y-%m-%d %H:%M:%S}")
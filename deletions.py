@@ -0,0 +1,58 @@
+"""
+حذف ملفات الصور بعد نجاح المعاملة وبدفعات.
+
+remove_files في main.py لا يحذف مباشرة، بل يضيف مهمة delete_files إلى طابور المهام
+(jobs.py) داخل نفس المعاملة:
+- إذا نجح commit يحذف عامل المهام (flask worker) المفاتيح بطلب delete_objects واحد لكل 1000 مفتاح.
+- إذا أُلغيت المعاملة تُلغى المهمة معها، فلا تُحذف صور عرض لم يُحذف فعلاً.
+
+المحاولات المتكررة مع الانتظار المتزايد يتولاها الطابور، وما يفشل بعد DELETE_MAX_ATTEMPTS
+يُسجل في جدول failed_deletion.
+"""
+import click
+from flask import current_app
+
+import image_refs
+import jobs
+from extensions import db
+from models import FailedDeletion
+from storage import get_storage
+
+
+def schedule(keys):
+    """تأجيل حذف المفاتيح حتى تنجح المعاملة الحالية"""
+    if keys:
+        jobs.enqueue('delete_files', max_attempts=current_app.config['DELETE_MAX_ATTEMPTS'], keys=list(keys))
+
+
+def dead_letter(error, keys):
+    for key in keys:
+        db.session.add(FailedDeletion(key=key, error=(error or '')[:500], attempts=current_app.config['DELETE_MAX_ATTEMPTS']))
+
+
+@jobs.task('delete_files', on_failure=dead_letter)
+def delete_files(keys):
+    # صورة رُفعت من جديد بنفس المحتوى بين الجدولة والحذف لا تُحذف
+    referenced = image_refs.still_referenced(keys)
+    failed = get_storage().delete([key for key in keys if key not in referenced])
+    if failed:
+        # المحاولة التالية والتسجيل في failed_deletion للمفاتيح التي فشلت فقط (Errors من delete_objects)
+        raise jobs.PartialFailure(f"Failed to delete {len(failed)} of {len(keys)} files", keys=list(failed))
+
+
+def init_app(app):
+    @app.cli.command('retry-deletions')
+    def retry_deletions_command():
+        """إعادة محاولة حذف الملفات المسجلة في failed_deletion"""
+        rows = FailedDeletion.query.all()
+        # مفتاح عاد عرض للإشارة إليه (رُفع من جديد) يُزال من القائمة دون حذف الملف
+        referenced = image_refs.still_referenced([row.key for row in rows])
+        keys = [row.key for row in rows if row.key not in referenced]
+        failed = set(get_storage().delete(keys)) if keys else set()
+        for row in rows:
+            if row.key in failed:
+                row.attempts += 1
+            else:
+                db.session.delete(row)
+        db.session.commit()
+        click.echo(f"✅ حُذف {len(rows) - len(failed)}، وبقي {len(failed)}")
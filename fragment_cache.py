@@ -0,0 +1,120 @@
+"""
+ذاكرة مؤقتة لأجزاء HTML المولدة (صفوف جداول العروض).
+
+كل صف يُولد مرة واحدة لكل (القالب، العرض، updated_at، بصمة الصلاحيات) ويُحفظ في LRU
+محدود داخل العامل، فعند تحديث القائمة لا يُعاد توليد إلا الصفوف التي تغيرت.
+تعديل العرض يغير updated_at فيتغير المفتاح تلقائياً ولا حاجة للإبطال.
+
+FRAGMENT_CACHE_URL (اختياري) يضيف Redis مشتركاً بين العمال خلف الـ LRU المحلي.
+
+المفتاح يبدأ بـ APP_VERSION حتى لا تُستخدم صفوف مولدة بقالب قديم بعد النشر؛ إذا لم يُضبط
+(تشغيل محلي، Replit) تُستخدم بصمة نص القالب نفسه (template_version).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # Redis اختياري: بدونه تبقى الذاكرة محلية لكل عامل
+    redis = None
+
+
+class RedisBackend:
+    def __init__(self, url, ttl=86400, prefix='fragment:'):
+        if redis is None:
+            raise RuntimeError("FRAGMENT_CACHE_URL requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl)
+
+
+class FragmentCache:
+    def __init__(self, max_size=5000, backend=None):
+        self.max_size = max_size
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception as e:
+                print(f"Fragment cache backend error: {e}")
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._remember(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value)
+            except Exception as e:
+                print(f"Fragment cache backend error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+_template_versions = {}
+_template_versions_lock = threading.Lock()
+
+
+def _mtime(filename):
+    try:
+        return os.path.getmtime(filename) if filename else None
+    except OSError:
+        return None
+
+
+def template_version(env, name):
+    """
+    بصمة نص القالب (sha1)، تُعاد قراءتها فقط إذا تغير وقت تعديل الملف.
+    بصمة المحتوى وليس وقت التعديل، حتى تتفق العمال على نفس المفاتيح في Redis المشترك.
+    """
+    with _template_versions_lock:
+        cached = _template_versions.get(name)
+    if cached and _mtime(cached[0]) == cached[1]:
+        return cached[2]
+    source, filename, _ = env.loader.get_source(env, name)
+    mtime = _mtime(filename)
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    with _template_versions_lock:
+        _template_versions[name] = (filename, mtime, digest)
+    return digest
+
+
+def create_fragment_cache(config):
+    url = config.get('FRAGMENT_CACHE_URL')
+    backend = RedisBackend(url, ttl=config.get('FRAGMENT_CACHE_TTL', 86400)) if url else None
+    return FragmentCache(max_size=config.get('FRAGMENT_CACHE_SIZE', 5000), backend=backend)
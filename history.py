@@ -0,0 +1,113 @@
+"""
+سجل تغييرات منظم لكل عرض / طلب / موظف (جدول entity_change).
+
+بدلاً من البحث بـ LIKE في نص log.action، يُسجل كل إدراج وتعديل وحذف تلقائياً من
+تاريخ خصائص SQLAlchemy (attribute history) في حدث after_flush، داخل نفس المعاملة:
+(entity_type, entity_id, operation, changes) حيث changes = {الحقل: [القديم، الجديد]}.
+
+الفهرس (entity_type, entity_id, timestamp) يجعل تاريخ عرض واحد بحثاً مباشراً في الفهرس.
+"""
+from datetime import date, datetime
+
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event, inspect, insert
+
+from extensions import db
+from models import EntityChange, Employee, RentalOffer, SaleOffer, Orders
+
+TRACKED = {
+    RentalOffer: 'rental_offer',
+    SaleOffer: 'sale_offer',
+    Orders: 'orders',
+    Employee: 'employee',
+}
+
+# حقول لا تُسجل (تتغير مع كل حفظ أو مشتقة من حقول أخرى)
+IGNORED = {'id', 'created_at', 'updated_at', 'image_variants', 'auth_version',
+           'area_min', 'area_max', 'price_min', 'price_max', 'phone_normalized'}
+# حقول يُسجل تغيرها دون قيمتها
+MASKED = {'password'}
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_value(v) for v in value]
+    return value
+
+
+def _columns(obj):
+    return [attr for attr in inspect(obj).mapper.column_attrs if attr.key not in IGNORED]
+
+
+def _changes(obj, operation):
+    state = inspect(obj)
+    changes = {}
+    for attr in _columns(obj):
+        history = state.attrs[attr.key].history
+        if operation == 'insert':
+            old, new = None, getattr(obj, attr.key)
+            if new is None:
+                continue
+        elif operation == 'delete':
+            old, new = getattr(obj, attr.key), None
+        else:
+            if not history.has_changes():
+                continue
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old == new:
+                continue
+        if attr.key in MASKED:
+            old, new = ('***' if old else None), ('***' if new else None)
+        changes[attr.key] = [_value(old), _value(new)]
+    return changes
+
+
+def _current_username():
+    if has_request_context() and current_user and current_user.is_authenticated:
+        return current_user.username
+    return None
+
+
+def _after_flush(session, flush_context):
+    rows = []
+    now = datetime.utcnow()
+    user = None
+    for objects, operation in ((session.new, 'insert'), (session.dirty, 'update'), (session.deleted, 'delete')):
+        for obj in objects:
+            entity_type = TRACKED.get(type(obj))
+            if entity_type is None:
+                continue
+            changes = _changes(obj, operation)
+            if operation == 'update' and not changes:
+                continue
+            if user is None:
+                user = _current_username()
+            rows.append({
+                'entity_type': entity_type,
+                'entity_id': obj.id,
+                'operation': operation,
+                'changes': changes,
+                'user': user,
+                'timestamp': now,
+            })
+    if rows:
+        session.connection().execute(insert(EntityChange), rows)
+
+
+def for_entity(obj, limit=50):
+    """آخر تغييرات سجل واحد، من الأحدث"""
+    return (
+        EntityChange.query
+        .filter_by(entity_type=TRACKED[type(obj)], entity_id=obj.id)
+        .order_by(EntityChange.timestamp.desc(), EntityChange.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def init_app(app):
+    event.listen(db.session, 'after_flush', _after_flush)
@@ -0,0 +1,67 @@
+"""
+طلبات GET الشرطية (ETag / 304) لصفحات القوائم والتفاصيل.
+
+الموظفون يحدّثون صفحات العروض باستمرار؛ بدلاً من تحميل الأسطر وتوليد القالب في كل مرة
+يحسب المسار أولاً "مُعرّف نسخة" رخيصاً من قاعدة البيانات (مثلاً max(updated_at) وعدد الأسطر
+للمنطقة)، ويُضاف إليه بصمة صلاحيات المستخدم. إذا أرسل المتصفح نفس ETag في If-None-Match
+يُرجع 304 مباشرة دون تنفيذ المسار.
+
+If-Modified-Since وحده لا يكفي لأن حذف عرض لا يغير max(updated_at)، لذلك Last-Modified
+يُرسل للمعلومة فقط والقرار يعتمد على ETag.
+"""
+import hashlib
+import os
+from functools import wraps
+
+from flask import request, session, make_response
+from flask_login import current_user
+
+# يتغير مع كل نشر حتى لا تُستخدم صفحات مولدة بقوالب قديمة
+APP_VERSION = os.environ.get("APP_VERSION") or os.environ.get("RENDER_GIT_COMMIT", "")
+
+
+def user_fingerprint():
+    """المستخدم وصلاحياته: نفس البيانات تظهر بشكل مختلف لمن لا يملك صلاحية التعديل أو الحذف"""
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    permissions = ','.join(sorted(current_user.get_permission_set()))
+    return f"{current_user.id}:{getattr(current_user, 'auth_version', 0)}:{permissions}"
+
+
+def make_etag(*parts):
+    raw = '|'.join(str(p) for p in (APP_VERSION, user_fingerprint()) + parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional(validator):
+    """
+    مزخرف للمسار: validator(**view_args) يرجع (قيم النسخة، آخر تعديل أو None)،
+    أو None إذا تعذر حسابها (مثلاً سجل غير موجود) فيُنفذ المسار كالمعتاد.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # رسائل flash تُعرض مرة واحدة؛ صفحة 304 ستخفيها
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            version = validator(**kwargs)
+            if version is None:
+                return f(*args, **kwargs)
+            parts, last_modified = version
+            etag = make_etag(request.full_path, *parts)
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            # الصفحة خاصة بالمستخدم، ويجب التحقق منها مع كل طلب
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
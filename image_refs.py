@@ -0,0 +1,108 @@
+"""
+تخزين الصور بعنوان محتواها (SHA-256) مع عداد مراجع.
+
+- اسم الملف في التخزين هو بصمة المحتوى، فنفس الصورة المرفوعة لعدة عروض تُخزن مرة واحدة
+  ويُتخطى رفعها (PUT) إذا كانت موجودة في جدول stored_object.
+- كل عرض يشير إلى الصورة يزيد refcount، وremove_files ينقصه، ولا يُحذف الملف من التخزين
+  إلا عندما يصل العداد إلى صفر.
+- الملفات القديمة (قبل هذا النظام) غير مسجلة في الجدول فتُحذف مباشرة كما كانت.
+- الرفع المباشر من المتصفح يمر بنفس المسار في مهمة process_direct_uploads بعد التأكيد، ومفتاحه المؤقت يُسجل بـ variant='staged'
+  حتى لا يُؤكد رمز الرفع مرتين.
+"""
+import hashlib
+import io
+from collections import Counter
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+from models import StoredObject
+
+CHUNK_SIZE = 64 * 1024
+
+
+def hash_stream(stream):
+    """قراءة الملف على دفعات مع حساب SHA-256؛ يرجع (البصمة، المحتوى)"""
+    digest = hashlib.sha256()
+    buf = io.BytesIO()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        buf.write(chunk)
+    return digest.hexdigest(), buf.getvalue()
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_existing(storage, hashes):
+    """الصور المخزنة مسبقاً: {البصمة: (رابط الصورة، {'thumb': ..., 'medium': ...} أو None)}"""
+    if not hashes:
+        return {}
+    rows = StoredObject.query.filter(StoredObject.content_hash.in_(set(hashes)), StoredObject.refcount > 0).all()
+    found = {}
+    for row in rows:
+        url, variants = found.get(row.content_hash, (None, {}))
+        if row.variant == 'original':
+            url = storage.url_for_key(row.key)
+        else:
+            variants[row.variant] = storage.url_for_key(row.key)
+        found[row.content_hash] = (url, variants)
+    return {h: (url, variants or None) for h, (url, variants) in found.items() if url}
+
+
+def _insert():
+    return (postgresql if db.engine.dialect.name == 'postgresql' else sqlite).insert(StoredObject.__table__)
+
+
+def add_refs(storage, content_hash, url, variants):
+    """زيادة عداد كل ملفات الصورة (الأصل والنسخ) بمقدار واحد، مع الإنشاء إذا لم توجد"""
+    entries = [('original', url)] + list((variants or {}).items())
+    table = StoredObject.__table__
+    for variant, variant_url in entries:
+        stmt = _insert().values(
+            key=storage.key_from_url(variant_url), content_hash=content_hash, variant=variant, refcount=1,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'], set_={'refcount': table.c.refcount + 1},
+        )
+        db.session.execute(stmt)
+
+
+def claim_staged(key):
+    """
+    تسجيل ملف رُفع مباشرة (مفتاح مؤقت) كمستهلك عند تأكيده؛ يرجع False إذا أُكد من قبل.
+    الصف يبقى بعداد صفر علامةً على أن رمز الرفع استُخدم، ولا يظهر في find_existing.
+    """
+    stmt = _insert().values(key=key, content_hash='', variant='staged', refcount=0)
+    return db.session.execute(stmt.on_conflict_do_nothing(index_elements=['key'])).rowcount == 1
+
+
+def release(keys):
+    """
+    إنقاص عداد المفاتيح، ويرجع المفاتيح التي يجب حذفها فعلاً من التخزين:
+    ما وصل عداده إلى صفر + ما ليس مسجلاً أصلاً.
+    """
+    counts = Counter(keys)
+    if not counts:
+        return []
+    tracked = {row.key: row for row in StoredObject.query.filter(StoredObject.key.in_(list(counts))).all()}
+    for key, row in tracked.items():
+        # تعبير SQL حتى يكون الإنقاص ذرياً مع الطلبات المتزامنة
+        row.refcount = StoredObject.refcount - counts[key]
+    db.session.flush()
+
+    to_delete = [key for key in counts if key not in tracked]
+    for key, row in tracked.items():
+        if row.refcount <= 0:
+            db.session.delete(row)
+            to_delete.append(key)
+    return to_delete
+
+
+def still_referenced(keys):
+    """المفاتيح التي عاد عرض جديد للإشارة إليها بعد جدولة حذفها (يستخدمها خيط الحذف)"""
+    if not keys:
+        return set()
+    rows = db.session.query(StoredObject.key).filter(StoredObject.key.in_(keys), StoredObject.refcount > 0)
+    return {key for key, in rows}
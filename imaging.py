@@ -0,0 +1,73 @@
+"""
+تحسين الصور عند الرفع: إزالة بيانات EXIF، تصغير الأبعاد، إعادة الترميز (WebP أو JPEG)
+وإنتاج نسخة مصغرة (thumb) ومتوسطة (medium) لكل صورة.
+
+الدوال هنا لا تستورد Flask ولا التطبيق لأنها تعمل داخل مجمع عمليات (spawn)؛
+استيراد main في كل عملية سيكون مكلفاً.
+"""
+import io
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow اختياري: بدونه تُرفع الصورة الأصلية فقط
+    Image = None
+
+VARIANTS = ('thumb', 'medium')
+
+
+def available():
+    return Image is not None
+
+
+# بداية ملفات JPEG / PNG / GIF / WebP للتحقق بدون Pillow
+_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n', b'GIF87a', b'GIF89a')
+
+
+def is_image(data):
+    """هل المحتوى صورة سليمة؟ (بدون Pillow يُفحص توقيع بداية الملف فقط)"""
+    if Image is None:
+        return data.startswith(_SIGNATURES) or (data[:4] == b'RIFF' and data[8:12] == b'WEBP')
+    try:
+        Image.open(io.BytesIO(data)).verify()
+        return True
+    except Exception:
+        return False
+
+
+def _encode(img, fmt, quality):
+    buf = io.BytesIO()
+    if fmt == 'WEBP':
+        img.save(buf, 'WEBP', quality=quality, method=4)
+    else:
+        img.convert('RGB').save(buf, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def optimize_image(data, max_dimension=2048, thumb_size=200, medium_size=800, quality=82):
+    """
+    يرجع قاموساً {'original'|'thumb'|'medium': (bytes, content_type, ext)}،
+    أو None إذا لم يمكن فتح الصورة (تُرفع كما هي عندها).
+    """
+    if Image is None:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        if getattr(img, 'is_animated', False):
+            return None  # GIF متحرك: لا نفقد الحركة
+        img = ImageOps.exif_transpose(img)  # تطبيق الدوران ثم إسقاط EXIF عند الحفظ
+        img.load()
+    except Exception:
+        return None
+
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+    fmt = 'WEBP' if features.check('webp') else 'JPEG'
+    content_type, ext = ('image/webp', 'webp') if fmt == 'WEBP' else ('image/jpeg', 'jpg')
+
+    result = {}
+    for name, size in (('original', max_dimension), ('medium', medium_size), ('thumb', thumb_size)):
+        variant = img.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        result[name] = (_encode(variant, fmt, quality), content_type, ext)
+    return result
@@ -0,0 +1,298 @@
+"""
+طابور مهام في قاعدة البيانات يعالجه أمر منفصل: flask worker
+
+- enqueue يضيف صفاً في جدول job داخل معاملة الطلب الحالية، فلا تُنفذ المهمة
+  إلا إذا نجح الحفظ، ويعود الطلب مباشرة دون انتظار S3 أو غيره.
+- العامل يحجز دفعة مهام بـ SELECT ... FOR UPDATE SKIP LOCKED في PostgreSQL،
+  وفي SQLite (بدون SKIP LOCKED) يكفي شرط UPDATE على الحالة حتى لا يحجز عاملان نفس المهمة.
+- المهمة المحجوزة لها مهلة (visibility timeout)؛ إذا مات العامل قبل إنهائها تعود قابلة للحجز.
+- الفشل يعيد المهمة للطابور بانتظار متزايد، وبعد max_attempts تبقى بحالة failed.
+
+تسجيل مهمة:
+
+    @jobs.task('delete_files')
+    def delete_files(keys):
+        ...
+
+    jobs.enqueue('delete_files', keys=[...])
+
+المهام الدورية (jobs.periodic) يضيفها العامل نفسه إلى الطابور: مهمة معلقة واحدة لكل منها،
+تُستحق بعد المدة المحددة من آخر تنفيذ.
+
+بدون عامل منفصل (Replit مثلاً) JOBS_INLINE=true يشغل المهام في خيط داخل عامل الويب:
+بعد كل commit أضاف مهام، وكل JOBS_INLINE_INTERVAL ثانية مع الطلبات للمهام المؤجلة والدورية.
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask import request
+from sqlalchemy import event, func, or_, and_
+
+from extensions import db
+from models import Job
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+ENQUEUED_KEY = 'jobs_enqueued'
+
+_tasks = {}
+_periodic = {}
+_inline = {'app': None, 'running': False, 'last_run': 0.0}
+_inline_lock = threading.Lock()
+
+
+class PartialFailure(Exception):
+    """
+    ترفعها المهمة عند نجاح جزئي: المحاولة التالية وon_failure يعملان على payload
+    الجديد فقط (مثلاً المفاتيح التي فشل حذفها) بدلاً من payload الأصلي كاملاً.
+    """
+
+    def __init__(self, message, **payload):
+        super().__init__(message)
+        self.payload = payload
+
+
+def task(name, max_attempts=5, on_failure=None):
+    """
+    تسجيل دالة كمهمة باسم name.
+    on_failure(error, **payload) يُستدعى مرة واحدة عندما تفشل المهمة نهائياً.
+    """
+    def decorator(f):
+        _tasks[name] = (f, max_attempts, on_failure)
+        return f
+    return decorator
+
+
+def enqueue(name, delay=0, max_attempts=None, **payload):
+    """إضافة مهمة إلى الجلسة الحالية؛ تُحفظ مع commit الطلب"""
+    if name not in _tasks:
+        raise KeyError(f"Unknown job: {name}")
+    job = Job(
+        name=name,
+        payload=payload,
+        status=QUEUED,
+        attempts=0,
+        max_attempts=max_attempts or _tasks[name][1],
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    db.session.info[ENQUEUED_KEY] = True
+    return job
+
+
+def periodic(name, interval):
+    """تشغيل المهمة name (بدون معاملات) كل interval ثانية من عامل المهام"""
+    _periodic[name] = interval
+
+
+def schedule_periodic():
+    """إضافة المهام الدورية غير الموجودة في الطابور، مستحقة بعد مدتها من آخر تنفيذ"""
+    if not _periodic:
+        return
+    pending = {
+        name for name, in
+        db.session.query(Job.name).filter(Job.name.in_(_periodic), Job.status.in_((QUEUED, RUNNING)))
+    }
+    now = datetime.utcnow()
+    for name, interval in _periodic.items():
+        if name in pending:
+            continue
+        last = db.session.query(func.max(Job.finished_at)).filter(Job.name == name).scalar()
+        delay = 0 if last is None else max(0, interval - (now - last).total_seconds())
+        enqueue(name, delay=delay)
+    db.session.commit()
+
+
+def _claimable(now):
+    return or_(
+        and_(Job.status == QUEUED, Job.run_at <= now),
+        and_(Job.status == RUNNING, Job.locked_until < now),  # عامل مات أو تجاوز المهلة
+    )
+
+
+def claim(worker_id, batch_size, visibility_timeout):
+    """حجز حتى batch_size مهمة مستحقة لهذا العامل"""
+    now = datetime.utcnow()
+    ids = [
+        row.id for row in
+        db.session.query(Job.id)
+        .filter(_claimable(now))
+        .order_by(Job.run_at, Job.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ]
+    claimed = []
+    for job_id in ids:
+        result = db.session.execute(
+            Job.__table__.update()
+            .where(Job.id == job_id, _claimable(now))
+            .values(
+                status=RUNNING,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=visibility_timeout),
+                attempts=Job.attempts + 1,
+            )
+        )
+        if result.rowcount:
+            claimed.append(job_id)
+    db.session.commit()
+    return [db.session.get(Job, job_id) for job_id in claimed]
+
+
+def run(job, backoff):
+    """تنفيذ مهمة محجوزة وتسجيل نتيجتها؛ يرجع True عند النجاح"""
+    f, _, on_failure = _tasks.get(job.name, (None, 0, None))
+    try:
+        if f is None:
+            raise KeyError(f"Unknown job: {job.name}")
+        f(**(job.payload or {}))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        if isinstance(e, PartialFailure):
+            job.payload = e.payload
+        job.last_error = ''.join(traceback.format_exception_only(type(e), e)).strip()[:1000]
+        if job.attempts >= job.max_attempts:
+            job.status = FAILED
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = QUEUED
+            job.run_at = datetime.utcnow() + timedelta(seconds=backoff * (2 ** (job.attempts - 1)))
+        job.locked_by = job.locked_until = None
+        db.session.commit()
+        if job.status == FAILED and on_failure is not None:
+            try:
+                on_failure(job.last_error, **(job.payload or {}))
+                db.session.commit()
+            except Exception as hook_error:
+                db.session.rollback()
+                print(f"Error in on_failure for job {job.id}: {hook_error}")
+        return False
+
+    job.status = DONE
+    job.finished_at = datetime.utcnow()
+    job.locked_by = job.locked_until = None
+    db.session.commit()
+    return True
+
+
+def work(batch_size=10, visibility_timeout=300, backoff=5, poll_interval=1.0, once=False, worker_id=None):
+    """حلقة العامل: حجز دفعة، تنفيذها، ثم الانتظار إذا كان الطابور فارغاً"""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        schedule_periodic()
+        jobs = claim(worker_id, batch_size, visibility_timeout)
+        for job in jobs:
+            run(job, backoff)
+        if once and not jobs:
+            return
+        if not jobs:
+            time.sleep(poll_interval)
+
+
+# ================== التشغيل داخل عامل الويب (JOBS_INLINE) ==================
+def _run_inline(app):
+    try:
+        with app.app_context():
+            work(
+                visibility_timeout=app.config['JOB_VISIBILITY_TIMEOUT'],
+                backoff=app.config['JOB_RETRY_BACKOFF'],
+                once=True,
+                worker_id=f"{socket.gethostname()}:{os.getpid()}:inline",
+            )
+    except Exception as e:
+        print(f"Error running jobs inline: {e}")
+    finally:
+        with _inline_lock:
+            _inline['running'] = False
+
+
+def kick():
+    """تشغيل المهام المستحقة في خيط خلفي إذا كان JOBS_INLINE مفعلاً ولا يوجد خيط يعمل"""
+    app = _inline['app']
+    if app is None:
+        return
+    with _inline_lock:
+        if _inline['running']:
+            return
+        _inline['running'] = True
+        _inline['last_run'] = time.monotonic()
+    threading.Thread(target=_run_inline, args=(app,), name='jobs-inline', daemon=True).start()
+
+
+def _after_commit(session):
+    if session.info.pop(ENQUEUED_KEY, None):
+        kick()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(ENQUEUED_KEY, None)
+
+
+def stats(window_seconds=3600):
+    """
+    مقاييس الطابور: عدد المهام بكل حالة، تأخر أقدم مهمة مستحقة (ثوانٍ)،
+    وعدد المهام المنتهية والفاشلة خلال آخر window_seconds.
+    """
+    now = datetime.utcnow()
+    counts = dict(db.session.query(Job.status, func.count()).group_by(Job.status).all())
+    oldest = db.session.query(func.min(Job.run_at)).filter(Job.status == QUEUED, Job.run_at <= now).scalar()
+    since = now - timedelta(seconds=window_seconds)
+    finished = dict(
+        db.session.query(Job.status, func.count())
+        .filter(Job.finished_at >= since)
+        .group_by(Job.status)
+        .all()
+    )
+    return {
+        'queued': counts.get(QUEUED, 0),
+        'running': counts.get(RUNNING, 0),
+        'done': counts.get(DONE, 0),
+        'failed': counts.get(FAILED, 0),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'window_seconds': window_seconds,
+        'done_in_window': finished.get(DONE, 0),
+        'failed_in_window': finished.get(FAILED, 0),
+        'throughput_per_minute': finished.get(DONE, 0) / (window_seconds / 60),
+    }
+
+
+def init_app(app):
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_soft_rollback', _after_rollback)
+    if app.config['JOBS_INLINE']:
+        _inline['app'] = app
+
+        @app.before_request
+        def run_due_jobs():
+            # المهام المؤجلة (إعادة المحاولة) والدورية لا يضيفها commit؛ تُفحص كل فترة
+            if request.endpoint != 'static' and \
+                    time.monotonic() - _inline['last_run'] > app.config['JOBS_INLINE_INTERVAL']:
+                kick()
+
+    @app.cli.command('worker')
+    @click.option('--batch', default=10, help='عدد المهام في كل حجز')
+    @click.option('--poll-interval', default=1.0, help='الانتظار (ثوانٍ) عندما يكون الطابور فارغاً')
+    @click.option('--once', is_flag=True, help='الخروج عند فراغ الطابور')
+    def worker_command(batch, poll_interval, once):
+        """تشغيل عامل المهام في الخلفية"""
+        click.echo("🚀 بدء عامل المهام")
+        work(
+            batch_size=batch,
+            visibility_timeout=app.config['JOB_VISIBILITY_TIMEOUT'],
+            backoff=app.config['JOB_RETRY_BACKOFF'],
+            poll_interval=poll_interval,
+            once=once,
+        )
+
+    @app.cli.command('jobs-stats')
+    def jobs_stats_command():
+        """عرض مقاييس طابور المهام"""
+        for key, value in stats().items():
+            click.echo(f"{key}: {value}")
@@ -0,0 +1,233 @@
+"""
+الاحتفاظ بسجل النشاطات وأرشفته.
+
+في PostgreSQL جدول log مقسّم حسب الشهر (PARTITION BY RANGE (timestamp))، كل شهر في
+جدول log_pYYYY_MM، فيبقى الجدول "الساخن" وفهارسه صغيرة، وحذف شهر قديم هو DROP TABLE
+بدلاً من DELETE على ملايين الأسطر.
+
+flask logs-retention يصدّر كل شهر أقدم من LOG_RETENTION_MONTHS إلى ملف مضغوط
+(JSONL.gz أو Parquet) في مجلد محلي أو في التخزين (S3)، ويتحقق من عدد الأسطر، ثم يحذفه.
+في SQLite (بدون تقسيم) يُحذف الشهر بـ DELETE بعد تصديره بنفس الطريقة.
+
+أقسام الأشهر القادمة تُنشأ مسبقاً بمهمة دورية ensure_log_partitions في عامل المهام (jobs.py)
+كل LOG_PARTITIONS_SECONDS ثانية (يومياً افتراضياً)، وflask logs-partitions يفعل ذلك يدوياً.
+"""
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, datetime
+
+import click
+from sqlalchemy import func, select, text
+
+import jobs
+from extensions import db
+from models import Log
+from storage import get_storage
+
+FORMATS = ('jsonl', 'parquet')
+DEFAULT_PARTITION = 'log_default'
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"log_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'log'"
+    )).scalar())
+
+
+def existing_partitions():
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'log'"
+    ))
+    return {name for name, in rows}
+
+
+def create_partition_sql(month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF log "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def create_partition(month, existing):
+    """
+    إنشاء قسم شهر واحد. إذا وقعت أسطر هذا الشهر في log_default (لم يُشغَّل logs-partitions
+    في وقته) يرفض PostgreSQL إنشاء القسم، فيُفصل log_default وتُنقل أسطر الشهر منه إلى القسم
+    الجديد ثم يُعاد ربطه، كل ذلك في نفس المعاملة.
+    """
+    if DEFAULT_PARTITION not in existing:
+        db.session.execute(text(create_partition_sql(month)))
+        return
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    db.session.execute(text(f"ALTER TABLE log DETACH PARTITION {DEFAULT_PARTITION}"))
+    db.session.execute(text(create_partition_sql(month)))
+    db.session.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f"WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+        f"INSERT INTO {partition_name(month)} SELECT * FROM moved"
+    ), {'start': start, 'end': end})
+    db.session.execute(text(f"ALTER TABLE log ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+
+def ensure_partitions(ahead=3):
+    """إنشاء أقسام الشهر الحالي والأشهر القادمة إذا لم توجد؛ يرجع أسماء ما أُنشئ"""
+    if not is_partitioned():
+        return []
+    current = date.today().replace(day=1)
+    existing = existing_partitions()
+    created = []
+    for i in range(ahead + 1):
+        month = add_months(current, i)
+        if partition_name(month) not in existing:
+            create_partition(month, existing)
+            created.append(partition_name(month))
+    db.session.commit()
+    return created
+
+
+@jobs.task('ensure_log_partitions', max_attempts=1)
+def ensure_partitions_job():
+    ensure_partitions()
+
+
+def _month_range(month):
+    return datetime.combine(month, datetime.min.time()), datetime.combine(add_months(month, 1), datetime.min.time())
+
+
+def expired_months(keep_months):
+    """الأشهر التي فيها أسطر أقدم من keep_months شهراً"""
+    cutoff = add_months(date.today().replace(day=1), -keep_months)
+    oldest = db.session.query(func.min(Log.timestamp)).scalar()
+    months = []
+    month = oldest.date().replace(day=1) if oldest else cutoff
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _rows(month):
+    start, end = _month_range(month)
+    stmt = (
+        select(Log.__table__)
+        .where(Log.timestamp >= start, Log.timestamp < end)
+        .order_by(Log.timestamp, Log.id)
+    )
+    result = db.session.connection().execution_options(stream_results=True).execute(stmt)
+    for row in result.mappings().yield_per(5000):
+        yield dict(row)
+
+
+def _write_jsonl(rows, path):
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as out:
+        for row in rows:
+            row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else None
+            out.write(json.dumps(row, ensure_ascii=False))
+            out.write('\n')
+            count += 1
+    return count
+
+
+def _write_parquet(rows, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise click.ClickException("Parquet يتطلب تثبيت pyarrow")
+
+    schema = pa.schema([
+        ('id', pa.int64()), ('user', pa.string()), ('action', pa.string()), ('timestamp', pa.timestamp('us')),
+    ])
+    count = 0
+    chunk = []
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= 10000:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def archive_month(month, fmt='jsonl', folder=None, to_storage=False):
+    """
+    تصدير أسطر شهر واحد إلى ملف مضغوط ثم حذفها من قاعدة البيانات.
+    يرجع (عدد الأسطر، مكان الملف). لا يُحذف شيء إذا لم يطابق عدد الأسطر المصدّرة عددها في الجدول.
+    """
+    start, end = _month_range(month)
+    expected = db.session.query(func.count(Log.id)).filter(Log.timestamp >= start, Log.timestamp < end).scalar()
+    if not expected:
+        return 0, None
+
+    filename = f"{partition_name(month)}.{'jsonl.gz' if fmt == 'jsonl' else 'parquet'}"
+    writer = _write_jsonl if fmt == 'jsonl' else _write_parquet
+    if to_storage:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, filename)
+            written = writer(_rows(month), path)
+            with open(path, 'rb') as f:
+                location = get_storage().put(f, filename, 'application/octet-stream')
+    else:
+        os.makedirs(folder, exist_ok=True)
+        location = os.path.join(folder, filename)
+        written = writer(_rows(month), location)
+
+    if written != expected:
+        raise click.ClickException(f"{filename}: صُدّر {written} من {expected} سطر، لم يُحذف شيء")
+
+    if is_partitioned() and partition_name(month) in existing_partitions():
+        db.session.execute(text(f"DROP TABLE {partition_name(month)}"))
+    # بدون تقسيم، أو أسطر وقعت في log_default قبل إنشاء قسم شهرها
+    db.session.execute(Log.__table__.delete().where(Log.timestamp >= start, Log.timestamp < end))
+    db.session.commit()
+    return written, location
+
+
+def init_app(app):
+    jobs.periodic('ensure_log_partitions', app.config['LOG_PARTITIONS_SECONDS'])
+
+    @app.cli.command('logs-partitions')
+    @click.option('--ahead', default=3, help='عدد الأشهر القادمة التي تُنشأ أقسامها')
+    def logs_partitions_command(ahead):
+        """إنشاء أقسام جدول log للأشهر القادمة (PostgreSQL)"""
+        created = ensure_partitions(ahead)
+        click.echo(f"✅ أُنشئ: {', '.join(created) or 'لا شيء'}")
+
+    @app.cli.command('logs-retention')
+    @click.option('--months', type=int, default=None, help='عدد الأشهر التي تبقى في قاعدة البيانات')
+    @click.option('--format', 'fmt', type=click.Choice(FORMATS), default='jsonl')
+    @click.option('--dest', default=None, help='مجلد الأرشيف المحلي')
+    @click.option('--to-storage', is_flag=True, help='رفع الأرشيف إلى التخزين (S3) بدلاً من القرص')
+    @click.option('--dry-run', is_flag=True, help='عرض الأشهر فقط دون تصدير أو حذف')
+    def logs_retention_command(months, fmt, dest, to_storage, dry_run):
+        """أرشفة وحذف سجل النشاطات الأقدم من LOG_RETENTION_MONTHS"""
+        months = months if months is not None else app.config['LOG_RETENTION_MONTHS']
+        folder = dest or app.config['LOG_ARCHIVE_FOLDER']
+        for month in expired_months(months):
+            if dry_run:
+                click.echo(f"- {partition_name(month)}")
+                continue
+            count, location = archive_month(month, fmt, folder, to_storage)
+            if count:
+                click.echo(f"📦 {partition_name(month)}: {count} سطر → {location}")
+        if not dry_run:
+            ensure_partitions()
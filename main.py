@@ -1,10 +1,17 @@
 import os
-from datetime import datetime
+import io
+import base64
+import mimetypes
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta
 from functools import wraps
 import uuid
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, flash, send_from_directory
+    url_for, flash, send_from_directory, session, jsonify, abort
 )
 from flask_login import (
     LoginManager, login_user, login_required,
@@ -12,15 +19,19 @@ from flask_login import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
+from markupsafe import Markup
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from flask import current_app
 
 from extensions import db, migrate
-import boto3
+from storage import get_storage
+import imaging
 from config import Config
 from flask import Flask
 from flask_babel import Babel
 from babel.numbers import format_decimal
 
+from sqlalchemy import event
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.types import JSON
 from flask import Flask
@@ -38,6 +49,19 @@ def create_app():
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# رفع الصور بالتوازي: عدد الخيوط والمهلة (بالثواني) لكل ملف
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 5))
+UPLOAD_TIMEOUT = int(os.environ.get("UPLOAD_TIMEOUT", 30))
+_upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='upload')
+
+# معالجة الصور (تصغير وإعادة ترميز) في عمليات منفصلة
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+# مفاتيح الملفات المرفوعة مباشرة والمؤكدة في المعاملة الحالية (انظر confirm_uploads)
+STAGED_UPLOADS_KEY = 'staged_uploads'
+
 
 try:
     from dotenv import load_dotenv
@@ -50,32 +74,48 @@ def allowed_file(filename):
     """التأكد من أن الملف مسموح بصيغته"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def s3_client():
+def _put_file(storage, file):
+    """رفع ملف واحد باسم فريد وإرجاع رابطه (يعمل أيضاً من خيوط الرفع)"""
+    return storage.put(file, generate_unique_filename(file.filename), file.content_type)
+
+
+def image_pool():
+    """مجمع عمليات لمعالجة الصور (spawn حتى لا ننسخ خيوط العامل عند fork)"""
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+    return _image_pool
+
+
+def _put_image(storage, key_base, ext, data, content_type, options):
     """
-    إرجاع عميل S3 باستخدام إعدادات المشروع.
-    يتحقق من وجود المتغيرات قبل الاستخدام.
+    تحسين صورة واحدة في مجمع العمليات ثم رفعها مع نسختيها المصغرة والمتوسطة.
+    key_base هو بصمة المحتوى (انظر image_refs.py) فنفس الصورة تأخذ نفس المفاتيح دائماً.
+    يرجع (رابط الصورة، {'thumb': ..., 'medium': ...}) أو (رابط الأصل، None) إذا تعذرت المعالجة.
     """
-    aws_access_key = os.environ.get('AWS_ACCESS_KEY_ID') or current_app.config.get('AWS_ACCESS_KEY_ID')
-    aws_secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY') or current_app.config.get('AWS_SECRET_ACCESS_KEY')
-    aws_region = os.environ.get('AWS_REGION') or current_app.config.get('AWS_REGION')
-
-    if not aws_access_key or not aws_secret_key or not aws_region:
-        raise RuntimeError("AWS credentials or region not configured!")
+    optimized = None
+    if imaging.available():
+        try:
+            optimized = image_pool().submit(imaging.optimize_image, data, **options).result(timeout=UPLOAD_TIMEOUT)
+        except Exception as e:
+            print(f"Error optimizing {key_base}: {e}")
 
-    return boto3.client(
-        "s3",
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key,
-        region_name=aws_region
-    )
+    if not optimized:
+        return storage.put(io.BytesIO(data), f"{key_base}.{ext}", content_type), None
 
-def upload_file_to_s3(file):
-    return save_file(file)
+    urls = {}
+    for name, (body, variant_type, variant_ext) in optimized.items():
+        suffix = '' if name == 'original' else f'_{name}'
+        urls[name] = storage.put(io.BytesIO(body), f"{key_base}{suffix}.{variant_ext}", variant_type)
+    return urls.pop('original'), urls
 
 
 def save_file(file):
     """
-    رفع ملف إلى S3 وإرجاع الرابط المباشر.
+    رفع ملف إلى التخزين الحالي (S3 أو القرص) وإرجاع الرابط المباشر.
     يرجع None إذا لم يكن هناك ملف أو صيغة غير مسموح بها.
     """
     if not file or file.filename == '':
@@ -85,42 +125,168 @@ def save_file(file):
         return None
 
     try:
-        client = s3_client()
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4().hex}_{filename}"
-
-        client.upload_fileobj(
-            file,
-            os.environ.get('AWS_BUCKET_NAME') or current_app.config.get('AWS_BUCKET_NAME'),
-            unique_filename,
-            ExtraArgs={
-                'ContentType': file.content_type
-            }
+        return _put_file(get_storage(), file)
+
+    except Exception as e:
+        print(f"Error uploading file: {e}")
+        return None
+
+
+def _image_options():
+    return {
+        'max_dimension': current_app.config['IMAGE_MAX_DIMENSION'],
+        'thumb_size': current_app.config['IMAGE_THUMB_SIZE'],
+        'medium_size': current_app.config['IMAGE_MEDIUM_SIZE'],
+        'quality': current_app.config['IMAGE_QUALITY'],
+    }
+
+
+def store_images(storage, images):
+    """
+    تحسين ورفع صور بالتوازي مع تخطي المخزنة مسبقاً بنفس المحتوى، وزيادة عداد مراجعها.
+    images: [(الاسم، البصمة، المحتوى، الامتداد، نوع المحتوى)].
+    يرجع (روابط الصور بنفس الترتيب، روابط النسخ المصغرة لكل صورة، أسماء الصور التي فشل رفعها).
+    """
+    options = _image_options()
+    existing = image_refs.find_existing(storage, [content_hash for _, content_hash, *_ in images])
+
+    futures = {}
+    for _, content_hash, data, ext, content_type in images:
+        if content_hash in existing or content_hash in futures:
+            continue  # الصورة مخزنة مسبقاً أو مكررة في نفس النموذج: لا حاجة لرفعها
+        futures[content_hash] = _upload_pool.submit(
+            _put_image, storage, content_hash, ext, data, content_type, options
         )
 
-        url = f"https://{os.environ.get('AWS_BUCKET_NAME') or current_app.config.get('AWS_BUCKET_NAME')}.s3.{os.environ.get('AWS_REGION') or current_app.config.get('AWS_REGION')}.amazonaws.com/{unique_filename}"
-        return url
+    stored = dict(existing)
+    for content_hash, future in futures.items():
+        try:
+            stored[content_hash] = future.result(timeout=UPLOAD_TIMEOUT * 2)
+        except Exception as e:
+            print(f"Error uploading {content_hash}: {e}")
+
+    urls, variants, failed = [], [], []
+    for name, content_hash, *_ in images:
+        if content_hash not in stored:
+            failed.append(name)
+            continue
+        url, sizes = stored[content_hash]
+        image_refs.add_refs(storage, content_hash, url, sizes)
+        urls.append(url)
+        variants.append(sizes)
+    return urls, variants, failed
+
+
+def upload_images(files):
+    """
+    تحسين ورفع الصور image1..image5 (انظر store_images).
+    يرجع (روابط الصور بنفس ترتيب الحقول، روابط النسخ المصغرة لكل صورة، أسماء الملفات التي فشل رفعها).
+    """
+    selected = [files.get(f'image{i}') for i in range(1, 6)]
+    selected = [f for f in selected if f and f.filename and allowed_file(f.filename)]
+    if not selected:
+        return [], [], []
 
+    try:
+        storage = get_storage()
     except Exception as e:
-        print(f"Error uploading file to S3: {e}")
+        print(f"Storage not configured properly: {e}")
+        return [], [], [f.filename for f in selected]
+
+    # البصمة تُحسب في خيط الطلب لأن ملفات الطلب لا تُقرأ بعد انتهائه
+    images = []
+    for f in selected:
+        content_hash, data = image_refs.hash_stream(f.stream)
+        images.append((f.filename, content_hash, data, f.filename.rsplit('.', 1)[1].lower(), f.content_type))
+    return store_images(storage, images)
+
+
+def offer_image_urls(offer):
+    """كل روابط صور العرض مع نسخها المصغرة (للحذف)"""
+    urls = list(offer.images or [])
+    for sizes in offer.image_variants or []:
+        urls.extend((sizes or {}).values())
+    return urls
+
+
+def flash_failed_uploads(failed):
+    if failed:
+        flash(f"تعذر رفع بعض الصور: {'، '.join(failed)}", "danger")
+
+
+def _upload_signer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='direct-upload')
+
+
+def issue_direct_upload(storage, filename, content_type):
+    """
+    مفتاح جديد في التخزين مع تعليمات رفعه من المتصفح مباشرة، ورمز موقّع يُرسل لاحقاً لتأكيد الرفع.
+    الرمز مرتبط بالمستخدم الحالي فلا يمكن لغيره إرفاق الملف بعرض.
+    """
+    key = generate_unique_filename(filename)
+    expires = current_app.config['DIRECT_UPLOAD_EXPIRES']
+    token = _upload_signer().dumps({'key': key, 'user': current_user.id})
+    if storage.supports_presign:
+        upload = storage.presign_upload(key, content_type, current_app.config['DIRECT_UPLOAD_MAX_SIZE'], expires)
+    else:
+        # تخزين محلي أو في الذاكرة: التطبيق نفسه يستقبل الملف بدلاً من S3
+        upload = {'method': 'PUT', 'url': url_for('direct_upload', token=token), 'fields': {}}
+    return {'key': key, 'token': token, **upload}
+
+
+def read_upload_token(token):
+    """مفتاح الملف من رمز الرفع، أو None إذا كان الرمز غير صالح أو منتهياً أو لمستخدم آخر"""
+    try:
+        data = _upload_signer().loads(token, max_age=current_app.config['DIRECT_UPLOAD_EXPIRES'] * 2)
+    except BadSignature:
         return None
+    if data.get('user') != current_user.id:
+        return None
+    return data.get('key')
+
+
+def confirm_uploads(tokens):
+    """
+    تأكيد الملفات التي رفعها المتصفح مباشرة دون قراءتها في الطلب: كل رمز يُؤكد مرة واحدة فقط
+    (image_refs.claim_staged)، ويُرفق الملف بالعرض برابطه المؤقت. التحقق أنها صورة والبصمة
+    والنسخ المصغرة تتم في مهمة process_direct_uploads التي تُضاف عند commit (_enqueue_direct_uploads).
+    يرجع (الروابط، النسخ المصغرة، الرموز المرفوضة) بنفس شكل upload_images.
+    """
+    tokens = [t for t in tokens if t]
+    if not tokens:
+        return [], [], []
+    storage = get_storage()
+    urls, failed = [], []
+    for token in tokens[:5]:
+        key = read_upload_token(token)
+        if key is None or not image_refs.claim_staged(key):
+            failed.append(key or token[:12])
+            continue
+        urls.append(storage.url_for_key(key))
+        db.session.info.setdefault(STAGED_UPLOADS_KEY, []).append(key)
+    return urls, [None] * len(urls), failed
+
+
+def collect_images():
+    """الصور المرفوعة مع النموذج + المرفوعة مباشرة إلى التخزين (حقول direct_upload)، بحد أقصى 5"""
+    urls, variants, failed = upload_images(request.files)
+    direct_urls, direct_variants, direct_failed = confirm_uploads(request.form.getlist('direct_upload'))
+    return (urls + direct_urls)[:5], (variants + direct_variants)[:5], failed + direct_failed
+
 
 def remove_files(file_list):
     """
-    حذف ملفات من S3 باستخدام روابطها.
+    حذف ملفات من التخزين باستخدام روابطها.
     file_list: قائمة روابط الصور
+    الحذف الفعلي يتم في عامل المهام بعد نجاح db.session.commit() (انظر deletions.py)،
+    ولا يُحذف ملف ما زال عرض آخر يشير إليه (انظر image_refs.py).
     """
     try:
-        client = s3_client()
-        bucket_name = os.environ.get('AWS_BUCKET_NAME') or current_app.config.get('AWS_BUCKET_NAME')
-        for url in file_list:
-            key = url.split('/')[-1]  # استخراج اسم الملف من الرابط
-            try:
-                client.delete_object(Bucket=bucket_name, Key=key)
-            except Exception as e:
-                print(f"Error deleting {key}: {e}")
+        storage = get_storage()
+        keys = image_refs.release([storage.key_from_url(url) for url in file_list if url])
+        deletions.schedule(keys)
     except Exception as e:
-        print(f"S3 client not configured properly: {e}")
+        print(f"Storage not configured properly: {e}")
 
 # ================== تهيئة التطبيق ==================
 app = Flask(__name__)
@@ -130,6 +296,71 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# عدد العروض في كل صفحة
+app.config['OFFERS_PAGE_SIZE'] = int(os.environ.get("OFFERS_PAGE_SIZE", 50))
+app.config['MAX_PAGE_SIZE'] = int(os.environ.get("MAX_PAGE_SIZE", 200))
+app.config['LOGS_PAGE_SIZE'] = int(os.environ.get("LOGS_PAGE_SIZE", 100))
+app.config['ORDERS_PAGE_SIZE'] = int(os.environ.get("ORDERS_PAGE_SIZE", 50))
+
+# كل كم ثانية يطابق عامل المهام عدادات لوحة التحكم مع COUNT(*)
+app.config['COUNTERS_RECONCILE_SECONDS'] = int(os.environ.get("COUNTERS_RECONCILE_SECONDS", 3600))
+
+# ذاكرة المستخدمين المؤقتة لكل عامل
+app.config['USER_CACHE_TTL'] = int(os.environ.get("USER_CACHE_TTL", 60))
+app.config['USER_CACHE_SIZE'] = int(os.environ.get("USER_CACHE_SIZE", 1024))
+
+# ذاكرة صفوف جداول العروض لكل عامل، مع Redis مشترك اختياري (انظر fragment_cache.py)
+app.config['FRAGMENT_CACHE_SIZE'] = int(os.environ.get("FRAGMENT_CACHE_SIZE", 5000))
+app.config['FRAGMENT_CACHE_URL'] = os.environ.get("FRAGMENT_CACHE_URL")
+app.config['FRAGMENT_CACHE_TTL'] = int(os.environ.get("FRAGMENT_CACHE_TTL", 86400))
+
+# مطابقة الطلبات والعروض (matching.py): السماحية النسبية للسعر والمساحة، وأقصى عدد مرشحين يُقيّم
+app.config['MATCH_PRICE_TOLERANCE'] = float(os.environ.get("MATCH_PRICE_TOLERANCE", 0.25))
+app.config['MATCH_AREA_TOLERANCE'] = float(os.environ.get("MATCH_AREA_TOLERANCE", 0.3))
+app.config['MATCH_MAX_CANDIDATES'] = int(os.environ.get("MATCH_MAX_CANDIDATES", 20000))
+# أقل درجة مطابقة (0-100) لإشعار مسوق الطلب بعرض جديد (alerts.py)
+app.config['ALERT_MIN_SCORE'] = int(os.environ.get("ALERT_MIN_SCORE", 70))
+# نافذة إعادة قراءة تغييرات الطلبات من العمال الآخرين بالثواني (أطول من أطول معاملة)
+app.config['ALERT_CATCH_UP_OVERLAP'] = int(os.environ.get("ALERT_CATCH_UP_OVERLAP", 300))
+
+# التخزين: s3 أو local أو memory (انظر storage.py)
+app.config['STORAGE_BACKEND'] = os.environ.get("STORAGE_BACKEND", "s3")
+app.config['UPLOAD_WORKERS'] = UPLOAD_WORKERS
+app.config['UPLOAD_TIMEOUT'] = UPLOAD_TIMEOUT
+
+# سجل النشاطات: كتابة مؤجلة على دفعات (عدد الأسطر في الدفعة، وأقصى انتظار بالثواني)
+app.config['AUDIT_BUFFERED'] = os.environ.get("AUDIT_BUFFERED", "False").lower() in ["true", "1", "t"]
+app.config['AUDIT_BATCH_SIZE'] = int(os.environ.get("AUDIT_BATCH_SIZE", 50))
+app.config['AUDIT_FLUSH_INTERVAL'] = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 5.0))
+
+# سجل النشاطات: عدد الأشهر التي تبقى في قاعدة البيانات، ومجلد الأرشيف المحلي (flask logs-retention)
+app.config['LOG_RETENTION_MONTHS'] = int(os.environ.get("LOG_RETENTION_MONTHS", 12))
+app.config['LOG_ARCHIVE_FOLDER'] = os.environ.get(
+    "LOG_ARCHIVE_FOLDER", os.path.join(os.path.dirname(__file__), 'instance', 'log_archive')
+)
+# كل كم ثانية ينشئ عامل المهام أقسام log للأشهر القادمة (log_retention.ensure_partitions)
+app.config['LOG_PARTITIONS_SECONDS'] = int(os.environ.get("LOG_PARTITIONS_SECONDS", 86400))
+
+# طابور المهام (flask worker): مهلة حجز المهمة، والانتظار الأساسي قبل إعادة المحاولة (ثوانٍ)
+app.config['JOB_VISIBILITY_TIMEOUT'] = int(os.environ.get("JOB_VISIBILITY_TIMEOUT", 300))
+app.config['JOB_RETRY_BACKOFF'] = float(os.environ.get("JOB_RETRY_BACKOFF", 5.0))
+# بدون عامل منفصل (Replit): تشغيل المهام في خيط داخل عامل الويب، وكل كم ثانية تُفحص المستحقة
+app.config['JOBS_INLINE'] = os.environ.get("JOBS_INLINE", "False").lower() in ["true", "1", "t"]
+app.config['JOBS_INLINE_INTERVAL'] = float(os.environ.get("JOBS_INLINE_INTERVAL", 30))
+
+# عدد محاولات حذف الصور قبل تسجيلها في failed_deletion
+app.config['DELETE_MAX_ATTEMPTS'] = int(os.environ.get("DELETE_MAX_ATTEMPTS", 3))
+
+# أبعاد الصور بعد التحسين (بالبكسل) وجودة الترميز
+app.config['IMAGE_MAX_DIMENSION'] = int(os.environ.get("IMAGE_MAX_DIMENSION", 2048))
+app.config['IMAGE_MEDIUM_SIZE'] = int(os.environ.get("IMAGE_MEDIUM_SIZE", 800))
+app.config['IMAGE_THUMB_SIZE'] = int(os.environ.get("IMAGE_THUMB_SIZE", 200))
+app.config['IMAGE_QUALITY'] = int(os.environ.get("IMAGE_QUALITY", 82))
+
+# الرفع المباشر من المتصفح إلى التخزين: أقصى حجم للصورة، ومدة صلاحية رابط الرفع (ثوانٍ)
+app.config['DIRECT_UPLOAD_MAX_SIZE'] = int(os.environ.get("DIRECT_UPLOAD_MAX_SIZE", 20 * 1024 * 1024))
+app.config['DIRECT_UPLOAD_EXPIRES'] = int(os.environ.get("DIRECT_UPLOAD_EXPIRES", 600))
+
 # مجلد رفع الملفات
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -139,15 +370,52 @@ db.init_app(app)
 migrate.init_app(app, db)
 
 # استيراد الموديلات بعد db
-from models import Employee, Log, Property, RentalOffer, SaleOffer, Orders
+from models import Employee, Log, Property, RentalOffer, SaleOffer, Orders, Notification
+import audit
+import log_retention
+import history
+import search
+import counters
+import jobs
+import deletions
+import image_refs
+import matching
+import alerts
+from user_cache import UserCache
+from http_cache import conditional, APP_VERSION
+from fragment_cache import create_fragment_cache, template_version
+from arabic_numbers import parse_number
+from phones import normalize_phone
+
+audit.init_app(app)
+log_retention.init_app(app)
+history.init_app(app)
+search.init_app(app)
+counters.init_app(app)
+jobs.init_app(app)
+deletions.init_app(app)
+matching.init_app(app)
+alerts.init_app(app)
 
 # ================== تهيئة تسجيل الدخول ==================
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+user_cache = UserCache(ttl=app.config['USER_CACHE_TTL'], max_size=app.config['USER_CACHE_SIZE'])
+fragment_cache = create_fragment_cache(app.config)
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return Employee.query.get(int(user_id))
+    user_id = int(user_id)
+    # الاستعلام فقط عند عدم وجود نسخة صالحة في ذاكرة هذا العامل (انظر user_cache.py)
+    user = user_cache.get(user_id)
+    if user is None:
+        employee = db.session.get(Employee, user_id)
+        if employee is None:
+            return None
+        user = user_cache.put(employee)
+    return user
 
 
 # ضبط لغة التطبيق الافتراضية على الألمانية
@@ -175,6 +443,13 @@ def permission_required(permission):
     return decorator
 
 
+def visible_history(obj):
+    """سجل تغييرات السجل لمن لديه صلاحية عرض السجلات فقط"""
+    if not current_user.is_authenticated or not current_user.has_permission('logs_view'):
+        return []
+    return history.for_entity(obj)
+
+
 def generate_unique_filename(filename):
     """إرجاع اسم ملف فريد باستخدام UUID"""
     name = secure_filename(filename)
@@ -208,23 +483,18 @@ def logout():
 @login_required
 def dashboard():
     try:
-        employees_count = Employee.query.count()
-        rentalm_offers_count = RentalOffer.query.filter_by(district='وسط').count()
-        rentalw_offers_count = RentalOffer.query.filter_by(district='جنوب').count()
-        salesm_offers_count = SaleOffer.query.filter_by(district='وسط').count()
-        salesw_offers_count = SaleOffer.query.filter_by(district='جنوب').count()
-        orders_count = Orders.query.count()
+        stats = counters.get_stats()
     except Exception as e:
         return f"خطأ في dashboard: {e}", 500
 
     return render_template(
         'dashboard.html',
-        employees_count=employees_count,
-        rentalm_offers_count=rentalm_offers_count,
-        rentalw_offers_count=rentalw_offers_count,
-        salesm_offers_count=salesm_offers_count,
-        salesw_offers_count=salesw_offers_count,
-        orders_count=orders_count
+        employees_count=stats.employees_count,
+        rentalm_offers_count=stats.rentalm_offers_count,
+        rentalw_offers_count=stats.rentalw_offers_count,
+        salesm_offers_count=stats.salesm_offers_count,
+        salesw_offers_count=stats.salesw_offers_count,
+        orders_count=stats.orders_count
     )
 
 
@@ -260,10 +530,306 @@ AVAILABLE_PERMISSIONS = [
 
 # ================== دوال مساعدة ==================
 def add_log(action):
-    """إضافة سجل نشاطات المستخدم"""
-    log = Log(user=current_user.username, action=action)
-    db.session.add(log)
-    db.session.commit()
+    """إضافة سجل نشاطات المستخدم؛ يُحفظ مع commit التعديل نفسه (انظر audit.py)"""
+    audit.record(current_user.username, action)
+
+
+# ================== التصفح بالمؤشر (Keyset) ==================
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(sort_value, row_id):
+    """تحويل (التاريخ أو الرقم، المعرف) إلى مؤشر نصي آمن للروابط"""
+    value = sort_value.isoformat() if isinstance(sort_value, datetime) else repr(float(sort_value))
+    raw = f"{value}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """فك المؤشر، ويرجع None إذا كان فارغاً أو غير صالح"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        try:
+            value = float(sort_value)
+        except ValueError:
+            value = datetime.fromisoformat(sort_value)
+        return value, int(row_id)
+    except Exception:
+        return None
+
+
+def get_page_size(default_key='OFFERS_PAGE_SIZE'):
+    """حجم الصفحة من الرابط (per_page) أو من الإعدادات، بحد أقصى"""
+    default = app.config[default_key]
+    try:
+        size = int(request.args.get('per_page', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, app.config['MAX_PAGE_SIZE']))
+
+
+def keyset_paginate(query, sort_col, id_col, per_page, descending=True):
+    """
+    تصفح حسب (sort_col, id_col) باستخدام مؤشري after / before (تنازلي افتراضياً).
+    لا يستخدم OFFSET، لذلك تكلفة كل صفحة ثابتة مهما كبر الجدول.
+    sort_col يجب ألا يكون NULL في الأسطر المعروضة (يُستبعد NULL قبل الاستدعاء).
+    """
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before'))
+
+    def beyond(cursor, desc):
+        value, row_id = cursor
+        if desc:
+            return db.or_(sort_col < value, db.and_(sort_col == value, id_col < row_id))
+        return db.or_(sort_col > value, db.and_(sort_col == value, id_col > row_id))
+
+    def ordered(q, desc):
+        if desc:
+            return q.order_by(sort_col.desc(), id_col.desc())
+        return q.order_by(sort_col.asc(), id_col.asc())
+
+    if before:
+        rows = ordered(query.filter(beyond(before, not descending)), not descending).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after:
+            query = query.filter(beyond(after, descending))
+        rows = ordered(query, descending).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after is not None
+
+    def cursor_of(item):
+        return encode_cursor(getattr(item, sort_col.key), getattr(item, id_col.key))
+
+    return Page(
+        items=items,
+        next_cursor=cursor_of(items[-1]) if items and has_next else None,
+        prev_cursor=cursor_of(items[0]) if items and has_prev else None,
+    )
+
+
+# أسماء الحقول كما تظهر في سجل التغييرات
+FIELD_LABELS = {
+    'unit_type': 'نوع الوحدة', 'floor': 'الطابق', 'area': 'المساحة', 'price': 'السعر',
+    'details': 'التفاصيل', 'owner_type': 'صفة المالك', 'location': 'الموقع', 'marketer': 'المسوق',
+    'notes': 'ملاحظات', 'status': 'الحالة', 'images': 'الصور', 'district': 'المنطقة',
+    'front': 'الواجهة', 'street': 'الشارع', 'sale_limit': 'حد البيع', 'created_by': 'أضيف بواسطة',
+    'customer_name': 'اسم العميل', 'phone': 'الجوال', 'name': 'الاسم', 'role': 'الدور',
+    'username': 'اسم المستخدم', 'password': 'كلمة المرور', 'permissions': 'الصلاحيات',
+}
+
+
+@app.template_filter('field_label')
+def field_label(field):
+    return FIELD_LABELS.get(field, field)
+
+
+@app.template_global()
+def image_url(offer, index=0, variant=None):
+    """رابط نسخة من صورة العرض (thumb / medium)، أو الصورة نفسها إذا لم تتوفر النسخة"""
+    images = offer.images or []
+    if index >= len(images) or not images[index]:
+        return None
+    variants = offer.image_variants or []
+    if variant and index < len(variants) and variants[index]:
+        return variants[index].get(variant) or images[index]
+    return images[index]
+
+
+@app.template_global()
+def offer_row(template_name, offer, **context):
+    """
+    صف جدول العروض من ذاكرة الأجزاء؛ يُولد القالب فقط إذا تغير العرض (updated_at)
+    أو تغيرت بصمة ما يظهر في الصف (المنطقة وصلاحيات التعديل والحذف).
+    """
+    fingerprint = ','.join(f"{k}={context[k]}" for k in sorted(context))
+    updated_at = offer.updated_at.isoformat() if offer.updated_at else ''
+    version = APP_VERSION or template_version(app.jinja_env, template_name)
+    key = f"{version}:{template_name}:{offer.id}:{updated_at}:{fingerprint}"
+    html = fragment_cache.get(key)
+    if html is None:
+        html = app.jinja_env.get_template(template_name).render(offer=offer, **context)
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+
+@app.template_global()
+def page_url(**cursor):
+    """رابط الصفحة الحالية مع استبدال المؤشر والحفاظ على باقي المعاملات"""
+    args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+    args.update({k: v for k, v in cursor.items() if v})
+    return url_for(request.endpoint, **request.view_args, **args)
+
+
+def arg_float(name):
+    """قراءة رقم من معاملات الرابط (يقبل الأرقام العربية وفواصل الآلاف)، ويرجع None إذا كان فارغاً أو غير صالح"""
+    return parse_number(request.args.get(name, '').strip())
+
+
+def apply_offer_filters(query, model):
+    """تطبيق فلاتر البحث (النص، السعر، المساحة، الحالة، نوع الوحدة) داخل SQL"""
+    match = search.match_condition(model, request.args.get('q', ''))
+    if match is not None:
+        query = query.filter(match)
+
+    min_price, max_price = arg_float('min_price'), arg_float('max_price')
+    if min_price is not None:
+        query = query.filter(model.price >= min_price)
+    if max_price is not None:
+        query = query.filter(model.price <= max_price)
+
+    min_area, max_area = arg_float('min_area'), arg_float('max_area')
+    if min_area is not None:
+        query = query.filter(model.area >= min_area)
+    if max_area is not None:
+        query = query.filter(model.area <= max_area)
+
+    status = request.args.get('status', '').strip()
+    if status:
+        query = query.filter(model.status == status)
+
+    unit_type = request.args.get('unit_type', '').strip()
+    if unit_type:
+        query = query.filter(model.unit_type.ilike(f"%{like_escape(unit_type)}%", escape='\\'))
+
+    return query
+
+
+def range_overlaps(low_col, high_col, low, high):
+    """
+    شروط تداخل مدى مخزن [low_col, high_col] مع المدى المطلوب [low, high].
+    الطرف الفارغ في السجل مدى مفتوح ("أقل من 500")؛ السجل بلا مدى لا يطابق.
+    """
+    conditions = []
+    if low is not None:
+        conditions.append(db.or_(high_col >= low, db.and_(high_col.is_(None), low_col.isnot(None))))
+    if high is not None:
+        conditions.append(db.or_(low_col <= high, db.and_(low_col.is_(None), high_col.isnot(None))))
+    return conditions
+
+
+def apply_order_filters(query):
+    """
+    فلاتر قائمة الطلبات داخل SQL: النص، المسوق والفترة (فهرس marketer, created_at)، الجوال الموحد،
+    نوع العقار والأحياء (فهارس trigram في PostgreSQL)، ومدى المبلغ والمساحة (فهارس _min/_max).
+    """
+    match = search.match_condition(Orders, request.args.get('q', ''))
+    if match is not None:
+        query = query.filter(match)
+
+    marketer = request.args.get('marketer', '').strip()
+    if marketer:
+        query = query.filter(Orders.marketer == marketer)
+
+    phone = request.args.get('phone', '').strip()
+    if phone:
+        normalized = normalize_phone(phone)
+        if normalized:
+            query = query.filter(Orders.phone_normalized == normalized)
+        else:
+            # جزء من رقم: بحث نصي في الحقل كما كُتب
+            query = query.filter(Orders.phone.ilike(f"%{like_escape(phone)}%", escape='\\'))
+
+    for column in (Orders.unit_type, Orders.location):
+        value = request.args.get(column.key, '').strip()
+        if value:
+            query = query.filter(column.ilike(f"%{like_escape(value)}%", escape='\\'))
+
+    date_from, date_to = arg_date('from'), arg_date('to')
+    if date_from:
+        query = query.filter(Orders.created_at >= date_from)
+    if date_to:
+        query = query.filter(Orders.created_at < date_to + timedelta(days=1))
+
+    query = query.filter(*range_overlaps(Orders.price_min, Orders.price_max, arg_float('min_price'), arg_float('max_price')))
+    query = query.filter(*range_overlaps(Orders.area_min, Orders.area_max, arg_float('min_area'), arg_float('max_area')))
+    return query
+
+
+# ترتيب قائمة الطلبات: المفتاح في الرابط ← (العنوان، عمود الترتيب، تنازلي)
+# الترتيب بالمبلغ أو المساحة يعرض الطلبات المحدد فيها المبلغ أو المساحة فقط (انظر keyset_paginate)
+ORDER_SORTS = {
+    'newest': ('الأحدث', Orders.created_at, True),
+    'oldest': ('الأقدم', Orders.created_at, False),
+    'price_asc': ('المبلغ تصاعدياً', Orders.price_min, False),
+    'price_desc': ('المبلغ تنازلياً', Orders.price_min, True),
+    'area_asc': ('المساحة تصاعدياً', Orders.area_min, False),
+    'area_desc': ('المساحة تنازلياً', Orders.area_min, True),
+}
+
+
+# أنواع العمليات في السجل (أول كلمة في نص العملية، انظر add_log)
+LOG_ACTION_TYPES = ('إضافة', 'تعديل', 'حذف')
+
+
+def arg_date(name):
+    """قراءة تاريخ YYYY-MM-DD من معاملات الرابط، ويرجع None إذا كان فارغاً أو غير صالح"""
+    value = request.args.get(name, '').strip()
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def apply_log_filters(query):
+    """
+    فلاتر السجل داخل SQL: المستخدم والفترة عبر فهرس (user, timestamp)،
+    والنص ونوع العملية عبر فهرس trigram على action في PostgreSQL.
+    """
+    user = request.args.get('user', '').strip()
+    if user:
+        query = query.filter(Log.user == user)
+
+    date_from, date_to = arg_date('from'), arg_date('to')
+    if date_from:
+        query = query.filter(Log.timestamp >= date_from)
+    if date_to:
+        query = query.filter(Log.timestamp < date_to + timedelta(days=1))
+
+    action_type = request.args.get('action_type', '').strip()
+    if action_type in LOG_ACTION_TYPES:
+        query = query.filter(Log.action.like(f"{action_type}%"))
+
+    q = request.args.get('q', '').strip()
+    if q:
+        query = query.filter(Log.action.ilike(f"%{like_escape(q)}%", escape='\\'))
+
+    return query
+
+
+def offers_version(model, district):
+    """مُعرّف نسخة قائمة منطقة لـ ETag: آخر تعديل وعدد العروض (يتغير مع الإضافة والتعديل والحذف)"""
+    last_modified, count = (
+        db.session.query(db.func.max(model.updated_at), db.func.count(model.id))
+        .filter(model.district == district)
+        .one()
+    )
+    # عدد الإشعارات غير المقروءة يظهر في شريط التنقل، فيدخل في النسخة أيضاً
+    return (last_modified, count, unread_notifications()), last_modified
+
+
+def offer_version(model, district, offer_id):
+    """مُعرّف نسخة صفحة تفاصيل عرض، أو None إذا لم يوجد (فيُرجع المسار 404)"""
+    row = db.session.query(model.updated_at).filter_by(id=offer_id, district=district).first()
+    if row is None:
+        return None
+    return (offer_id, row.updated_at, unread_notifications()), row.updated_at
+
+
+def offers_page(model, district):
+    """صفحة من عروض منطقة معينة بعد تطبيق الفلاتر، مرتبة من الأحدث"""
+    query = apply_offer_filters(model.query.filter_by(district=district), model)
+    return keyset_paginate(query, model.created_at, model.id, get_page_size())
 
 
 # ================== إدارة الموظفين ==================
@@ -308,10 +874,10 @@ def add_employee():
         )
         new_employee.set_permissions(permissions_list)
         db.session.add(new_employee)
+        add_log(f"إضافة موظف جديد: {name}")
         db.session.commit()
 
         flash("تمت إضافة الموظف بنجاح ✅", "success")
-        add_log(f"إضافة موظف جديد: {name}")
         return redirect(url_for('list_employees'))
 
     return render_template(
@@ -340,15 +906,17 @@ def edit_employee(id):
         # تحديث الصلاحيات
         selected_perms = request.form.getlist('permissions[]')
         employee.set_permissions(selected_perms)
+        employee.auth_version = (employee.auth_version or 0) + 1
         
+        add_log(f"تعديل الموظف: {employee.name}")
         db.session.commit()
+        user_cache.invalidate(employee.id)
 
         # إذا الموظف المعدل هو نفسه المستخدم الحالي، حدث الجلسة
         if current_user.id == employee.id:
             login_user(employee, fresh=True)
 
         flash('تم تعديل الموظف بنجاح ✅', 'success')
-        add_log(f"تعديل الموظف: {employee.name}")
         return redirect(url_for('list_employees'))
     
     return render_template(
@@ -371,9 +939,10 @@ def delete_employee(employee_id):
 
     name = employee.name
     db.session.delete(employee)
+    add_log(f"حذف الموظف: {name}")
     db.session.commit()
+    user_cache.invalidate(employee_id)
 
-    add_log(f"حذف الموظف: {name}")
     flash("تم حذف الموظف بنجاح ✅", "success")
     return redirect(url_for('list_employees'))
 
@@ -382,9 +951,10 @@ def delete_employee(employee_id):
 @app.route('/rentalm_offers')
 @login_required
 @permission_required('rentalm_offers_view')
+@conditional(lambda: offers_version(RentalOffer, 'وسط'))
 def rentalm_offers():
-    offers = RentalOffer.query.filter_by(district='وسط').order_by(RentalOffer.created_at.desc()).all()
-    return render_template('rental_offers/list.html', offers=offers, district='وسط', district_name='وسط')
+    page = offers_page(RentalOffer, 'وسط')
+    return render_template('rental_offers/list.html', offers=page.items, page=page, district='وسط', district_name='وسط')
 
 
 @app.route('/rentalm_offers/add', methods=['GET', 'POST'])
@@ -392,13 +962,8 @@ def rentalm_offers():
 @permission_required('rentalm_offers_add')
 def add_rentalm_offer():
     if request.method == 'POST':
-        images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    images.append(url)
+        images, variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         offer = RentalOffer(
             unit_type=request.form['unit_type'].strip()[:200],
@@ -412,12 +977,13 @@ def add_rentalm_offer():
             notes=request.form.get('notes', '').strip()[:2100],
             status=request.form['status'].strip()[:50],
             district='وسط',
-            images=images
+            images=images,
+            image_variants=variants
         )
         db.session.add(offer)
+        add_log(f"إضافة عرض إيجار وسط: {offer.unit_type}")
         db.session.commit()
   
-        add_log(f"إضافة عرض إيجار وسط: {offer.unit_type}")
         flash("تمت إضافة العرض بنجاح ✅", "success")
         return redirect(url_for('rentalm_offers'))
 
@@ -432,18 +998,14 @@ def edit_rentalm_offer(offer_id):
 
     if request.method == 'POST':
         # معالجة الصور
-        new_images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    new_images.append(url)
+        new_images, new_variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         # إذا تم رفع صور جديدة فقط
         if new_images:
-            remove_files(offer.images or [])
+            remove_files(offer_image_urls(offer))
             offer.images = new_images
+            offer.image_variants = new_variants
 
         # تحديث باقي بيانات العرض دائمًا
         offer.unit_type = request.form.get('unit_type', '').strip()[:200]
@@ -457,9 +1019,9 @@ def edit_rentalm_offer(offer_id):
         offer.notes = request.form.get('notes', '').strip()[:2100]
         offer.status = request.form.get('status', '').strip()[:50]
 
+        add_log(f"تعديل عرض إيجار وسط: {offer.unit_type}")
         db.session.commit()
 
-        add_log(f"تعديل عرض إيجار وسط: {offer.unit_type}")
         flash("تم تحديث العرض بنجاح ✅", "success")
         return redirect(url_for('rentalm_offers'))
 
@@ -474,13 +1036,13 @@ def delete_rentalm_offer(offer_id):
     offer = RentalOffer.query.get_or_404(offer_id)
 
     # حذف الصور المرفقة
-    remove_files(offer.images or [])
+    remove_files(offer_image_urls(offer))
 
     unit_type = offer.unit_type
     db.session.delete(offer)
+    add_log(f"حذف عرض إيجار وسط: {unit_type}")
     db.session.commit()
 
-    add_log(f"حذف عرض إيجار وسط: {unit_type}")
     flash("تم حذف العرض بنجاح ✅", "success")
     return redirect(url_for('rentalm_offers'))
 
@@ -488,6 +1050,7 @@ def delete_rentalm_offer(offer_id):
 # ================== تفاصيل الإيجار (موحّد) ==================
 @app.route('/rental_offers/<district>/<int:offer_id>')
 @login_required
+@conditional(lambda district, offer_id: offer_version(RentalOffer, district, offer_id))
 def rental_offer_detail(district, offer_id):
     offer = RentalOffer.query.filter_by(id=offer_id, district=district).first_or_404()
     # لتسهيل زر الرجوع في القالب
@@ -497,7 +1060,8 @@ def rental_offer_detail(district, offer_id):
         offer=offer,
         district=district,
         district_name='وسط' if district == 'وسط' else 'جنوب',
-        back_endpoint=back_endpoint
+        back_endpoint=back_endpoint,
+        changes=visible_history(offer)
     )
 
 
@@ -519,9 +1083,10 @@ def rentalw_offer_detail(offer_id):
 @app.route('/rentalw_offers')
 @login_required
 @permission_required('rentalw_offers_view')
+@conditional(lambda: offers_version(RentalOffer, 'جنوب'))
 def rentalw_offers():
-    offers = RentalOffer.query.filter_by(district='جنوب').order_by(RentalOffer.created_at.desc()).all()
-    return render_template('rental_offers/list.html', offers=offers, district='جنوب', district_name='جنوب')
+    page = offers_page(RentalOffer, 'جنوب')
+    return render_template('rental_offers/list.html', offers=page.items, page=page, district='جنوب', district_name='جنوب')
 
 
 @app.route('/rentalw_offers/add', methods=['GET', 'POST'])
@@ -529,13 +1094,8 @@ def rentalw_offers():
 @permission_required('rentalw_offers_add')
 def add_rentalw_offer():
     if request.method == 'POST':
-        images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    images.append(url)
+        images, variants, failed = collect_images()
+        flash_failed_uploads(failed)
         offer = RentalOffer(
             unit_type=request.form['unit_type'].strip()[:200],
             floor=request.form['floor'].strip()[:100],
@@ -548,13 +1108,14 @@ def add_rentalw_offer():
             notes=request.form.get('notes', '').strip()[:2100],
             status=request.form['status'].strip()[:50],
             district='جنوب',
-            images=images
+            images=images,
+            image_variants=variants
         )
 
         db.session.add(offer)
+        add_log(f"إضافة عرض إيجار جنوب: {offer.unit_type}")
         db.session.commit()
 
-        add_log(f"إضافة عرض إيجار جنوب: {offer.unit_type}")
         flash("تمت إضافة العرض بنجاح ✅", "success")
         return redirect(url_for('rentalw_offers'))
 
@@ -569,18 +1130,14 @@ def edit_rentalw_offer(offer_id):
 
     if request.method == 'POST':
         # معالجة الصور
-        new_images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    new_images.append(url)
+        new_images, new_variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         # إذا تم رفع صور جديدة فقط
         if new_images:
-            remove_files(offer.images or [])
+            remove_files(offer_image_urls(offer))
             offer.images = new_images
+            offer.image_variants = new_variants
 
         offer.unit_type = request.form['unit_type'].strip()[:200]
         offer.floor = request.form['floor'].strip()[:100]
@@ -594,8 +1151,8 @@ def edit_rentalw_offer(offer_id):
         offer.status = request.form['status'].strip()[:50]
         offer.updated_at = datetime.utcnow()
 
-        db.session.commit()
         add_log(f"تعديل عرض إيجار جنوب: {offer.unit_type}")
+        db.session.commit()
         flash("تم تحديث العرض بنجاح ✅", "success")
         return redirect(url_for('rentalw_offers'))
 
@@ -609,13 +1166,13 @@ def delete_rentalw_offer(offer_id):
     offer = RentalOffer.query.get_or_404(offer_id)
 
     # حذف الصور المرفقة
-    remove_files(offer.images or [])
+    remove_files(offer_image_urls(offer))
 
     unit_type = offer.unit_type
     db.session.delete(offer)
+    add_log(f"حذف عرض إيجار [جنوب]: {unit_type}")
     db.session.commit()
 
-    add_log(f"حذف عرض إيجار [جنوب]: {unit_type}")
     flash("تم حذف العرض بنجاح ✅", "success")
     return redirect(url_for('rentalw_offers'))
 
@@ -624,9 +1181,10 @@ def delete_rentalw_offer(offer_id):
 @app.route('/salesm_offers')
 @login_required
 @permission_required('salesm_offers_view')
+@conditional(lambda: offers_version(SaleOffer, 'وسط'))
 def salesm_offers():
-    offers = SaleOffer.query.filter_by(district='وسط').order_by(SaleOffer.created_at.desc()).all()
-    return render_template('sale_offers/list.html', offers=offers, district='وسط', district_name='وسط')
+    page = offers_page(SaleOffer, 'وسط')
+    return render_template('sale_offers/list.html', offers=page.items, page=page, district='وسط', district_name='وسط')
 
 
 @app.route('/salesm_offers/add', methods=['GET', 'POST'])
@@ -634,13 +1192,8 @@ def salesm_offers():
 @permission_required('salesm_offers_add')
 def add_salesm_offer():
     if request.method == 'POST':
-        images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    images.append(url)
+        images, variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         offer = SaleOffer(
             unit_type=request.form.get('unit_type', '').strip()[:200],
@@ -658,13 +1211,14 @@ def add_salesm_offer():
             notes=request.form.get('notes', '').strip()[:2100],
             district='وسط',
             images=images,
+            image_variants=variants,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow(),
             created_by=current_user.username
         )
         db.session.add(offer)
-        db.session.commit()
         add_log(f"إضافة عرض بيع وسط: {offer.unit_type}")
+        db.session.commit()
         flash("تمت إضافة العرض بنجاح ✅", "success")
         return redirect(url_for('salesm_offers'))
 
@@ -679,18 +1233,14 @@ def edit_salesm_offer(offer_id):
 
     if request.method == 'POST':
         # معالجة الصور
-        new_images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    new_images.append(url)
+        new_images, new_variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         # إذا تم رفع صور جديدة فقط
         if new_images:
-            remove_files(offer.images or [])
+            remove_files(offer_image_urls(offer))
             offer.images = new_images
+            offer.image_variants = new_variants
 
         offer.unit_type = request.form['unit_type'].strip()[:200]
         offer.floor = request.form['floor'].strip()[:200]
@@ -720,14 +1270,11 @@ def delete_salesm_offer(offer_id):
     offer = SaleOffer.query.get_or_404(offer_id)
 
     # حذف الصور المرفقة
-    remove_files(offer.images or [])
+    remove_files(offer_image_urls(offer))
 
     unit_type = offer.unit_type
     db.session.delete(offer)
-    db.session.commit()
-
-    log = Log(user=current_user.username, action=f"حذف عرض بيع وسط: {unit_type}")
-    db.session.add(log)
+    add_log(f"حذف عرض بيع وسط: {unit_type}")
     db.session.commit()
 
     flash("تم حذف العرض بنجاح ✅", "success")
@@ -735,13 +1282,15 @@ def delete_salesm_offer(offer_id):
 
 
 @app.route("/sales_offers/<district>/<int:offer_id>")
+@conditional(lambda district, offer_id: offer_version(SaleOffer, district, offer_id))
 def sales_offer_detail(district, offer_id):
     offer = SaleOffer.query.filter_by(id=offer_id, district=district).first_or_404()
     return render_template(
         "sale_offers/detail.html",
         offer=offer,
         district=district,
-        district_name="المنطقة الوسطى" if district == "وسط" else "المنطقة الجنوبية"
+        district_name="المنطقة الوسطى" if district == "وسط" else "المنطقة الجنوبية",
+        changes=visible_history(offer)
     )
 
 
@@ -749,9 +1298,10 @@ def sales_offer_detail(district, offer_id):
 @app.route('/salesw_offers')
 @login_required
 @permission_required('salesw_offers_view')
+@conditional(lambda: offers_version(SaleOffer, 'جنوب'))
 def salesw_offers():
-    offers = SaleOffer.query.filter_by(district='جنوب').order_by(SaleOffer.created_at.desc()).all()
-    return render_template('sale_offers/list.html', offers=offers, district='جنوب', district_name='جنوب')
+    page = offers_page(SaleOffer, 'جنوب')
+    return render_template('sale_offers/list.html', offers=page.items, page=page, district='جنوب', district_name='جنوب')
 
 
 @app.route('/salesw_offers/add', methods=['GET', 'POST'])
@@ -759,13 +1309,8 @@ def salesw_offers():
 @permission_required('salesw_offers_add')
 def add_salesw_offer():
     if request.method == 'POST':
-        images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    images.append(url)
+        images, variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         offer = SaleOffer(
             unit_type=request.form['unit_type'][200:],
@@ -782,6 +1327,7 @@ def add_salesw_offer():
             owner_type=request.form.get("owner_type") or request.form.get("owner_type_other"),
             status=request.form['status'][:50],
             images=images,
+            image_variants=variants,
             notes=request.form['notes'][:2100],
             created_by=current_user.username,
             created_at=datetime.utcnow(),
@@ -789,10 +1335,7 @@ def add_salesw_offer():
    )
 
         db.session.add(offer)
-        db.session.commit()
-
-        log = Log(user=current_user.username, action=f"إضافة عرض بيع جنوب: {offer.unit_type}")
-        db.session.add(log)
+        add_log(f"إضافة عرض بيع جنوب: {offer.unit_type}")
         db.session.commit()
 
         flash("تمت إضافة العرض بنجاح ✅", "success")
@@ -809,18 +1352,14 @@ def edit_salesw_offer(offer_id):
 
     if request.method == 'POST':
         # معالجة الصور
-        new_images = []
-        for i in range(1, 6):
-            file = request.files.get(f'image{i}')
-            if file and allowed_file(file.filename):
-                url = upload_file_to_s3(file)
-                if url:
-                    new_images.append(url)
+        new_images, new_variants, failed = collect_images()
+        flash_failed_uploads(failed)
 
         # إذا تم رفع صور جديدة فقط
         if new_images:
-            remove_files(offer.images or [])
+            remove_files(offer_image_urls(offer))
             offer.images = new_images
+            offer.image_variants = new_variants
 
         offer.unit_type = (request.form.get('unit_type') or '')[:200]
         offer.area = float(request.form['area']) if request.form.get('area') else None
@@ -839,11 +1378,7 @@ def edit_salesw_offer(offer_id):
 # تحديث وقت التعديل
         offer.updated_at = datetime.utcnow()
 
-        db.session.commit()
-
-
-        log = Log(user=current_user.username, action=f"تعديل عرض بيع جنوب: {offer.unit_type}")
-        db.session.add(log)
+        add_log(f"تعديل عرض بيع جنوب: {offer.unit_type}")
         db.session.commit()
 
         flash("تم تحديث العرض بنجاح ✅", "success")
@@ -859,14 +1394,11 @@ def delete_salesw_offer(offer_id):
     offer = SaleOffer.query.get_or_404(offer_id)
 
     # حذف الصور المرفقة
-    remove_files(offer.images or [])
+    remove_files(offer_image_urls(offer))
 
     unit_type = offer.unit_type
     db.session.delete(offer)
-    db.session.commit()
-
-    log = Log(user=current_user.username, action=f"حذف عرض بيع جنوب: {unit_type}")
-    db.session.add(log)
+    add_log(f"حذف عرض بيع جنوب: {unit_type}")
     db.session.commit()
 
     flash("تم حذف العرض بنجاح ✅", "success")
@@ -877,8 +1409,42 @@ def delete_salesw_offer(offer_id):
 @login_required
 @permission_required('orders_view')
 def orders():
-    all_orders = Orders.query.order_by(Orders.created_at.desc()).all()
-    return render_template('orders/list.html', requests=all_orders)
+    sort = request.args.get('sort', 'newest')
+    if sort not in ORDER_SORTS:
+        sort = 'newest'
+    _, sort_col, descending = ORDER_SORTS[sort]
+    query = apply_order_filters(Orders.query)
+    if sort_col is not Orders.created_at:
+        query = query.filter(sort_col.isnot(None))
+    page = keyset_paginate(query, sort_col, Orders.id, get_page_size('ORDERS_PAGE_SIZE'), descending=descending)
+    # المسوق نص حر في الطلب؛ الاقتراحات من أسماء الموظفين بدلاً من فحص كل الطلبات
+    marketers = [name for name, in db.session.query(Employee.name).order_by(Employee.name)]
+    return render_template('orders/list.html', requests=page.items, page=page, sort=sort, sorts=ORDER_SORTS,
+                           marketers=marketers)
+
+
+def orders_by_phone(phone_normalized):
+    """طلبات نفس الرقم الموحد، الأحدث أولاً (فهرس phone_normalized, created_at)"""
+    return Orders.query.filter(Orders.phone_normalized == phone_normalized).order_by(Orders.created_at.desc())
+
+
+@app.route('/orders/lookup')
+@login_required
+@permission_required('orders_view')
+def orders_lookup():
+    """طلبات العميل برقم جواله بأي صيغة كُتب، بصيغة JSON"""
+    phone = normalize_phone(request.args.get('phone', ''))
+    if phone is None:
+        return jsonify(error="invalid phone"), 400
+    return jsonify(phone=phone, orders=[
+        {
+            'id': order.id, 'customer_name': order.customer_name, 'unit_type': order.unit_type,
+            'area': order.area, 'price': order.price, 'location': order.location, 'marketer': order.marketer,
+            'created_at': order.created_at.isoformat() if order.created_at else None,
+            'url': url_for('edit_request', id=order.id),
+        }
+        for order in orders_by_phone(phone)
+    ])
 
 
 @app.route('/add_request', methods=['GET', 'POST'])
@@ -908,10 +1474,14 @@ def add_request():
             marketer=marketer,
             notes=notes
         )
+        previous = orders_by_phone(new_request.phone_normalized).count() if new_request.phone_normalized else 0
         db.session.add(new_request)
-        db.session.commit()
         add_log(f"إضافة طلب جديد: {customer_name}")
+        db.session.commit()
         flash("تم حفظ الطلب بنجاح ✅", "success")
+        if previous:
+            flash(f"⚠️ يوجد {previous} طلب سابق لنفس رقم الجوال", "warning")
+            return redirect(url_for('orders', phone=new_request.phone_normalized))
         return redirect(url_for('orders'))
 
     return render_template('orders/add.html')
@@ -930,8 +1500,8 @@ def edit_request(id):
         req.phone = request.form['phone'].strip()[:200]
         req.marketer = request.form['marketer'].strip()[:200]
         req.notes = request.form['notes'].strip()[:2100]
-        db.session.commit()
         add_log(f"تعديل الطلب: {req.customer_name}")
+        db.session.commit()
         flash("تم تعديل الطلب ✏️", "success")
         return redirect(url_for('orders'))
 
@@ -944,22 +1514,281 @@ def edit_request(id):
 def delete_request(id):
     req = Orders.query.get_or_404(id)
     db.session.delete(req)
-    db.session.commit()
     add_log(f"حذف الطلب: {req.customer_name}")
+    db.session.commit()
     flash("تم حذف الطلب 🗑", "danger")
     return redirect(url_for('orders'))
 
 
+# ================== المطابقة ==================
+OFFER_DISTRICTS = {'وسط': 'm', 'جنوب': 'w'}
+OFFER_PERMISSION_PREFIX = {'rental': 'rental', 'sale': 'sales'}
+
+
+def visible_offer_districts():
+    """المناطق التي يملك المستخدم صلاحية عرضها لكل نوع عرض: {'rental': [...], 'sale': [...]}"""
+    return {
+        kind: [d for d, code in OFFER_DISTRICTS.items() if current_user.has_permission(f"{prefix}{code}_offers_view")]
+        for kind, prefix in OFFER_PERMISSION_PREFIX.items()
+    }
+
+
+@app.route('/orders/<int:id>/matches')
+@login_required
+@permission_required('orders_view')
+def order_matches(id):
+    req = Orders.query.get_or_404(id)
+    k = min(request.args.get('k', 10, type=int), 50)
+    matches = matching.match_offers(req, k=k, sources=visible_offer_districts())
+    return render_template('orders/matches.html', req=req, matches=matches)
+
+
+@app.route('/offers/<kind>/<int:offer_id>/matches')
+@login_required
+@permission_required('orders_view')
+def offer_matches(kind, offer_id):
+    model = matching.OFFER_MODELS.get(kind)
+    if model is None:
+        abort(404)
+    offer = model.query.get_or_404(offer_id)
+    if offer.district not in visible_offer_districts()[kind]:
+        flash("🚫 ليس لديك صلاحية", "danger")
+        return redirect(url_for('dashboard'))
+    k = min(request.args.get('k', 10, type=int), 50)
+    return render_template('orders/offer_matches.html', kind=kind, offer=offer, matches=matching.match_orders(offer, k=k))
+
+
+# ================== صندوق الوارد ==================
+@app.template_global()
+def unread_notifications():
+    """عدد إشعارات المستخدم غير المقروءة (شريط التنقل)"""
+    if not current_user.is_authenticated:
+        return 0
+    return Notification.query.filter_by(employee_id=current_user.id, read_at=None).count()
+
+
+@app.route('/inbox')
+@login_required
+def inbox():
+    notifications = (
+        Notification.query.filter_by(employee_id=current_user.id)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(100)
+        .all()
+    )
+    return render_template('inbox.html', notifications=notifications)
+
+
+@app.route('/inbox/<int:notification_id>')
+@login_required
+def open_notification(notification_id):
+    notification = Notification.query.filter_by(id=notification_id, employee_id=current_user.id).first_or_404()
+    if notification.read_at is None:
+        notification.read_at = datetime.utcnow()
+        db.session.commit()
+    return redirect(notification.link or url_for('inbox'))
+
+
+@app.route('/inbox/read_all', methods=['POST'])
+@login_required
+def read_all_notifications():
+    Notification.query.filter_by(employee_id=current_user.id, read_at=None).update({'read_at': datetime.utcnow()})
+    db.session.commit()
+    return redirect(url_for('inbox'))
+
+
 # ================== السجلات ==================
 @app.route('/view_logs')
 @login_required
 @permission_required('logs_view')
 def view_logs():
-    logs_list = Log.query.order_by(Log.timestamp.desc()).limit(100).all()
-    return render_template('logs.html', logs=logs_list)
+    page = keyset_paginate(apply_log_filters(Log.query), Log.timestamp, Log.id, get_page_size('LOGS_PAGE_SIZE'))
+    users = [username for username, in db.session.query(Employee.username).order_by(Employee.username)]
+    return render_template('logs.html', logs=page.items, page=page, users=users, action_types=LOG_ACTION_TYPES)
+
+
+@app.route('/jobs/metrics')
+@login_required
+@permission_required('logs_view')
+def jobs_metrics():
+    """مقاييس طابور المهام (العدد بكل حالة، التأخر، الإنتاجية) بصيغة JSON"""
+    return jsonify(jobs.stats(request.args.get('window', 3600, type=int)))
+
+
+# ================== البحث ==================
+@app.route('/search')
+@login_required
+def search_results():
+    q = request.args.get('q', '').strip()
+    results = []
+    for obj, rank in search.search(q) if q else []:
+        if isinstance(obj, Orders):
+            allowed = current_user.has_permission('orders_view')
+        else:
+            prefix = 'rental' if isinstance(obj, RentalOffer) else 'sales'
+            code = 'm' if obj.district == 'وسط' else 'w'
+            allowed = current_user.has_permission(f"{prefix}{code}_offers_view")
+        if allowed:
+            results.append(obj)
+    return render_template('search.html', q=q, results=results)
 
 
 # ================== رفع الملفات ==================
+@app.route('/uploads/presign', methods=['POST'])
+@login_required
+def presign_uploads():
+    """
+    روابط رفع مباشرة إلى التخزين لعدة صور:
+    {"files": [{"name": ..., "content_type": ..., "size": ...}]}
+    """
+    files = (request.get_json(silent=True) or {}).get('files') or []
+    max_size = app.config['DIRECT_UPLOAD_MAX_SIZE']
+    uploads, rejected = [], []
+    storage = get_storage()
+    for f in files[:5]:
+        name = str(f.get('name') or '')
+        content_type = str(f.get('content_type') or 'application/octet-stream')
+        if not allowed_file(name) or not content_type.startswith('image/') or int(f.get('size') or 0) > max_size:
+            rejected.append(name)
+            continue
+        uploads.append(issue_direct_upload(storage, name, content_type))
+    return jsonify(uploads=uploads, rejected=rejected, max_size=max_size)
+
+
+@app.route('/uploads/direct/<token>', methods=['PUT'])
+@login_required
+def direct_upload(token):
+    """بديل S3 للتخزين المحلي / في الذاكرة: يستقبل جسم الطلب ويحفظه بالمفتاح الموجود في الرمز"""
+    storage = get_storage()
+    key = read_upload_token(token)
+    if key is None or storage.supports_presign:
+        abort(404)
+    # الحد على ما يُقرأ فعلاً وليس على Content-Length (قد يغيب مع chunked)
+    max_size = app.config['DIRECT_UPLOAD_MAX_SIZE']
+    data = request.stream.read(max_size + 1)
+    if len(data) > max_size:
+        abort(413)
+    if not imaging.is_image(data):
+        abort(415)
+    storage.put(io.BytesIO(data), key, request.content_type)
+    return '', 204
+
+
+OFFER_KINDS = {'rental': RentalOffer, 'sale': SaleOffer}
+
+
+def _enqueue_direct_uploads(session):
+    """
+    قبل commit: مهمة process_direct_uploads لكل عرض أُرفقت به ملفات مؤكدة في هذه المعاملة،
+    وجدولة حذف ما أُكد ولم يُرفق بأي عرض (تجاوز حد الخمس صور مثلاً).
+    """
+    keys = session.info.pop(STAGED_UPLOADS_KEY, None)
+    if not keys:
+        return
+    storage = get_storage()
+    by_url = {storage.url_for_key(key): key for key in keys}
+    # العروض الجديدة تحتاج id قبل إضافة المهمة، وقد يكون before_commit آخر (audit) عمل flush قبل هذا
+    session.flush()
+    attached = set()
+    for offer in list(session.identity_map.values()):
+        if not isinstance(offer, (RentalOffer, SaleOffer)):
+            continue
+        found = [by_url[url] for url in offer.images or [] if url in by_url]
+        if found:
+            kind = 'rental' if isinstance(offer, RentalOffer) else 'sale'
+            jobs.enqueue('process_direct_uploads', kind=kind, offer_id=offer.id, keys=found)
+            attached.update(found)
+    deletions.schedule([key for key in keys if key not in attached])
+
+
+def _discard_direct_uploads(session, previous_transaction):
+    session.info.pop(STAGED_UPLOADS_KEY, None)
+
+
+event.listen(db.session, 'before_commit', _enqueue_direct_uploads)
+event.listen(db.session, 'after_soft_rollback', _discard_direct_uploads)
+
+
+@jobs.task('process_direct_uploads')
+def process_direct_uploads(kind, offer_id, keys):
+    """
+    الملفات المرفوعة مباشرة تمر هنا بنفس مسار upload_images: التحقق أنها صورة، البصمة ومنع التكرار،
+    والنسخ المصغرة؛ ثم يُستبدل الرابط المؤقت في العرض بالرابط النهائي ويُجدول حذف الملف المؤقت.
+    ما ليس صورة يُزال من العرض. الملف الذي أزاله تعديل أو حذف للعرض قبل التنفيذ حرره remove_files
+    وجدول حذفه، فيُتخطى هنا.
+    """
+    storage = get_storage()
+    offer = db.session.get(OFFER_KINDS[kind], offer_id)
+    current = list(offer.images or []) if offer is not None else []
+    keys = [key for key in keys if storage.url_for_key(key) in current]
+    if not keys:
+        return
+
+    max_size = current_app.config['DIRECT_UPLOAD_MAX_SIZE']
+    images = []
+    for key in keys:
+        data = storage.get(key)
+        # Content-Type في الرفع المباشر يرسله المتصفح، فالمحتوى نفسه يُفحص هنا
+        if data is None or len(data) > max_size or not imaging.is_image(data):
+            continue
+        ext = key.rsplit('.', 1)[1].lower() if allowed_file(key) else 'jpg'
+        images.append((key, image_refs.hash_bytes(data), data, ext, mimetypes.guess_type(key)[0]))
+
+    urls, variants, failed = store_images(storage, images) if images else ([], [], [])
+    if failed:
+        # إعادة المهمة كاملة؛ لم يتغير شيء في العرض بعد، ورفع نفس البصمة مرة أخرى يكتب نفس المفاتيح
+        raise RuntimeError(f"Failed to store {len(failed)} of {len(images)} images")
+    stored = {name: result for (name, *_), result in zip(images, zip(urls, variants))}
+
+    by_url = {storage.url_for_key(key): key for key in keys}
+    image_variants = list(offer.image_variants or [])
+    image_variants += [None] * (len(current) - len(image_variants))
+    new_images, new_variants = [], []
+    for url, sizes in zip(current, image_variants):
+        key = by_url.get(url)
+        if key in stored:
+            url, sizes = stored[key]
+        elif key is not None:
+            continue  # ليس صورة
+        new_images.append(url)
+        new_variants.append(sizes)
+    offer.images = new_images
+    offer.image_variants = new_variants
+    deletions.schedule(keys)
+
+
+@app.route('/offers/<kind>/<int:offer_id>/images', methods=['POST'])
+@login_required
+def confirm_offer_images(kind, offer_id):
+    """
+    إرفاق صور رُفعت مباشرة بعرض موجود: {"tokens": [...], "replace": false}.
+    مع replace تُستبدل صور العرض كلها، وإلا تُضاف حتى 5 صور.
+    """
+    model, prefix = {'rental': (RentalOffer, 'rental'), 'sale': (SaleOffer, 'sales')}.get(kind, (None, None))
+    if model is None:
+        abort(404)
+    offer = model.query.get_or_404(offer_id)
+    code = 'm' if offer.district == 'وسط' else 'w'
+    if not current_user.has_permission(f"{prefix}{code}_offers_edit"):
+        return jsonify(error="forbidden"), 403
+
+    body = request.get_json(silent=True) or {}
+    urls, variants, failed = confirm_uploads(body.get('tokens') or [])
+    if urls:
+        if body.get('replace'):
+            remove_files(offer_image_urls(offer))
+            images, image_variants = [], []
+        else:
+            images = list(offer.images or [])
+            image_variants = list(offer.image_variants or [])
+            image_variants += [None] * (len(images) - len(image_variants))
+        offer.images = (images + urls)[:5]
+        offer.image_variants = (image_variants + variants)[:5]
+        add_log(f"إضافة صور لعرض: {offer.unit_type}")
+        db.session.commit()
+    return jsonify(images=offer.images or [], failed=failed), (200 if urls or not failed else 400)
+
+
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
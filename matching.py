@@ -0,0 +1,265 @@
+"""
+مطابقة الطلبات مع العروض.
+
+1. تصفية أولية في قاعدة البيانات: مدى السعر والمساحة حول المطلوب (فهارس (price, area)
+   للعروض و(price_min, price_max) / (area_min, area_max) للطلبات)، مع جلب أعمدة
+   المطابقة فقط بدلاً من كائنات ORM كاملة.
+2. تقييم المرشحين دفعة واحدة بمصفوفات NumPy:
+   - السعر والمساحة: 1 داخل مدى الطلب ("200-300") وتنخفض خطياً إلى 0 عند حد السماحية.
+   - نوع الوحدة: 1 للتطابق بعد التطبيع، 0.6 إذا احتوى أحدهما الآخر ("شقة" / "شقة مفروشة").
+   - الموقع: 1 إذا ورد أحد أحياء الطلب في موقع العرض أو منطقته.
+   الأوزان تُوزع على الحقول المعروفة فقط؛ طلب بدون سعر لا يُقيّم بالسعر.
+3. أفضل k بـ argpartition بدلاً من ترتيب كل المرشحين.
+
+match_offers(order) ← أفضل العروض لطلب، match_orders(offer) ← أفضل الطلبات لعرض.
+"""
+import numpy as np
+from sqlalchemy import select, or_, and_
+
+from extensions import db
+from models import RentalOffer, SaleOffer, Orders
+from search import normalize_arabic, tokenize
+
+OFFER_MODELS = {'rental': RentalOffer, 'sale': SaleOffer}
+
+WEIGHTS = {'price': 0.4, 'area': 0.25, 'unit_type': 0.2, 'location': 0.15}
+
+# كلمات لا تميز موقعاً عن غيره
+_LOCATION_STOPWORDS = {'حي', 'شارع', 'طريق', 'مدينه', 'منطقه', 'قرب', 'بجوار', 'او', 'في'}
+
+_config = {'price_tolerance': 0.25, 'area_tolerance': 0.3, 'max_candidates': 20000}
+
+
+def _location_tokens(value):
+    return [t for t in tokenize(value) if len(t) > 1 and t not in _LOCATION_STOPWORDS]
+
+
+def _range(column, target, tolerance):
+    """العروض داخل مدى الطلب (low, high) موسعاً بالسماحية"""
+    if target is None:
+        return None
+    low, high = target
+    if high == np.inf:
+        return column >= low * (1 - tolerance)
+    return column.between(low * (1 - tolerance), high * (1 + tolerance))
+
+
+def _fetch(model, columns, conditions):
+    stmt = select(*columns).where(and_(*[c for c in conditions if c is not None]))
+    stmt = stmt.order_by(model.id.desc()).limit(_config['max_candidates'])
+    # Core بدلاً من ORM: صفوف tuples دون طبقة تحميل الكائنات
+    return db.session.connection().execute(stmt).all()
+
+
+# ================== دوال التقييم (NumPy) ==================
+def closeness(values, low, high, tolerance):
+    """
+    1 داخل المدى [low, high]، وتنخفض خطياً إلى 0 عند low*(1-tolerance) أو high*(1+tolerance).
+    low = 0 أو high = inf لمدى مفتوح ("أقل من 500")؛ القيم المجهولة (nan) تأخذ 0.5.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        below = np.where(values < low, (low - values) / (low * tolerance), 0.0)
+        above = np.where(values > high, (values - high) / (high * tolerance), 0.0)
+    score = np.clip(1 - below - above, 0, 1)
+    return np.where(np.isnan(values) | np.isnan(low) | np.isnan(high), 0.5, score)
+
+
+def unit_type_similarity(values, target):
+    """values: مصفوفة نصوص مطبعة"""
+    if not target:
+        return np.zeros(len(values))
+    contains = (np.char.find(values, target) >= 0) | ((np.char.find(target, values) >= 0) & (values != ''))
+    return np.where(values == target, 1.0, np.where(contains, 0.6, 0.0))
+
+
+def location_similarity(texts, tokens):
+    """1 إذا ورد أي من tokens في النص المطبع"""
+    found = np.zeros(len(texts), dtype=bool)
+    for token in tokens:
+        found |= np.char.find(texts, token) >= 0
+    return found.astype(float)
+
+
+def score(prices, areas, unit_types, locations, target):
+    """
+    target: {'price', 'area', 'unit_type', 'location_tokens'} لطرف الاستعلام.
+    يرجع مصفوفة درجات بين 0 و1 بطول المرشحين.
+    """
+    parts, weights = [], []
+    if target['price'] is not None:
+        parts.append(closeness(prices, *target['price'], _config['price_tolerance']))
+        weights.append(WEIGHTS['price'])
+    if target['area'] is not None:
+        parts.append(closeness(areas, *target['area'], _config['area_tolerance']))
+        weights.append(WEIGHTS['area'])
+    if target['unit_type']:
+        parts.append(unit_type_similarity(unit_types, target['unit_type']))
+        weights.append(WEIGHTS['unit_type'])
+    if target['location_tokens']:
+        parts.append(location_similarity(locations, target['location_tokens']))
+        weights.append(WEIGHTS['location'])
+    if not parts:
+        return np.zeros(len(prices))
+    weights = np.array(weights) / sum(weights)
+    return np.stack(parts).T @ weights
+
+
+def top_k(scores, k):
+    """مواقع أعلى k درجة مرتبة تنازلياً"""
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+def _bounds(low, high):
+    """(الأدنى، الأعلى) لمدى طلب؛ الطرف المفتوح 0 أو inf، وNone إذا لم يُحدد شيء"""
+    if low is None and high is None:
+        return None
+    return (low or 0.0, np.inf if high is None else high)
+
+
+def make_target(price_range, area_range, unit_type, location):
+    """طلب بالصيغة التي تستعملها score؛ المديان (الأدنى، الأعلى) كما في Orders.price_min / price_max"""
+    return {
+        'price': _bounds(*price_range),
+        'area': _bounds(*area_range),
+        'unit_type': normalize_arabic(unit_type).strip(),
+        'location_tokens': _location_tokens(location),
+    }
+
+
+def _numbers(values, fill=np.nan):
+    """مصفوفة أرقام؛ القيم المجهولة (None أو صفر أو أقل) تأخذ fill"""
+    numbers = np.array(list(values), dtype=float)
+    numbers[np.isnan(numbers) | (numbers <= 0)] = fill
+    return numbers
+
+
+def _texts(values):
+    """مصفوفة نصوص مطبعة؛ كل قيمة مختلفة تُطبّع مرة واحدة (أنواع الوحدات والمناطق تتكرر كثيراً)"""
+    values = list(values)
+    normalized = {v: normalize_arabic(v).strip() for v in set(values)}
+    return np.array([normalized[v] for v in values], dtype=str)
+
+
+# ================== واجهة المطابقة ==================
+def match_offers(order, k=10, sources=None):
+    """
+    أفضل k عرضاً لطلب.
+    sources: {'rental': [المناطق], 'sale': [المناطق]} المسموح بعرضها؛ None = الكل.
+    يرجع قائمة dict: kind, id, score (0-100), unit_type, price, area, district, location.
+    """
+    target = make_target(
+        (order.price_min, order.price_max), (order.area_min, order.area_max), order.unit_type, order.location
+    )
+    sources = sources if sources is not None else {kind: None for kind in OFFER_MODELS}
+
+    kinds, columns = [], [[] for _ in range(6)]
+    for kind, districts in sources.items():
+        if districts is not None and not districts:
+            continue
+        model = OFFER_MODELS[kind]
+        conditions = [
+            _range(model.price, target['price'], _config['price_tolerance']),
+            _range(model.area, target['area'], _config['area_tolerance']),
+            model.district.in_(districts) if districts is not None else None,
+        ]
+        rows = _fetch(model, (model.id, model.price, model.area, model.unit_type, model.district, model.location), conditions)
+        if rows:
+            kinds += [kind] * len(rows)
+            for values, column in zip(columns, zip(*rows)):
+                values.extend(column)
+    if not kinds:
+        return []
+
+    ids, prices, areas, unit_types, districts, locations = columns
+    # الموقع يُقارن مع نص "الموقع + المنطقة" للعرض
+    scores = score(
+        _numbers(prices), _numbers(areas), _texts(unit_types),
+        np.char.add(np.char.add(_texts(locations), ' '), _texts(districts)),
+        target,
+    )
+    return [
+        {
+            'kind': kinds[i], 'id': ids[i], 'score': round(float(scores[i]) * 100), 'price': prices[i],
+            'area': areas[i], 'unit_type': unit_types[i], 'district': districts[i], 'location': locations[i],
+        }
+        for i in top_k(scores, k)
+    ]
+
+
+def _bound_arrays(lows, highs):
+    """مصفوفتا حدود مديات الطلبات؛ الطرف المفتوح 0 أو inf، والمدى غير المحدد nan"""
+    lows, highs = _numbers(lows), _numbers(highs)
+    unknown = np.isnan(lows) & np.isnan(highs)
+    lows, highs = np.nan_to_num(lows, nan=0.0), np.where(np.isnan(highs), np.inf, highs)
+    lows[unknown] = highs[unknown] = np.nan
+    return lows, highs, unknown
+
+
+def score_orders(price, area, unit_type, text, price_bounds, area_bounds, unit_types, tokens):
+    """
+    درجات (0-1) عرض واحد مقابل مجموعة طلبات: نفس دوال التقييم لكن المدى في كل صف (مدى الطلب)
+    والقيمة ثابتة (العرض). price / area للعرض (None إذا لم يُعرف)، unit_type و text (الموقع
+    والمنطقة) مطبعان؛ price_bounds / area_bounds من _bound_arrays، unit_types مصفوفة أنواع
+    الطلبات المطبعة، tokens كلمات موقع كل طلب.
+    """
+    parts, weights = [], []
+    for value, (lows, highs, unknown), name in ((price, price_bounds, 'price'), (area, area_bounds, 'area')):
+        if value is None:
+            continue
+        parts.append(closeness(value, lows, highs, _config[f'{name}_tolerance']))
+        weights.append(np.where(unknown, 0.0, WEIGHTS[name]))
+    parts.append(unit_type_similarity(unit_types, unit_type))
+    weights.append(np.full(len(unit_types), WEIGHTS['unit_type']))
+    parts.append(np.array([float(any(t in text for t in ts)) for ts in tokens]))
+    weights.append(np.array([WEIGHTS['location'] if ts else 0.0 for ts in tokens]))
+
+    parts, weights = np.stack(parts), np.stack(weights)
+    totals = weights.sum(axis=0)
+    return np.divide((parts * weights).sum(axis=0), totals, out=np.zeros(len(unit_types)), where=totals > 0)
+
+
+def match_orders(offer, k=10):
+    """أفضل k طلباً لعرض (إيجار أو بيع)؛ يرجع قائمة dict: id, score, customer_name, ..."""
+    price = offer.price if offer.price and offer.price > 0 else None
+    area = offer.area if offer.area and offer.area > 0 else None
+    columns = (
+        Orders.id, Orders.price, Orders.area, Orders.unit_type, Orders.location, Orders.customer_name,
+        Orders.price_min, Orders.price_max, Orders.area_min, Orders.area_max,
+    )
+    # الطلب [L, H] يقبل العرض p إذا L*(1-t) <= p <= H*(1+t)، أي L <= p/(1-t) و H >= p/(1+t)؛
+    # الطرف غير المحدد لا يقيّد، وطلب بدون سعر أو مساحة يبقى مرشحاً لكل العروض
+    conditions = []
+    for low, high, value, tolerance in (
+        (Orders.price_min, Orders.price_max, price, _config['price_tolerance']),
+        (Orders.area_min, Orders.area_max, area, _config['area_tolerance']),
+    ):
+        if value is not None:
+            conditions.append(or_(low.is_(None), low <= value / (1 - tolerance)))
+            conditions.append(or_(high.is_(None), high >= value / (1 + tolerance)))
+    rows = _fetch(Orders, columns, conditions)
+    if not rows:
+        return []
+
+    ids, prices, areas, unit_types, locations, customer_names, price_mins, price_maxs, area_mins, area_maxs = zip(*rows)
+    scores = score_orders(
+        price, area, normalize_arabic(offer.unit_type).strip(), normalize_arabic(f"{offer.location} {offer.district}"),
+        _bound_arrays(price_mins, price_maxs), _bound_arrays(area_mins, area_maxs),
+        _texts(unit_types), [_location_tokens(location) for location in locations],
+    )
+    return [
+        {
+            'id': ids[i], 'score': round(float(scores[i]) * 100), 'price': prices[i], 'area': areas[i],
+            'unit_type': unit_types[i], 'location': locations[i], 'customer_name': customer_names[i],
+        }
+        for i in top_k(scores, k)
+    ]
+
+
+def init_app(app):
+    _config['price_tolerance'] = app.config['MATCH_PRICE_TOLERANCE']
+    _config['area_tolerance'] = app.config['MATCH_AREA_TOLERANCE']
+    _config['max_candidates'] = app.config['MATCH_MAX_CANDIDATES']
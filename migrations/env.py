@@ -20,11 +20,11 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # استيراد النماذج
-from models import Employee, Log, Property, RentalOffer, SaleOffer, RentalMOffer, RentalWOffer, Orders
+from models import Employee, Log, Property, RentalOffer, SaleOffer, RentalMOffer, RentalWOffer, Orders, DashboardStats, FailedDeletion, StoredObject, Job, EntityChange, Notification
 
 # Metadata لجميع الجداول
 target_metadata = MetaData()
-for cls in [Employee, Log, Property, RentalOffer, SaleOffer, RentalMOffer, RentalWOffer, Orders]:
+for cls in [Employee, Log, Property, RentalOffer, SaleOffer, RentalMOffer, RentalWOffer, Orders, DashboardStats, FailedDeletion, StoredObject, Job, EntityChange, Notification]:
     target_metadata._add_table(cls.__table__.name, cls.__table__.schema, cls.__table__)
 
 # Offline
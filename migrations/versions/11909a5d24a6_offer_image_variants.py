@@ -0,0 +1,26 @@
+"""offer image variants
+
+Revision ID: 11909a5d24a6
+Revises: 29eda34fdecf
+Create Date: 2026-10-18 14:48:51.337920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '11909a5d24a6'
+down_revision = '29eda34fdecf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('rental_offer', sa.Column('image_variants', sa.JSON(), nullable=True))
+    op.add_column('sale_offer', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('sale_offer', 'image_variants')
+    op.drop_column('rental_offer', 'image_variants')
@@ -0,0 +1,31 @@
+"""failed deletion
+
+Revision ID: 29eda34fdecf
+Revises: bb1f49488a3b
+Create Date: 2026-10-18 14:02:19.664102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '29eda34fdecf'
+down_revision = 'bb1f49488a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('failed_deletion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=1024), nullable=False),
+    sa.Column('error', sa.String(length=500), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('failed_deletion')
@@ -0,0 +1,53 @@
+"""hot path indexes
+
+Revision ID: 7d222a67acf7
+Revises: 69d80df58b86
+Create Date: 2026-10-18 10:05:12.431870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d222a67acf7'
+down_revision = '69d80df58b86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CONCURRENTLY حتى لا تُقفل الجداول أثناء بناء الفهارس، ويتطلب التنفيذ خارج المعاملة؛
+    # خيارات postgresql_* تُتجاهل في SQLite
+    with op.get_context().autocommit_block():
+        # صفحات قوائم العروض: منطقة واحدة، الأحدث أولاً (keyset)
+        op.create_index('ix_rental_offer_district_created_at', 'rental_offer',
+                        ['district', sa.text('created_at DESC'), sa.text('id DESC')],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_sale_offer_district_created_at', 'sale_offer',
+                        ['district', sa.text('created_at DESC'), sa.text('id DESC')],
+                        postgresql_concurrently=True, if_not_exists=True)
+        # فلاتر الحالة والسعر داخل المنطقة
+        op.create_index('ix_rental_offer_district_status_price', 'rental_offer', ['district', 'status', 'price'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_sale_offer_district_status_price', 'sale_offer', ['district', 'status', 'price'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        # ترتيب الطلبات والسجلات بالتاريخ
+        op.create_index('ix_orders_created_at', 'orders', ['created_at'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_log_timestamp', 'log', ['timestamp'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_log_timestamp', table_name='log', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_orders_created_at', table_name='orders', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_sale_offer_district_status_price', table_name='sale_offer',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_rental_offer_district_status_price', table_name='rental_offer',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_sale_offer_district_created_at', table_name='sale_offer',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_rental_offer_district_created_at', table_name='rental_offer',
+                      postgresql_concurrently=True, if_exists=True)
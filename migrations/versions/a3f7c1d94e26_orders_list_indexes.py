@@ -0,0 +1,54 @@
+"""orders list indexes
+
+Revision ID: a3f7c1d94e26
+Revises: f5d2b8c61e93
+Create Date: 2026-10-18 21:14:37.502913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f7c1d94e26'
+down_revision = 'f5d2b8c61e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    if postgresql:
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # خيارات postgresql_* تُتجاهل في SQLite
+    with op.get_context().autocommit_block():
+        # تصفح قائمة الطلبات بالمؤشر لكل ترتيب، وفلتر المسوق مع الفترة
+        op.create_index('ix_orders_created_at_id', 'orders', ['created_at', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        # ix_orders_created_at_id يغطي الترتيب والفلترة بـ created_at وحده
+        op.drop_index('ix_orders_created_at', table_name='orders', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_orders_price_min_id', 'orders', ['price_min', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_orders_area_min_id', 'orders', ['area_min', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_orders_marketer_created_at', 'orders', ['marketer', 'created_at', 'id'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        if postgresql:
+            # بحث جزئي (ILIKE '%...%') في نوع العقار والأحياء عبر trigram
+            op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_unit_type_trgm '
+                       'ON orders USING gin (unit_type gin_trgm_ops)')
+            op.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_location_trgm '
+                       'ON orders USING gin (location gin_trgm_ops)')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        if op.get_bind().dialect.name == 'postgresql':
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_orders_location_trgm')
+            op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_orders_unit_type_trgm')
+        op.drop_index('ix_orders_marketer_created_at', table_name='orders',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_orders_area_min_id', table_name='orders', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_orders_price_min_id', table_name='orders', postgresql_concurrently=True, if_exists=True)
+        op.create_index('ix_orders_created_at', 'orders', ['created_at'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index('ix_orders_created_at_id', table_name='orders', postgresql_concurrently=True, if_exists=True)
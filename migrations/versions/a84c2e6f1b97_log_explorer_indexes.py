@@ -0,0 +1,32 @@
+"""log explorer indexes
+
+Revision ID: a84c2e6f1b97
+Revises: f1a7d3e58c20
+Create Date: 2026-10-18 17:20:54.118302
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a84c2e6f1b97'
+down_revision = 'f1a7d3e58c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # log مقسّم في PostgreSQL، وCONCURRENTLY غير مدعوم على الجدول الأب؛
+    # الفهرس يُنشأ على كل الأقسام ويرثه كل قسم جديد
+    op.create_index('ix_log_user_timestamp', 'log', ['user', 'timestamp'], if_not_exists=True)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # بحث جزئي في نص العملية (ILIKE '%...%') عبر trigram
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX IF NOT EXISTS ix_log_action_trgm ON log USING gin (action gin_trgm_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_log_action_trgm')
+    op.drop_index('ix_log_user_timestamp', table_name='log', if_exists=True)
@@ -0,0 +1,72 @@
+"""fulltext search
+
+Revision ID: b41c9e2d7f30
+Revises: 7d222a67acf7
+Create Date: 2026-10-18 11:42:37.908114
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41c9e2d7f30'
+down_revision = '7d222a67acf7'
+branch_labels = None
+depends_on = None
+
+
+# نفس الحقول في search.SEARCH_FIELDS
+TABLES = {
+    'rental_offer': ['unit_type', 'details', 'notes', 'location', 'marketer'],
+    'sale_offer': ['unit_type', 'details', 'notes', 'location', 'marketer'],
+    'orders': ['unit_type', 'notes', 'location', 'marketer'],
+}
+
+
+def normalized_vector(columns):
+    """
+    نفس تطبيع search.normalize_arabic لكن بلغة SQL:
+    حذف التشكيل والتطويل ثم توحيد الألف والياء والواو والتاء المربوطة.
+    """
+    body = " || ' ' || ".join(f"coalesce({c}, '')" for c in columns)
+    return (
+        "to_tsvector('simple', lower(translate("
+        f"regexp_replace({body}, '[\\u064B-\\u0652\\u0670\\u0640]', '', 'g'), "
+        "'أإآٱىئؤة', 'ااااييوه')))"
+    )
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite: جدول FTS5 يُملأ من أحداث search.py (أو flask search-reindex للسجلات الموجودة)
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts "
+            "USING fts5(entity UNINDEXED, entity_id UNINDEXED, body)"
+        )
+        return
+
+    for table, columns in TABLES.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({normalized_vector(columns)}) STORED"
+        )
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search_vector "
+                f"ON {table} USING gin (search_vector)"
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.execute('DROP TABLE IF EXISTS search_fts')
+        return
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_search_vector")
+
+    for table in TABLES:
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
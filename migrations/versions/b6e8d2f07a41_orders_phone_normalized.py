@@ -0,0 +1,99 @@
+"""orders phone normalized
+
+Revision ID: b6e8d2f07a41
+Revises: a3f7c1d94e26
+Create Date: 2026-10-18 21:48:05.671209
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e8d2f07a41'
+down_revision = 'a3f7c1d94e26'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+# نسخة من phones.normalize_phone كما كانت عند كتابة هذه الهجرة: الهجرة تبقى تعطي
+# نفس النتيجة مهما تغير كود التطبيق لاحقاً
+_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+_PHONE = re.compile(r'\+?\d[\d\s\-().]{6,}\d')
+_SEPARATORS = re.compile(r'[,،/;؛|\n]+|\s+(?:أو|او|و)\s+')
+
+
+def _e164(text):
+    found = _PHONE.search(text)
+    if not found:
+        return None
+    text = found.group()
+    digits = re.sub(r'\D', '', text)
+    if text.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith('966'):
+        pass
+    elif digits.startswith('0'):
+        digits = '966' + digits[1:]
+    elif len(digits) == 9 and digits.startswith('5'):
+        digits = '966' + digits
+    else:
+        return None
+    if digits.startswith('966') and len(digits) != 12:
+        return None
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def normalize_phone(value):
+    for part in _SEPARATORS.split(str(value or '').translate(_DIGITS)):
+        words = part.split()
+        for start in range(len(words)):
+            found = None
+            for end in range(start + 1, len(words) + 1):
+                if end > start + 1 and words[end - 1].startswith('+'):
+                    break
+                found = _e164(' '.join(words[start:end])) or found
+            if found:
+                return found
+    return None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phone_normalized', sa.String(length=20), nullable=True))
+
+    # تعبئة الرقم الموحد للطلبات الموجودة
+    connection = op.get_bind()
+    orders = sa.table('orders', sa.column('id', sa.Integer), sa.column('phone', sa.String),
+                      sa.column('phone_normalized', sa.String))
+    update = (
+        orders.update()
+        .where(orders.c.id == sa.bindparam('order_id'))
+        .values(phone_normalized=sa.bindparam('phone_normalized'))
+    )
+    rows = connection.execute(
+        sa.select(orders.c.id, orders.c.phone).where(orders.c.phone.isnot(None)).order_by(orders.c.id)
+    ).all()
+    for start in range(0, len(rows), BATCH_SIZE):
+        params = [
+            {'order_id': order_id, 'phone_normalized': normalize_phone(phone)}
+            for order_id, phone in rows[start:start + BATCH_SIZE]
+        ]
+        connection.execute(update, params)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_phone_normalized', ['phone_normalized', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_phone_normalized')
+        batch_op.drop_column('phone_normalized')
@@ -0,0 +1,38 @@
+"""entity change history
+
+Revision ID: b93e5d07c4a2
+Revises: a84c2e6f1b97
+Create Date: 2026-10-18 17:55:09.640281
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b93e5d07c4a2'
+down_revision = 'a84c2e6f1b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('entity_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.String(length=10), nullable=False),
+    sa.Column('changes', sa.JSON(), nullable=True),
+    sa.Column('user', sa.String(length=150), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('entity_change', schema=None) as batch_op:
+        batch_op.create_index('ix_entity_change_entity', ['entity_type', 'entity_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('entity_change', schema=None) as batch_op:
+        batch_op.drop_index('ix_entity_change_entity')
+
+    op.drop_table('entity_change')
@@ -0,0 +1,24 @@
+"""employee auth version
+
+Revision ID: bb1f49488a3b
+Revises: c5b054c830ea
+Create Date: 2026-10-18 13:15:48.120377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bb1f49488a3b'
+down_revision = 'c5b054c830ea'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('employee', sa.Column('auth_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('employee', 'auth_version')
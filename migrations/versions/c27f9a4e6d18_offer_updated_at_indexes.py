@@ -0,0 +1,33 @@
+"""offer updated_at indexes
+
+Revision ID: c27f9a4e6d18
+Revises: b93e5d07c4a2
+Create Date: 2026-10-18 18:31:46.502913
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27f9a4e6d18'
+down_revision = 'b93e5d07c4a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # max(updated_at) لكل منطقة (ETag صفحات القوائم) يصبح قراءة واحدة من نهاية الفهرس؛
+    # خيارات postgresql_* تُتجاهل في SQLite
+    with op.get_context().autocommit_block():
+        op.create_index('ix_rental_offer_district_updated_at', 'rental_offer', ['district', 'updated_at'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_sale_offer_district_updated_at', 'sale_offer', ['district', 'updated_at'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_sale_offer_district_updated_at', table_name='sale_offer',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_rental_offer_district_updated_at', table_name='rental_offer',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,47 @@
+"""dashboard stats
+
+Revision ID: c5b054c830ea
+Revises: b41c9e2d7f30
+Create Date: 2026-10-18 12:30:04.551893
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5b054c830ea'
+down_revision = 'b41c9e2d7f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('dashboard_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('employees_count', sa.Integer(), nullable=False),
+    sa.Column('rentalm_offers_count', sa.Integer(), nullable=False),
+    sa.Column('rentalw_offers_count', sa.Integer(), nullable=False),
+    sa.Column('salesm_offers_count', sa.Integer(), nullable=False),
+    sa.Column('salesw_offers_count', sa.Integer(), nullable=False),
+    sa.Column('orders_count', sa.Integer(), nullable=False),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # تعبئة الصف الوحيد بالأعداد الحالية
+    op.execute("""
+        INSERT INTO dashboard_stats (id, employees_count, rentalm_offers_count, rentalw_offers_count,
+                                     salesm_offers_count, salesw_offers_count, orders_count, reconciled_at)
+        SELECT 1,
+               (SELECT COUNT(*) FROM employee),
+               (SELECT COUNT(*) FROM rental_offer WHERE district = 'وسط'),
+               (SELECT COUNT(*) FROM rental_offer WHERE district = 'جنوب'),
+               (SELECT COUNT(*) FROM sale_offer WHERE district = 'وسط'),
+               (SELECT COUNT(*) FROM sale_offer WHERE district = 'جنوب'),
+               (SELECT COUNT(*) FROM orders),
+               CURRENT_TIMESTAMP
+    """)
+
+
+def downgrade():
+    op.drop_table('dashboard_stats')
@@ -0,0 +1,36 @@
+"""stored object refcounts
+
+Revision ID: d3a8f1c27e44
+Revises: 11909a5d24a6
+Create Date: 2026-10-18 15:10:42.318870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a8f1c27e44'
+down_revision = '11909a5d24a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_object',
+    sa.Column('key', sa.String(length=300), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('variant', sa.String(length=20), nullable=False),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('stored_object', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stored_object_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stored_object', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stored_object_content_hash'))
+
+    op.drop_table('stored_object')
@@ -0,0 +1,36 @@
+"""match price area indexes
+
+Revision ID: d81b6e3f4a57
+Revises: c27f9a4e6d18
+Create Date: 2026-10-18 19:52:10.118406
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81b6e3f4a57'
+down_revision = 'c27f9a4e6d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # التصفية الأولية لمطابقة الطلبات والعروض (matching.py): مدى السعر ثم المساحة؛
+    # خيارات postgresql_* تُتجاهل في SQLite
+    with op.get_context().autocommit_block():
+        op.create_index('ix_rental_offer_price_area', 'rental_offer', ['price', 'area'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_sale_offer_price_area', 'sale_offer', ['price', 'area'],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_orders_price_area', 'orders', ['price', 'area'],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_price_area', table_name='orders', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_sale_offer_price_area', table_name='sale_offer',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_rental_offer_price_area', table_name='rental_offer',
+                      postgresql_concurrently=True, if_exists=True)
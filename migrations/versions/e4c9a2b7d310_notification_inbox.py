@@ -0,0 +1,44 @@
+"""notification inbox
+
+Revision ID: e4c9a2b7d310
+Revises: d81b6e3f4a57
+Create Date: 2026-10-18 20:34:27.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c9a2b7d310'
+down_revision = 'd81b6e3f4a57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('message', sa.String(length=500), nullable=False),
+    sa.Column('link', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employee.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_employee_read', ['employee_id', 'read_at'], unique=False)
+
+    with op.batch_alter_table('entity_change', schema=None) as batch_op:
+        batch_op.create_index('ix_entity_change_type_timestamp', ['entity_type', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('entity_change', schema=None) as batch_op:
+        batch_op.drop_index('ix_entity_change_type_timestamp')
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_employee_read')
+
+    op.drop_table('notification')
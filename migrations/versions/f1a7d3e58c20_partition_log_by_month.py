@@ -0,0 +1,85 @@
+"""partition log by month
+
+Revision ID: f1a7d3e58c20
+Revises: e6b2c4a9d015
+Create Date: 2026-10-18 16:48:30.771204
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7d3e58c20'
+down_revision = 'e6b2c4a9d015'
+branch_labels = None
+depends_on = None
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def upgrade():
+    # التقسيم خاص بـ PostgreSQL؛ في SQLite يبقى الجدول كما هو ويُحذف القديم بـ DELETE
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    oldest = bind.execute(sa.text('SELECT min("timestamp") FROM log')).scalar()
+    current = date.today().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest else current
+
+    op.execute('ALTER TABLE log RENAME TO log_unpartitioned')
+    op.execute('DROP INDEX IF EXISTS ix_log_timestamp')
+    # مفتاح الجدول المقسّم يجب أن يتضمن عمود التقسيم
+    op.execute("""
+        CREATE TABLE log (
+            id integer NOT NULL DEFAULT nextval('log_id_seq'),
+            "user" varchar(150),
+            action varchar(500),
+            "timestamp" timestamp without time zone NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+    op.execute('ALTER SEQUENCE log_id_seq OWNED BY log.id')
+
+    while month <= add_months(current, 3):
+        op.execute(
+            f"CREATE TABLE log_p{month.year:04d}_{month.month:02d} PARTITION OF log "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+        month = add_months(month, 1)
+    # أي سطر خارج الأقسام (مثلاً إذا تأخر flask logs-partitions) لا يفشل إدخاله
+    op.execute('CREATE TABLE log_default PARTITION OF log DEFAULT')
+    op.execute('CREATE INDEX ix_log_timestamp ON log ("timestamp")')
+
+    op.execute("""
+        INSERT INTO log (id, "user", action, "timestamp")
+        SELECT id, "user", action, COALESCE("timestamp", now()) FROM log_unpartitioned
+    """)
+    op.execute('DROP TABLE log_unpartitioned')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE log RENAME TO log_partitioned')
+    op.execute('DROP INDEX IF EXISTS ix_log_timestamp')
+    op.execute("""
+        CREATE TABLE log (
+            id integer NOT NULL DEFAULT nextval('log_id_seq') PRIMARY KEY,
+            "user" varchar(150),
+            action varchar(500),
+            "timestamp" timestamp without time zone
+        )
+    """)
+    op.execute('ALTER SEQUENCE log_id_seq OWNED BY log.id')
+    op.execute('INSERT INTO log SELECT id, "user", action, "timestamp" FROM log_partitioned')
+    op.execute('DROP TABLE log_partitioned')
+    op.execute('CREATE INDEX ix_log_timestamp ON log ("timestamp")')
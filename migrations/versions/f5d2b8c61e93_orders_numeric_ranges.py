@@ -0,0 +1,125 @@
+"""orders numeric ranges
+
+Revision ID: f5d2b8c61e93
+Revises: e4c9a2b7d310
+Create Date: 2026-10-18 21:12:40.337021
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5d2b8c61e93'
+down_revision = 'e4c9a2b7d310'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+# نسخة من arabic_numbers.parse_range كما كانت عند كتابة هذه الهجرة: الهجرة تبقى تعطي
+# نفس النتيجة مهما تغير كود التطبيق لاحقاً
+_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹', '01234567890123456789')
+_WORDS = r'ألف|الف|آلاف|الاف|مليون|ملايين'
+_GROUPED = re.compile(r'(?<![\d.,٬،])(\d{1,3})((?:[.,٬،]\d{3})+)(?!\d)(\s*(?:' + _WORDS + r'))?')
+_UNITS = re.compile(r'م\s*[2²]|متر\s*مربع|متر|ريال|ر\.س|m2|sar', re.IGNORECASE)
+_NUMBER = re.compile(r'(\d+(?:\.\d+)?)\s*(' + _WORDS + r')?')
+_MULTIPLIERS = {'ألف': 1e3, 'الف': 1e3, 'آلاف': 1e3, 'الاف': 1e3, 'مليون': 1e6, 'ملايين': 1e6}
+_AT_MOST = re.compile(r'(أقل|اقل|حتى|لا يزيد|بحد أقصى|بحد اقصى|الى حد|max)')
+_AT_LEAST = re.compile(r'(أكثر|اكثر|فوق|من فوق|لا يقل|بحد أدنى|بحد ادنى|min|\+)')
+
+
+def _ungroup(match):
+    head, groups, word = match.group(1), match.group(2), match.group(3) or ''
+    if groups[0] == '.' and len(groups) == 4 and (word or head == '0'):
+        return match.group()
+    return head + re.sub(r'\D', '', groups) + word
+
+
+def _numbers(value):
+    text = _GROUPED.sub(_ungroup, str(value or '').translate(_DIGITS)).replace('٫', '.')
+    text = _UNITS.sub(' ', text)
+    found = [(float(n), _MULTIPLIERS.get(word)) for n, word in _NUMBER.findall(text)]
+    if not found:
+        return []
+    trailing = found[-1][1]
+    return [n * (m or trailing or 1) for n, m in found]
+
+
+def parse_range(value):
+    numbers = _numbers(value)
+    if not numbers:
+        return None, None
+    if len(numbers) >= 2:
+        return min(numbers[:2]), max(numbers[:2])
+    text = str(value)
+    if _AT_MOST.search(text):
+        return None, numbers[0]
+    if _AT_LEAST.search(text):
+        return numbers[0], None
+    return numbers[0], numbers[0]
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('area_min', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('area_max', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('price_min', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('price_max', sa.Float(), nullable=True))
+        # النص كما أدخله الموظف ("200-300"، "٨٠ ألف")؛ القيم الرقمية في أعمدة _min / _max
+        batch_op.alter_column('area', existing_type=sa.Integer(), type_=sa.String(length=200),
+                              postgresql_using='area::text')
+        batch_op.alter_column('price', existing_type=sa.Float(), type_=sa.String(length=200),
+                              postgresql_using='price::text')
+        batch_op.drop_index('ix_orders_price_area')
+
+    # تعبئة الأعمدة الرقمية للطلبات الموجودة
+    connection = op.get_bind()
+    orders = sa.table(
+        'orders', sa.column('id', sa.Integer), sa.column('area', sa.String), sa.column('price', sa.String),
+        sa.column('area_min', sa.Float), sa.column('area_max', sa.Float),
+        sa.column('price_min', sa.Float), sa.column('price_max', sa.Float),
+    )
+    update = (
+        orders.update()
+        .where(orders.c.id == sa.bindparam('order_id'))
+        .values(area_min=sa.bindparam('area_min'), area_max=sa.bindparam('area_max'),
+                price_min=sa.bindparam('price_min'), price_max=sa.bindparam('price_max'))
+    )
+    rows = connection.execute(sa.select(orders.c.id, orders.c.area, orders.c.price).order_by(orders.c.id)).all()
+    for start in range(0, len(rows), BATCH_SIZE):
+        params = []
+        for order_id, area, price in rows[start:start + BATCH_SIZE]:
+            area_min, area_max = parse_range(area)
+            price_min, price_max = parse_range(price)
+            params.append({'order_id': order_id, 'area_min': area_min, 'area_max': area_max,
+                           'price_min': price_min, 'price_max': price_max})
+        connection.execute(update, params)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_price_range', ['price_min', 'price_max'], unique=False)
+        batch_op.create_index('ix_orders_area_range', ['area_min', 'area_max'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_area_range')
+        batch_op.drop_index('ix_orders_price_range')
+
+    # يرجع العمود رقمياً بأدنى قيمة المدى
+    connection = op.get_bind()
+    connection.execute(sa.text("UPDATE orders SET area = CAST(area_min AS INTEGER), price = price_min"))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.alter_column('price', existing_type=sa.String(length=200), type_=sa.Float(),
+                              postgresql_using='price::double precision')
+        batch_op.alter_column('area', existing_type=sa.String(length=200), type_=sa.Integer(),
+                              postgresql_using='area::integer')
+        batch_op.create_index('ix_orders_price_area', ['price', 'area'], unique=False)
+        batch_op.drop_column('price_max')
+        batch_op.drop_column('price_min')
+        batch_op.drop_column('area_max')
+        batch_op.drop_column('area_min')
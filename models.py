@@ -3,6 +3,13 @@ from flask_login import UserMixin
 from datetime import datetime
 import json
 from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import validates
+
+from arabic_numbers import parse_range
+from phones import normalize_phone
+
+# قائمة نصوص: ARRAY في PostgreSQL، وJSON في SQLite (التطوير المحلي والاختبارات)
+StringArray = ARRAY(db.String).with_variant(db.JSON(), 'sqlite')
 
 
 class Employee(db.Model, UserMixin):
@@ -16,9 +23,11 @@ class Employee(db.Model, UserMixin):
     password = db.Column(db.String(200), nullable=False)
     permissions = db.Column(db.Text, default='[]')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    auth_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # يزيد مع كل تعديل فيتغير ETag الصفحات (http_cache.py)
 
     def set_permissions(self, perms_list):
         self.permissions = json.dumps([str(p) for p in perms_list])
+        self._permission_cache = None
 
     def get_permissions(self):
         try:
@@ -27,8 +36,20 @@ class Employee(db.Model, UserMixin):
         except:
             return []
 
+    def get_permission_set(self):
+        """
+        الصلاحيات كـ frozenset تُفك من JSON مرة واحدة لكل كائن (أي مرة لكل طلب
+        لأن current_user يُحمّل في كل طلب)، وتُعاد إذا تغير نص الصلاحيات.
+        """
+        raw = self.permissions or '[]'
+        cache = getattr(self, '_permission_cache', None)
+        if cache is None or cache[0] != raw:
+            cache = (raw, frozenset(self.get_permissions()))
+            self._permission_cache = cache
+        return cache[1]
+
     def has_permission(self, perm):
-        return str(perm) in self.get_permissions()
+        return str(perm) in self.get_permission_set()
 
 
 class Log(db.Model):
@@ -38,7 +59,11 @@ class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user = db.Column(db.String(150))
     action = db.Column(db.String(500))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+# تصفح سجل مستخدم معين من الأحدث (صفحة السجلات)
+db.Index('ix_log_user_timestamp', Log.user, Log.timestamp)
 
 
 class Property(db.Model):
@@ -53,7 +78,7 @@ class Property(db.Model):
     front = db.Column(db.String(200))
     street = db.Column(db.String(200))
     owner_status = db.Column(db.String(200))
-    images = db.Column(ARRAY(db.String), default=list)  # روابط الصور
+    images = db.Column(StringArray, default=list)  # روابط الصور
 
 
 class RentalOffer(db.Model):
@@ -73,12 +98,20 @@ class RentalOffer(db.Model):
     marketer = db.Column(db.String(100), nullable=False)
     notes = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(50), nullable=False)
-    images = db.Column(ARRAY(db.String), default=list)
+    images = db.Column(StringArray, default=list)
+    image_variants = db.Column(db.JSON, default=list)  # [{'thumb': رابط, 'medium': رابط}, ...] بنفس ترتيب images
     district = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+# فهارس قوائم العروض: التصفية بالمنطقة والترتيب بالأحدث، والتصفية بالحالة والسعر
+db.Index('ix_rental_offer_district_created_at', RentalOffer.district, RentalOffer.created_at.desc(), RentalOffer.id.desc())
+db.Index('ix_rental_offer_district_status_price', RentalOffer.district, RentalOffer.status, RentalOffer.price)
+db.Index('ix_rental_offer_district_updated_at', RentalOffer.district, RentalOffer.updated_at)  # ETag القوائم
+db.Index('ix_rental_offer_price_area', RentalOffer.price, RentalOffer.area)  # مطابقة الطلبات (matching.py)
+
+
 class SaleOffer(db.Model):
     __tablename__ = 'sale_offer'
     __table_args__ = {'extend_existing': True}
@@ -97,13 +130,20 @@ class SaleOffer(db.Model):
     marketer = db.Column(db.String(100), nullable=False)
     owner_type = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(50), nullable=False)
-    images = db.Column(ARRAY(db.String), default=list)
+    images = db.Column(StringArray, default=list)
+    image_variants = db.Column(db.JSON, default=list)
     notes = db.Column(db.Text, nullable=False)
     created_by = db.Column(db.String(2100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+db.Index('ix_sale_offer_district_created_at', SaleOffer.district, SaleOffer.created_at.desc(), SaleOffer.id.desc())
+db.Index('ix_sale_offer_district_status_price', SaleOffer.district, SaleOffer.status, SaleOffer.price)
+db.Index('ix_sale_offer_district_updated_at', SaleOffer.district, SaleOffer.updated_at)
+db.Index('ix_sale_offer_price_area', SaleOffer.price, SaleOffer.area)
+
+
 class RentalMOffer(db.Model):
     __tablename__ = 'rental_m_offer'
     __table_args__ = {'extend_existing': True}
@@ -119,7 +159,7 @@ class RentalMOffer(db.Model):
     marketer = db.Column(db.String(100))
     status = db.Column(db.String(50))
     notes = db.Column(db.Text)
-    images = db.Column(ARRAY(db.String), default=list)
+    images = db.Column(StringArray, default=list)
 
 
 class RentalWOffer(db.Model):
@@ -137,7 +177,7 @@ class RentalWOffer(db.Model):
     marketer = db.Column(db.String(100))
     status = db.Column(db.String(50))
     notes = db.Column(db.Text)
-    images = db.Column(ARRAY(db.String), default=list)
+    images = db.Column(StringArray, default=list)
 
 
 class Orders(db.Model):
@@ -147,10 +187,137 @@ class Orders(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(200), nullable=False)
     unit_type = db.Column(db.String(200), nullable=False)
-    area = db.Column(db.Integer, nullable=True)
-    price = db.Column(db.Float, nullable=True)
+    area = db.Column(db.String(200), nullable=True)  # كما كتبه الموظف ("200-300"، "٨٠ ألف")
+    price = db.Column(db.String(200), nullable=True)
+    # القيم الرقمية المقروءة من area و price (انظر arabic_numbers.py)؛ None = غير محدد
+    area_min = db.Column(db.Float, nullable=True)
+    area_max = db.Column(db.Float, nullable=True)
+    price_min = db.Column(db.Float, nullable=True)
+    price_max = db.Column(db.Float, nullable=True)
     location = db.Column(db.String(200), nullable=True)
     phone = db.Column(db.String(200), nullable=True)
+    # phone بصيغة E.164 (انظر phones.py)؛ للبحث عن طلبات نفس العميل
+    phone_normalized = db.Column(db.String(20), nullable=True)
     marketer = db.Column(db.String(200), nullable=True)
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @validates('area', 'price')
+    def _parse_range(self, key, value):
+        """تحديث الأعمدة الرقمية مع كل تعديل للنص"""
+        low, high = parse_range(value)
+        setattr(self, f"{key}_min", low)
+        setattr(self, f"{key}_max", high)
+        return value
+
+    @validates('phone')
+    def _normalize_phone(self, key, value):
+        self.phone_normalized = normalize_phone(value)
+        return value
+
+
+# فلاتر قائمة الطلبات ومطابقتها بالعروض: تداخل مدى الطلب مع المدى المطلوب
+db.Index('ix_orders_price_range', Orders.price_min, Orders.price_max)
+db.Index('ix_orders_area_range', Orders.area_min, Orders.area_max)
+# تصفح قائمة الطلبات بالمؤشر (keyset_paginate) لكل ترتيب، وفلتر المسوق مع الفترة
+db.Index('ix_orders_created_at_id', Orders.created_at, Orders.id)
+db.Index('ix_orders_price_min_id', Orders.price_min, Orders.id)
+db.Index('ix_orders_area_min_id', Orders.area_min, Orders.id)
+db.Index('ix_orders_marketer_created_at', Orders.marketer, Orders.created_at, Orders.id)
+# طلبات العميل العائد برقم جواله (غير فريد: للعميل أكثر من طلب)
+db.Index('ix_orders_phone_normalized', Orders.phone_normalized, Orders.created_at)
+
+
+class DashboardStats(db.Model):
+    """صف واحد (id=1) يحمل عدادات لوحة التحكم، يُحدّث تلقائياً من counters.py"""
+    __tablename__ = 'dashboard_stats'
+    __table_args__ = {'extend_existing': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    employees_count = db.Column(db.Integer, nullable=False, default=0)
+    rentalm_offers_count = db.Column(db.Integer, nullable=False, default=0)
+    rentalw_offers_count = db.Column(db.Integer, nullable=False, default=0)
+    salesm_offers_count = db.Column(db.Integer, nullable=False, default=0)
+    salesw_offers_count = db.Column(db.Integer, nullable=False, default=0)
+    orders_count = db.Column(db.Integer, nullable=False, default=0)
+    reconciled_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class FailedDeletion(db.Model):
+    """ملفات فشل حذفها من التخزين بعد عدة محاولات (dead-letter)، تُعاد بـ flask retry-deletions"""
+    __tablename__ = 'failed_deletion'
+    __table_args__ = {'extend_existing': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(1024), nullable=False)
+    error = db.Column(db.String(500))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class StoredObject(db.Model):
+    """ملف صورة مخزن باسم بصمة محتواه، مع عدد العروض التي تشير إليه (انظر image_refs.py)"""
+    __tablename__ = 'stored_object'
+    __table_args__ = {'extend_existing': True}
+
+    key = db.Column(db.String(300), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    variant = db.Column(db.String(20), nullable=False, default='original')
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    """مهمة في طابور الخلفية يعالجها flask worker (انظر jobs.py)"""
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(200))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.String(1000))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, index=True)
+
+
+class EntityChange(db.Model):
+    """تغيير واحد على عرض / طلب / موظف مع الحقول المعدلة (انظر history.py)"""
+    __tablename__ = 'entity_change'
+    __table_args__ = (
+        db.Index('ix_entity_change_entity', 'entity_type', 'entity_id', 'timestamp'),
+        db.Index('ix_entity_change_type_timestamp', 'entity_type', 'timestamp'),  # التغييرات الأخيرة لنوع واحد (alerts.py)
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # insert / update / delete
+    changes = db.Column(db.JSON, default=dict)  # {الحقل: [القديم، الجديد]}
+    user = db.Column(db.String(150))
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Notification(db.Model):
+    """إشعار في صندوق وارد الموظف (مثلاً عرض جديد يطابق طلباً له، انظر alerts.py)"""
+    __tablename__ = 'notification'
+    __table_args__ = (
+        db.Index('ix_notification_employee_read', 'employee_id', 'read_at'),
+        {'extend_existing': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id', ondelete='CASCADE'), nullable=False)
+    message = db.Column(db.String(500), nullable=False)
+    link = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime, nullable=True)
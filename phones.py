@@ -0,0 +1,65 @@
+"""
+توحيد أرقام الجوال المكتوبة بحرية في الطلبات ("05xxxxxxxx"، "+9665..."، "٠٥٥ ١٢٣ ٤٥٦٧")
+إلى صيغة E.164 (+9665xxxxxxxx)، حتى يُبحث عن العميل العائد بمساواة على عمود مفهرس.
+
+الرقم المحلي (يبدأ بصفر أو بـ 5 دون رمز دولة) يُعتبر سعودياً (DEFAULT_COUNTRY_CODE).
+إذا كتب الموظف أكثر من رقم في الحقل ("0551234567 / 0567654321"، أو بمسافة بينهما) يُؤخذ الأول.
+"""
+import re
+
+from arabic_numbers import normalize_digits
+
+DEFAULT_COUNTRY_CODE = '966'
+# الرقم السعودي: رمز الدولة ثم 9 أرقام
+DEFAULT_COUNTRY_LENGTH = 12
+
+# رقم واحد مع المسافات والشرطات والأقواس بين أجزائه
+_PHONE = re.compile(r'\+?\d[\d\s\-().]{6,}\d')
+# فواصل بين رقمين في نفس الحقل؛ المسافة وحدها قد تكون داخل الرقم ("055 123 4567")
+_SEPARATORS = re.compile(r'[,،/;؛|\n]+|\s+(?:أو|او|و)\s+')
+
+
+def _e164(text):
+    """الرقم في النص بصيغة E.164 إذا كان النص رقماً واحداً صالحاً، وإلا None"""
+    found = _PHONE.search(text)
+    if not found:
+        return None
+    text = found.group()
+    digits = re.sub(r'\D', '', text)
+
+    if text.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(DEFAULT_COUNTRY_CODE):
+        pass
+    elif digits.startswith('0'):
+        digits = DEFAULT_COUNTRY_CODE + digits[1:]
+    elif len(digits) == 9 and digits.startswith('5'):
+        digits = DEFAULT_COUNTRY_CODE + digits
+    else:
+        return None
+
+    if digits.startswith(DEFAULT_COUNTRY_CODE) and len(digits) != DEFAULT_COUNTRY_LENGTH:
+        return None
+    # E.164: حتى 15 رقماً مع رمز الدولة
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def normalize_phone(value):
+    """أول رقم في النص بصيغة E.164، أو None إذا لم يوجد رقم صالح"""
+    for part in _SEPARATORS.split(normalize_digits(value)):
+        words = part.split()
+        # من أول كلمة: أطول تتابع كلمات يكوّن رقماً واحداً صالحاً ("055 123 4567")،
+        # فرقمان بينهما مسافة لا يُقرآن رقماً واحداً طويلاً
+        for start in range(len(words)):
+            found = None
+            for end in range(start + 1, len(words) + 1):
+                if end > start + 1 and words[end - 1].startswith('+'):
+                    break
+                found = _e164(' '.join(words[start:end])) or found
+            if found:
+                return found
+    return None
@@ -0,0 +1,184 @@
+"""
+البحث النصي الكامل في العروض والطلبات.
+
+- على PostgreSQL: عمود search_vector محسوب (tsvector) مع فهرس GIN (انظر الترحيل).
+- على SQLite (التشغيل المحلي): جدول FTS5 باسم search_fts يُنشأ مع الجداول ويُحدّث من أحداث SQLAlchemy.
+
+النص يُطبّع قبل الفهرسة وقبل البحث (الألف والهمزات، التاء المربوطة، التطويل، التشكيل)
+حتى تتطابق "مؤسسة" مع "موسسه" و"إستراحة" مع "استراحه".
+"""
+import re
+
+import click
+from sqlalchemy import event, text
+
+from extensions import db
+from models import RentalOffer, SaleOffer, Orders
+
+# الحقول المفهرسة لكل جدول
+SEARCH_FIELDS = {
+    RentalOffer: ['unit_type', 'details', 'notes', 'location', 'marketer'],
+    SaleOffer: ['unit_type', 'details', 'notes', 'location', 'marketer'],
+    Orders: ['unit_type', 'notes', 'location', 'marketer'],
+}
+
+_DIACRITICS = re.compile('[\u064B-\u0652\u0670\u0640]')  # التشكيل + التطويل
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+})
+_TOKEN = re.compile(r'\w+')
+
+
+def normalize_arabic(value):
+    """توحيد أشكال الحروف العربية وإزالة التشكيل والتطويل"""
+    if not value:
+        return ''
+    value = _DIACRITICS.sub('', str(value))
+    return value.translate(_LETTERS).lower()
+
+
+def tokenize(value):
+    return _TOKEN.findall(normalize_arabic(value))
+
+
+def document_text(target):
+    """النص المفهرس لسجل واحد"""
+    return normalize_arabic(' '.join(str(getattr(target, f) or '') for f in SEARCH_FIELDS[type(target)]))
+
+
+def _is_postgres(bind=None):
+    return (bind or db.engine).dialect.name == 'postgresql'
+
+
+# ================== SQLite FTS5 ==================
+CREATE_SQLITE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts "
+    "USING fts5(entity UNINDEXED, entity_id UNINDEXED, body)"
+)
+
+
+def _create_sqlite_table(target, connection, **kw):
+    """يُنشأ مع db.create_all() (والترحيل b41c9e2d7f30)، وليس مع كل استعلام"""
+    if not _is_postgres(connection):
+        connection.execute(text(CREATE_SQLITE_TABLE))
+
+
+def _drop_sqlite_table(target, connection, **kw):
+    if not _is_postgres(connection):
+        connection.execute(text("DROP TABLE IF EXISTS search_fts"))
+
+
+def _sqlite_index(connection, target):
+    _sqlite_remove(connection, target)
+    connection.execute(
+        text("INSERT INTO search_fts (entity, entity_id, body) VALUES (:e, :i, :b)"),
+        {'e': target.__tablename__, 'i': target.id, 'b': document_text(target)},
+    )
+
+
+def _sqlite_remove(connection, target):
+    connection.execute(
+        text("DELETE FROM search_fts WHERE entity = :e AND entity_id = :i"),
+        {'e': target.__tablename__, 'i': target.id},
+    )
+
+
+def _after_save(mapper, connection, target):
+    if not _is_postgres(connection):
+        _sqlite_index(connection, target)
+
+
+def _after_delete(mapper, connection, target):
+    if not _is_postgres(connection):
+        _sqlite_remove(connection, target)
+
+
+# ================== الاستعلام ==================
+def _pg_tsquery(tokens):
+    return ' & '.join(f"{t}:*" for t in tokens)
+
+
+def _fts5_query(tokens):
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def match_condition(model, q):
+    """شرط SQL يحصر الاستعلام في السجلات المطابقة لنص البحث، أو None إذا كان النص فارغاً"""
+    tokens = tokenize(q)
+    if not tokens:
+        return None
+    if _is_postgres():
+        return text(f"{model.__tablename__}.search_vector @@ to_tsquery('simple', :fts_q)").bindparams(
+            fts_q=_pg_tsquery(tokens))
+    return model.id.in_(
+        text("SELECT entity_id FROM search_fts WHERE entity = :fts_e AND search_fts MATCH :fts_q")
+        .bindparams(fts_e=model.__tablename__, fts_q=_fts5_query(tokens))
+        .columns(entity_id=db.Integer)
+    )
+
+
+def ranked_ids(model, q, limit=50):
+    """معرّفات السجلات المطابقة مرتبة حسب الصلة: [(id, rank), ...]"""
+    tokens = tokenize(q)
+    if not tokens:
+        return []
+    table = model.__tablename__
+    if _is_postgres():
+        sql = text(
+            f"SELECT id, ts_rank(search_vector, query) AS rank "
+            f"FROM {table}, to_tsquery('simple', :q) AS query "
+            f"WHERE search_vector @@ query ORDER BY rank DESC LIMIT :limit"
+        )
+        params = {'q': _pg_tsquery(tokens), 'limit': limit}
+    else:
+        # bm25 يرجع قيمة أصغر للأكثر صلة
+        sql = text(
+            "SELECT entity_id, -bm25(search_fts) AS rank FROM search_fts "
+            "WHERE entity = :e AND search_fts MATCH :q ORDER BY rank DESC LIMIT :limit"
+        )
+        params = {'e': table, 'q': _fts5_query(tokens), 'limit': limit}
+    return [(int(row[0]), float(row[1])) for row in db.session.execute(sql, params)]
+
+
+def search(q, models=None, limit=50):
+    """بحث في عدة جداول وإرجاع [(السجل، الصلة), ...] مرتبة من الأكثر صلة"""
+    results = []
+    for model in models or SEARCH_FIELDS:
+        ranks = dict(ranked_ids(model, q, limit))
+        if not ranks:
+            continue
+        for obj in model.query.filter(model.id.in_(ranks)).all():
+            results.append((obj, ranks[obj.id]))
+    results.sort(key=lambda item: item[1], reverse=True)
+    return results[:limit]
+
+
+def reindex():
+    """إعادة بناء فهرس SQLite بالكامل (لا يلزم على PostgreSQL)"""
+    if _is_postgres():
+        return 0
+    connection = db.session.connection()
+    connection.execute(text(CREATE_SQLITE_TABLE))
+    connection.execute(text("DELETE FROM search_fts"))
+    count = 0
+    for model in SEARCH_FIELDS:
+        for obj in model.query.yield_per(1000):
+            _sqlite_index(connection, obj)
+            count += 1
+    db.session.commit()
+    return count
+
+
+def init_app(app):
+    event.listen(db.metadata, 'after_create', _create_sqlite_table)
+    event.listen(db.metadata, 'after_drop', _drop_sqlite_table)
+    for model in SEARCH_FIELDS:
+        event.listen(model, 'after_insert', _after_save)
+        event.listen(model, 'after_update', _after_save)
+        event.listen(model, 'after_delete', _after_delete)
+
+    @app.cli.command('search-reindex')
+    def search_reindex_command():
+        """إعادة بناء فهرس البحث المحلي"""
+        click.echo(f"✅ تمت فهرسة {reindex()} سجل")
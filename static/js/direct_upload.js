@@ -0,0 +1,58 @@
+// رفع الصور من المتصفح مباشرة إلى التخزين قبل إرسال النموذج.
+// كل صورة تنجح تُستبدل بحقل direct_upload يحمل رمز التأكيد، فلا يمر محتواها عبر الخادم.
+// إذا فشل الرفع المباشر تبقى الصورة في حقلها وتُرسل مع النموذج كالمعتاد.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('form[data-direct-upload]').forEach(function (form) {
+        let ready = false;
+
+        form.addEventListener('submit', async function (event) {
+            if (ready) return;
+            const inputs = Array.from(form.querySelectorAll('input[type=file]')).filter(i => i.files.length);
+            if (!inputs.length) return;
+            event.preventDefault();
+
+            const submit = form.querySelector('[type=submit]');
+            if (submit) submit.disabled = true;
+            try {
+                const files = inputs.map(i => i.files[0]);
+                const response = await fetch(form.dataset.directUpload, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({files: files.map(f => ({name: f.name, content_type: f.type, size: f.size}))}),
+                });
+                const data = response.ok ? await response.json() : {uploads: [], rejected: []};
+                const rejected = new Set(data.rejected || []);
+
+                let next = 0;
+                await Promise.all(inputs.map(async function (input, index) {
+                    if (rejected.has(files[index].name)) return;
+                    const upload = data.uploads[next++];
+                    if (!upload) return;
+                    let ok;
+                    if (upload.method === 'POST') {
+                        const body = new FormData();
+                        Object.entries(upload.fields).forEach(([k, v]) => body.append(k, v));
+                        body.append('file', files[index]);
+                        ok = (await fetch(upload.url, {method: 'POST', body: body})).ok;
+                    } else {
+                        ok = (await fetch(upload.url, {
+                            method: 'PUT', body: files[index], headers: {'Content-Type': files[index].type},
+                        })).ok;
+                    }
+                    if (ok) {
+                        const hidden = document.createElement('input');
+                        hidden.type = 'hidden';
+                        hidden.name = 'direct_upload';
+                        hidden.value = upload.token;
+                        form.appendChild(hidden);
+                        input.value = '';
+                    }
+                }));
+            } catch (e) {
+                console.error('direct upload failed', e);
+            }
+            ready = true;
+            form.submit();
+        });
+    });
+});
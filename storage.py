@@ -0,0 +1,268 @@
+"""
+واجهة تخزين الملفات المرفوعة مع ثلاث تطبيقات يُختار بينها بالإعداد STORAGE_BACKEND:
+
+- s3     : حاوية S3 بعميل واحد طويل العمر ومجمع اتصالات (الافتراضي في الإنتاج).
+           AWS_ENDPOINT_URL يوجهه إلى خادم متوافق محلياً (MinIO / moto_server).
+- local  : مجلد UPLOAD_FOLDER على القرص، وتُخدم الملفات عبر مسار uploaded_file.
+- memory : قاموس في الذاكرة للاختبارات وقياس الأداء بدون شبكة.
+
+كل الدوال هنا لا تستخدم current_app حتى يمكن استدعاؤها من خيوط الرفع.
+"""
+import os
+import threading
+import time
+
+from flask import current_app
+
+
+class Storage:
+    """
+    الواجهة المشتركة: put يرجع رابط الملف، delete يحذف مجموعة مفاتيح
+    ويرجع المفاتيح التي فشل حذفها.
+    """
+
+    def put(self, fileobj, key, content_type=None):
+        raise NotImplementedError
+
+    def delete(self, keys):
+        raise NotImplementedError
+
+    def url_for_key(self, key):
+        raise NotImplementedError
+
+    def key_from_url(self, url):
+        return url.split('/')[-1]  # استخراج اسم الملف من الرابط
+
+    def size(self, key):
+        """حجم الملف بالبايت، أو None إذا لم يوجد"""
+        raise NotImplementedError
+
+    def get(self, key):
+        """محتوى الملف، أو None إذا لم يوجد"""
+        raise NotImplementedError
+
+    # هل يستطيع المتصفح الرفع إليه مباشرة؟ وإلا يستخدم التطبيق مسار direct_upload بديلاً
+    supports_presign = False
+
+    def presign_upload(self, key, content_type, max_size, expires):
+        """تعليمات رفع الملف مباشرة من المتصفح: {'method', 'url', 'fields'}"""
+        raise NotImplementedError
+
+
+class S3Storage(Storage):
+    """endpoint_url لخادم متوافق مع S3 (MinIO أو moto_server) عند التطوير والاختبار"""
+
+    supports_presign = True
+
+    def __init__(self, bucket, region, access_key, secret_key, max_pool_connections=10, timeout=30,
+                 endpoint_url=None):
+        import boto3
+        from botocore.config import Config as BotoConfig
+
+        self.bucket = bucket
+        self.region = region
+        self.endpoint_url = endpoint_url.rstrip('/') if endpoint_url else None
+        # عميل boto3 آمن للاستخدام من عدة خيوط، ويحتفظ باتصالات TLS مفتوحة
+        self.client = boto3.client(
+            "s3",
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+            endpoint_url=self.endpoint_url,
+            config=BotoConfig(
+                max_pool_connections=max_pool_connections,
+                connect_timeout=5,
+                read_timeout=timeout,
+                retries={'max_attempts': 3},
+                s3={'addressing_style': 'path'} if self.endpoint_url else None,
+            )
+        )
+
+    def put(self, fileobj, key, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra)
+        return self.url_for_key(key)
+
+    def delete(self, keys):
+        # delete_objects يقبل حتى 1000 مفتاح في الطلب الواحد
+        failed = []
+        keys = list(keys)
+        for i in range(0, len(keys), 1000):
+            batch = keys[i:i + 1000]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': k} for k in batch], 'Quiet': True},
+                )
+                failed.extend(err['Key'] for err in response.get('Errors', []))
+            except Exception as e:
+                print(f"Error deleting {len(batch)} objects: {e}")
+                failed.extend(batch)
+        return failed
+
+    def url_for_key(self, key):
+        if self.endpoint_url:
+            return f"{self.endpoint_url}/{self.bucket}/{key}"
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def get(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def presign_upload(self, key, content_type, max_size, expires):
+        # POST وليس PUT حتى تفرض S3 نفسها حد الحجم ونوع الملف، فلا يتحقق منهما الطلب عند التأكيد
+        post = self.client.generate_presigned_post(
+            self.bucket, key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['starts-with', '$Content-Type', 'image/'],
+                ['content-length-range', 1, max_size],
+            ],
+            ExpiresIn=expires,
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+
+class LocalStorage(Storage):
+    def __init__(self, folder, base_url='/uploads'):
+        self.folder = folder
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(folder, exist_ok=True)
+
+    def put(self, fileobj, key, content_type=None):
+        with open(os.path.join(self.folder, key), 'wb') as out:
+            while True:
+                chunk = fileobj.read(64 * 1024)
+                if not chunk:
+                    break
+                out.write(chunk)
+        return self.url_for_key(key)
+
+    def delete(self, keys):
+        failed = []
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.folder, os.path.basename(key)))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error deleting {key}: {e}")
+                failed.append(key)
+        return failed
+
+    def url_for_key(self, key):
+        return f"{self.base_url}/{key}"
+
+    def size(self, key):
+        try:
+            return os.path.getsize(os.path.join(self.folder, os.path.basename(key)))
+        except OSError:
+            return None
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.folder, os.path.basename(key)), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+class MemoryStorage(Storage):
+    """تخزين في الذاكرة؛ latency يحاكي زمن الشبكة لكل عملية عند قياس الأداء"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, fileobj, key, content_type=None):
+        if self.latency:
+            time.sleep(self.latency)
+        data = fileobj.read()
+        with self._lock:
+            self.objects[key] = (data, content_type)
+        return self.url_for_key(key)
+
+    def delete(self, keys):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            for key in keys:
+                self.objects.pop(key, None)
+        return []
+
+    def url_for_key(self, key):
+        return f"memory://{key}"
+
+    def size(self, key):
+        with self._lock:
+            item = self.objects.get(key)
+        return len(item[0]) if item else None
+
+    def get(self, key):
+        with self._lock:
+            item = self.objects.get(key)
+        return item[0] if item else None
+
+
+def create_storage(config):
+    backend = (config.get('STORAGE_BACKEND') or 's3').lower()
+
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+
+    if backend == 'memory':
+        return MemoryStorage(latency=float(config.get('MEMORY_STORAGE_LATENCY', 0)))
+
+    if backend == 's3':
+        access_key = os.environ.get('AWS_ACCESS_KEY_ID') or config.get('AWS_ACCESS_KEY_ID')
+        secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY') or config.get('AWS_SECRET_ACCESS_KEY')
+        region = os.environ.get('AWS_REGION') or config.get('AWS_REGION')
+        bucket = os.environ.get('AWS_BUCKET_NAME') or config.get('AWS_BUCKET_NAME')
+        endpoint_url = os.environ.get('AWS_ENDPOINT_URL') or config.get('AWS_ENDPOINT_URL')
+        if not access_key or not secret_key or not region:
+            raise RuntimeError("AWS credentials or region not configured!")
+        return S3Storage(
+            bucket, region, access_key, secret_key,
+            max_pool_connections=config.get('UPLOAD_WORKERS', 5) * 2,
+            timeout=config.get('UPLOAD_TIMEOUT', 30),
+            endpoint_url=endpoint_url,
+        )
+
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {backend}")
+
+
+_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    التخزين الحالي للتطبيق. يُنشأ عند أول استخدام ثم يبقى طوال عمر العامل،
+    حتى لا يفشل تشغيل التطبيق إذا لم تكن بيانات AWS متوفرة بعد.
+    """
+    app = current_app._get_current_object()
+    storage = app.extensions.get('storage')
+    if storage is None:
+        with _lock:
+            storage = app.extensions.get('storage')
+            if storage is None:
+                storage = create_storage(app.config)
+                app.extensions['storage'] = storage
+    return storage
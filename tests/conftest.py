@@ -0,0 +1,89 @@
+import os
+import sys
+
+import pytest
+from flask import g, request_started
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# قبل استيراد main: قاعدة SQLite في الذاكرة وتخزين في الذاكرة بدلاً من S3
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ.pop('FRAGMENT_CACHE_URL', None)
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import main  # noqa: E402
+import alerts  # noqa: E402
+from extensions import db as _db  # noqa: E402
+from models import Employee, SaleOffer  # noqa: E402
+
+ALL_PERMISSIONS = [perm for perm, _ in main.AVAILABLE_PERMISSIONS]
+
+
+def _fresh_request_globals(sender, **extra):
+    # سياق التطبيق في الاختبار مشترك بين الطلبات؛ في الإنتاج كل طلب يبدأ بـ g فارغ
+    # فيستدعي Flask-Login دالة load_user من جديد
+    g.pop('_login_user', None)
+
+
+@pytest.fixture
+def app():
+    app = main.app
+    app.config['TESTING'] = True
+    request_started.connect(_fresh_request_globals, app)
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+    main.user_cache.clear()
+    main.fragment_cache.clear()
+    alerts._state.update(index=None, since=None, seen={})
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+def make_employee(username, permissions=(), name=None):
+    employee = Employee(name=name or username, role='موظف', username=username,
+                        password=generate_password_hash('secret'))
+    employee.set_permissions(list(permissions))
+    _db.session.add(employee)
+    _db.session.commit()
+    return employee
+
+
+def make_sale_offer(**fields):
+    values = dict(unit_type='شقة', district='وسط', area=120, floor='1', front='شمال', street='15',
+                  price=500000, sale_limit=450000, location='https://maps.example/1', details='-',
+                  marketer='سعد', owner_type='مالك', status='متاح', notes='-', created_by='admin')
+    values.update(fields)
+    offer = SaleOffer(**values)
+    _db.session.add(offer)
+    _db.session.commit()
+    return offer
+
+
+@pytest.fixture
+def admin(app):
+    return make_employee('admin', ALL_PERMISSIONS, name='المدير')
+
+
+def login(client, username):
+    return client.post('/login', data={'username': username, 'password': 'secret'})
+
+
+@pytest.fixture
+def client(app, admin):
+    """عميل مسجل دخوله بكل الصلاحيات"""
+    client = app.test_client()
+    login(client, admin.username)
+    return client
+
+
+@pytest.fixture
+def anonymous(app):
+    return app.test_client()
@@ -0,0 +1,130 @@
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+import alerts
+import jobs
+from conftest import make_employee, make_sale_offer
+from models import EntityChange, Notification, Orders
+
+
+def make_index():
+    return alerts.OrderIndex(price_tolerance=0.25, area_tolerance=0.3)
+
+
+def put(index, order_id, unit_type='شقة', price=(None, None), area=(None, None), location='', marketer='سعد'):
+    index.put(order_id, unit_type, *price, *area, location, marketer, f'c{order_id}')
+
+
+def offer(unit_type='شقة', price=None, area=None, location='', district='وسط'):
+    return {'kind': 'sale', 'id': 1, 'unit_type': unit_type, 'price': price, 'area': area,
+            'location': location, 'district': district, 'link': None}
+
+
+def test_buckets_cover_range_with_tolerance():
+    assert alerts._buckets(None, 0.25) == [None]
+    assert alerts._buckets((0.0, 500.0), 0.25) == [None]
+    assert alerts._buckets((500.0, math.inf), 0.25) == [None]
+    buckets = alerts._buckets((200.0, 300.0), 0.25)
+    assert alerts._bucket(150.0) in buckets and alerts._bucket(375.0) in buckets
+    assert alerts._bucket(100.0) not in buckets
+
+
+def test_definite_article_is_ignored():
+    assert alerts._unit_tokens('الشقة') == alerts._unit_tokens('شقة')
+    assert alerts._unit_tokens('') == {None}
+
+
+def test_candidates_by_unit_and_price():
+    index = make_index()
+    put(index, 1, 'شقة', price=(200_000, 300_000))
+    put(index, 2, 'شقة', price=(2_000_000, 3_000_000))
+    put(index, 3, 'فيلا', price=(200_000, 300_000))
+    put(index, 4, 'شقة')
+    assert index.candidates('شقة', 250_000, None) == {1, 4}
+    assert index.candidates('الشقة', None, None) == {4}
+
+
+def test_remove_and_replace():
+    index = make_index()
+    put(index, 1, 'شقة', price=(200_000, 300_000))
+    put(index, 1, 'شقة', price=(2_000_000, 3_000_000))
+    assert index.candidates('شقة', 250_000, None) == set()
+    index.remove(1)
+    assert len(index) == 0 and not index.buckets
+
+
+def test_matches_are_scored_and_sorted():
+    index = make_index()
+    put(index, 1, 'شقة', price=(200_000, 300_000), location='النرجس')
+    put(index, 2, 'شقة', price=(200_000, 250_000), location='الملقا')
+    put(index, 3, 'شقة', price=(100_000, 150_000))
+    matches = index.matches(offer('شقة', price=280_000, location='حي النرجس'), 0.5)
+    assert [order_id for order_id, _ in matches] == [1, 2]
+    assert matches[0][1] == 1.0
+    assert all(score >= 0.5 for _, score in matches)
+    assert [order_id for order_id, _ in index.matches(offer('شقة', price=280_000), 0.7)] == [1]
+
+
+def test_new_offer_notifies_order_marketer(db):
+    employee = make_employee('saad', name='سعد')
+    db.session.add(Orders(customer_name='فهد', unit_type='شقة', price='200-300 ألف', marketer='سعد'))
+    db.session.add(Orders(customer_name='غيره', unit_type='فيلا', price='5 مليون', marketer='سعد'))
+    db.session.commit()
+
+    make_sale_offer(unit_type='شقة', price=250000)
+    # الطلب لا يطابق شيئاً؛ المطابقة في مهمة check_offers
+    assert Notification.query.count() == 0
+    assert alerts._state['index'] is None
+
+    jobs.work(once=True, poll_interval=0)
+    notifications = Notification.query.filter_by(employee_id=employee.id).all()
+    assert len(notifications) == 1
+    assert 'فهد' in notifications[0].message
+
+
+def test_catch_up_sees_late_commits(db):
+    employee = make_employee('saad', name='سعد')
+    alerts.rebuild()
+    since = alerts._state['since']
+
+    # تغيير آخر برقم أكبر قُرئ أولاً، ثم تكتمل معاملة أبطأ برقم أصغر ووقت أقدم
+    db.session.execute(insert(EntityChange), [{'id': 100, 'entity_type': 'orders', 'entity_id': 999,
+                                               'operation': 'delete', 'changes': {}, 'timestamp': since}])
+    db.session.commit()
+    assert alerts.check_offers([offer('شقة', price=250_000)]) == 0
+
+    db.session.execute(insert(Orders), [{'id': 7, 'customer_name': 'فهد', 'unit_type': 'شقة',
+                                         'price': '200-300 ألف', 'price_min': 200_000, 'price_max': 300_000,
+                                         'marketer': 'سعد'}])
+    db.session.execute(insert(EntityChange), [{'id': 50, 'entity_type': 'orders', 'entity_id': 7,
+                                               'operation': 'insert', 'changes': {},
+                                               'timestamp': since - timedelta(seconds=5)}])
+    db.session.commit()
+    assert alerts.check_offers([offer('شقة', price=250_000)]) == 1
+    assert Notification.query.filter_by(employee_id=employee.id).count() == 1
+    assert 7 in alerts._state['index'].orders
+    # ما طُبق لا يُعاد تطبيقه، وما خرج من النافذة يُنسى
+    assert set(alerts._state['seen']) == {50, 100}
+    alerts._state['since'] = datetime.utcnow() + timedelta(hours=1)
+    alerts.check_offers([])
+    assert alerts._state['seen'] == {}
+
+
+def test_lock_is_not_held_during_queries(db, monkeypatch):
+    make_employee('saad', name='سعد')
+    db.session.add(Orders(customer_name='فهد', unit_type='شقة', price='200-300 ألف', marketer='سعد'))
+    db.session.commit()
+    alerts.rebuild()
+
+    held = []
+    execute = db.session.execute
+
+    def track(*args, **kwargs):
+        held.append(alerts._lock.locked())
+        return execute(*args, **kwargs)
+
+    monkeypatch.setattr(db.session, 'execute', track)
+    assert alerts.check_offers([offer('شقة', price=250_000)]) == 1
+    assert held and not any(held)
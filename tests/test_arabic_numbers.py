@@ -0,0 +1,59 @@
+import pytest
+
+from arabic_numbers import normalize_digits, parse_number, parse_range
+from conftest import make_sale_offer
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1500', 1500),
+    ('١٥٠٠', 1500),
+    ('۱۵۰۰', 1500),
+    ('1,500', 1500),
+    ('١٬٥٠٠', 1500),
+    ('1،500', 1500),
+    ('1,500,000', 1_500_000),
+    ('1.500.000', 1_500_000),
+    ('1.500', 1500),
+    ('1,500.5', 1500.5),
+    ('1.5', 1.5),
+    ('١٫٥', 1.5),
+    ('0.500', 0.5),
+    ('1.5 مليون', 1_500_000),
+    ('2.750 مليون', 2_750_000),
+    ('80 ألف', 80_000),
+    ('120 م2', 120),
+    ('500 ريال', 500),
+    ('', None),
+    (None, None),
+    ('بدون', None),
+])
+def test_parse_number(value, expected):
+    assert parse_number(value) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('200-300', (200, 300)),
+    ('٢٠٠-٣٠٠', (200, 300)),
+    ('من ٢٠٠ إلى ٣٠٠', (200, 300)),
+    ('300 - 200', (200, 300)),
+    ('80-100 ألف', (80_000, 100_000)),
+    ('1.500.000 - 2.000.000', (1_500_000, 2_000_000)),
+    ('1-1.5 مليون', (1_000_000, 1_500_000)),
+    ('أقل من 500', (None, 500)),
+    ('أكثر من 300 ألف', (300_000, None)),
+    ('400', (400, 400)),
+    ('', (None, None)),
+])
+def test_parse_range(value, expected):
+    assert parse_range(value) == expected
+
+
+def test_normalize_digits_keeps_other_text():
+    assert normalize_digits('٠٥٥ ١٢٣ ٤٥٦٧') == '055 123 4567'
+
+
+def test_offer_filters_read_grouped_numbers(db, client):
+    make_sale_offer(price=900_000, unit_type='شقة رخيصة')
+    make_sale_offer(price=1_600_000, unit_type='فيلا غالية')
+    body = client.get('/salesm_offers?min_price=1.500.000').get_data(as_text=True)
+    assert 'فيلا غالية' in body and 'شقة رخيصة' not in body
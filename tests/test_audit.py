@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import event
+
+import audit
+from conftest import make_employee
+from models import Employee, Log
+
+
+def actions():
+    return sorted(action for action, in Log.query.with_entities(Log.action))
+
+
+@pytest.fixture
+def buffered(db):
+    audit._config.update(buffered=True, batch_size=2, flush_interval=3600)
+    yield
+    audit._config.update(buffered=False, batch_size=50, flush_interval=5.0)
+    audit._buffer.clear()
+    audit._buffer_since = None
+
+
+def test_request_writes_log_in_same_commit(db, client):
+    employee = make_employee('khalid')
+    commits = []
+
+    def count(session):
+        commits.append(session)
+
+    event.listen(db.session, 'after_commit', count)
+    try:
+        client.post(f'/employees/delete/{employee.id}')
+    finally:
+        event.remove(db.session, 'after_commit', count)
+
+    assert len(commits) == 1
+    assert db.session.get(Employee, employee.id, populate_existing=True) is None
+    assert [a for a in actions() if 'khalid' in a] == ['حذف الموظف: khalid']
+
+
+def test_rollback_drops_pending_rows(db):
+    audit.record('admin', 'ملغاة')
+    db.session.rollback()
+    audit.record('admin', 'محفوظة')
+    db.session.commit()
+    assert actions() == ['محفوظة']
+
+
+def test_buffered_rows_are_written_with_a_later_commit(db, buffered):
+    for action in ('أ', 'ب'):
+        audit.record('admin', action)
+        db.session.commit()
+    assert actions() == []
+
+    # الدفعة اكتملت فتُكتب مع أول commit بعدها
+    db.session.commit()
+    assert actions() == ['أ', 'ب']
+    assert audit._buffer == []
+
+
+def test_failed_commit_keeps_buffered_rows_once(db, buffered):
+    make_employee('khalid')
+    for action in ('أ', 'ب'):
+        audit.record('admin', action)
+        db.session.commit()
+
+    # commit يفشل بعد أن أخذ الدفعة: تعود إلى الذاكرة ولا تُكتب
+    db.session.add(Employee(username='khalid', name='مكرر', password='x'))
+    with pytest.raises(Exception):
+        db.session.commit()
+    db.session.rollback()
+    assert actions() == []
+    assert len(audit._buffer) == 2
+
+    db.session.commit()
+    assert actions() == ['أ', 'ب']
+
+
+def test_buffer_is_flushed_at_exit(app, db, buffered, monkeypatch):
+    audit.record('admin', 'أ')
+    db.session.commit()
+    assert actions() == []
+
+    def broken(table):
+        raise RuntimeError('database unavailable')
+
+    # فشل الكتابة لا يضيع الأسطر، والمحاولة التالية تكتبها مرة واحدة
+    monkeypatch.setattr(audit, 'insert', broken)
+    audit._flush_at_exit(app)
+    assert len(audit._buffer) == 1
+    monkeypatch.undo()
+
+    audit._flush_at_exit(app)
+    audit._flush_at_exit(app)
+    assert actions() == ['أ']
+    assert audit._buffer == []
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import counters
+import jobs
+from models import DashboardStats, Job, Orders
+
+
+def stats():
+    return counters.get_stats()
+
+
+def test_counters_follow_inserts_and_deletes(db, admin):
+    counters.reconcile()
+    order = Orders(customer_name='أ', unit_type='شقة')
+    db.session.add(order)
+    db.session.commit()
+    assert stats().orders_count == 1
+    db.session.delete(order)
+    db.session.commit()
+    db.session.expire_all()
+    assert stats().orders_count == 0
+
+
+def test_reconcile_fixes_drift_in_one_statement(db, admin):
+    counters.reconcile()
+    table = DashboardStats.__table__
+    db.session.execute(table.update().values(orders_count=99, employees_count=0))
+    db.session.commit()
+
+    fixed = counters.reconcile()
+    assert (fixed.orders_count, fixed.employees_count) == (0, 1)
+
+
+def test_reconcile_creates_missing_row(db, admin):
+    assert db.session.get(DashboardStats, counters.STATS_ID) is None
+    assert counters.reconcile().employees_count == 1
+
+
+def test_dashboard_does_not_reconcile(db, client):
+    counters.reconcile()
+    stale = datetime.utcnow() - timedelta(days=30)
+    db.session.execute(DashboardStats.__table__.update().values(orders_count=7, reconciled_at=stale))
+    db.session.commit()
+
+    assert client.get('/').status_code == 200
+    db.session.expire_all()
+    row = db.session.get(DashboardStats, counters.STATS_ID)
+    assert (row.orders_count, row.reconciled_at) == (7, stale)
+
+
+def test_worker_runs_reconcile_periodically(db, admin):
+    db.session.execute(DashboardStats.__table__.insert().values(id=counters.STATS_ID, orders_count=5))
+    db.session.commit()
+
+    jobs.work(once=True, poll_interval=0)
+    assert db.session.get(DashboardStats, counters.STATS_ID, populate_existing=True).orders_count == 0
+
+    # التنفيذ التالي مجدول بعد المدة وليس الآن
+    pending = Job.query.filter_by(name='reconcile_counters', status=jobs.QUEUED).one()
+    assert pending.run_at > datetime.utcnow() + timedelta(seconds=60)
+    jobs.work(once=True, poll_interval=0)
+    assert Job.query.filter_by(name='reconcile_counters').count() == 2
@@ -0,0 +1,51 @@
+import pytest
+
+import deletions
+import jobs
+from models import FailedDeletion, Job, StoredObject
+from storage import MemoryStorage
+
+
+class FlakyStorage(MemoryStorage):
+    """يفشل حذف المفاتيح في broken فقط، كما يرجع delete_objects أخطاء لكل مفتاح"""
+
+    def __init__(self, broken):
+        super().__init__()
+        self.broken = set(broken)
+        self.deleted = []
+
+    def delete(self, keys):
+        self.deleted.append(list(keys))
+        return [key for key in keys if key in self.broken]
+
+
+@pytest.fixture
+def storage(app):
+    storage = FlakyStorage(broken={'b.jpg'})
+    app.extensions['storage'] = storage
+    yield storage
+    app.extensions.pop('storage', None)
+
+
+def test_only_failed_keys_are_retried_and_dead_lettered(app, db, storage):
+    deletions.schedule(['a.jpg', 'b.jpg', 'c.jpg'])
+    db.session.commit()
+    for _ in range(app.config['DELETE_MAX_ATTEMPTS']):
+        jobs.work(once=True, poll_interval=0, backoff=0)
+
+    assert storage.deleted[0] == ['a.jpg', 'b.jpg', 'c.jpg']
+    assert all(batch == ['b.jpg'] for batch in storage.deleted[1:])
+    assert [row.key for row in FailedDeletion.query.all()] == ['b.jpg']
+    assert Job.query.filter_by(name='delete_files').one().status == jobs.FAILED
+
+
+def test_retry_skips_keys_that_were_uploaded_again(app, db, storage):
+    db.session.add_all([FailedDeletion(key='a.jpg', attempts=3), FailedDeletion(key='b.jpg', attempts=3)])
+    db.session.add(StoredObject(key='a.jpg', content_hash='h', variant='original', refcount=1))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['retry-deletions'])
+    assert result.exit_code == 0
+    assert storage.deleted == [['b.jpg']]
+    # a.jpg مستخدم من جديد فيُزال من القائمة، وb.jpg يبقى لأنه فشل مرة أخرى
+    assert [(row.key, row.attempts) for row in FailedDeletion.query.all()] == [('b.jpg', 4)]
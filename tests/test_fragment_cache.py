@@ -0,0 +1,38 @@
+import os
+
+from jinja2 import Environment, FileSystemLoader
+
+import main
+from conftest import make_sale_offer
+from fragment_cache import FragmentCache, template_version
+
+
+def test_lru_evicts_oldest():
+    cache = FragmentCache(max_size=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    assert cache.get('a') == '1'
+    cache.set('c', '3')
+    assert cache.get('b') is None
+    assert cache.get('a') == '1' and cache.get('c') == '3'
+
+
+def test_template_version_follows_source(tmp_path):
+    path = tmp_path / 'row.html'
+    path.write_text('<td>{{ offer }}</td>', encoding='utf-8')
+    env = Environment(loader=FileSystemLoader(str(tmp_path)))
+    first = template_version(env, 'row.html')
+    assert template_version(env, 'row.html') == first
+
+    path.write_text('<td class="x">{{ offer }}</td>', encoding='utf-8')
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert template_version(env, 'row.html') != first
+
+
+def test_row_key_uses_template_version_without_app_version(db, client, monkeypatch):
+    monkeypatch.setattr(main, 'APP_VERSION', '')
+    make_sale_offer()
+    client.get('/salesm_offers')
+    version = template_version(main.app.jinja_env, 'sale_offers/_row.html')
+    assert any(key.startswith(f'{version}:sale_offers/_row.html:') for key in main.fragment_cache._items)
@@ -0,0 +1,44 @@
+import history
+from conftest import login, make_employee, make_sale_offer
+from models import EntityChange, SaleOffer
+
+
+def test_update_is_recorded_with_old_and_new_values(db):
+    offer = db.session.get(SaleOffer, make_sale_offer().id)
+    offer.price = 550000
+    db.session.commit()
+
+    latest = history.for_entity(offer)[0]
+    assert latest.operation == 'update'
+    assert latest.changes == {'price': [500000, 550000]}
+
+
+def test_password_change_is_masked(db):
+    employee = make_employee('khalid')
+    assert employee.password
+    employee.password = 'new-hash'
+    db.session.commit()
+
+    change = history.for_entity(employee)[0]
+    assert change.changes == {'password': ['***', '***']}
+
+
+def test_anonymous_detail_page_has_no_history(db, anonymous):
+    offer = make_sale_offer()
+    response = anonymous.get(f'/sales_offers/وسط/{offer.id}')
+    assert response.status_code == 200
+    assert 'سجل التغييرات' not in response.get_data(as_text=True)
+
+
+def test_history_needs_logs_view(db, app, client):
+    offer = make_sale_offer()
+    offer.price = 550000
+    db.session.commit()
+    assert EntityChange.query.count() >= 2
+
+    assert 'سجل التغييرات' in client.get(f'/sales_offers/وسط/{offer.id}').get_data(as_text=True)
+
+    make_employee('viewer', ['salesm_offers_view'])
+    viewer = app.test_client()
+    login(viewer, 'viewer')
+    assert 'سجل التغييرات' not in viewer.get(f'/sales_offers/وسط/{offer.id}').get_data(as_text=True)
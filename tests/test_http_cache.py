@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import make_sale_offer
+
+
+@pytest.fixture
+def client(client):
+    # رسالة "تم تسجيل الدخول" تُعرض مرة واحدة، والصفحة التي تعرضها لا تُرجع 304
+    client.get('/salesm_offers')
+    return client
+
+
+def test_list_page_revalidates_with_etag(db, client):
+    offer = make_sale_offer()
+    first = client.get('/salesm_offers')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get('/salesm_offers', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+    offer.price = 550000
+    db.session.commit()
+    changed = client.get('/salesm_offers', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_list_etag_changes_on_delete(db, client):
+    make_sale_offer()
+    other = make_sale_offer(unit_type='فيلا')
+    etag = client.get('/salesm_offers').headers['ETag']
+
+    db.session.delete(other)
+    db.session.commit()
+    assert client.get('/salesm_offers', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_detail_page_etag(db, anonymous):
+    offer = make_sale_offer()
+    url = f'/sales_offers/وسط/{offer.id}'
+    etag = anonymous.get(url).headers['ETag']
+    assert anonymous.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert anonymous.get(f'/sales_offers/جنوب/{offer.id}').status_code == 404
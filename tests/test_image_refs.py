@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+import image_refs
+from models import StoredObject
+from storage import MemoryStorage
+
+
+@pytest.fixture
+def storage():
+    return MemoryStorage()
+
+
+def urls(storage, name):
+    return storage.url_for_key(f'{name}.webp'), {'thumb': storage.url_for_key(f'{name}_thumb.webp')}
+
+
+def test_hash_stream_matches_hash_bytes():
+    data = b'x' * (image_refs.CHUNK_SIZE * 2 + 17)
+    digest, content = image_refs.hash_stream(io.BytesIO(data))
+    assert content == data
+    assert digest == image_refs.hash_bytes(data)
+
+
+def test_add_refs_counts_every_variant(db, storage):
+    url, variants = urls(storage, 'abc')
+    image_refs.add_refs(storage, 'abc', url, variants)
+    image_refs.add_refs(storage, 'abc', url, variants)
+    db.session.commit()
+
+    assert {row.key: row.refcount for row in StoredObject.query} == {'abc.webp': 2, 'abc_thumb.webp': 2}
+    assert image_refs.find_existing(storage, ['abc', 'missing']) == {'abc': (url, variants)}
+
+
+def test_release_deletes_only_at_zero(db, storage):
+    url, variants = urls(storage, 'abc')
+    image_refs.add_refs(storage, 'abc', url, variants)
+    image_refs.add_refs(storage, 'abc', url, variants)
+    db.session.commit()
+
+    assert image_refs.release(['abc.webp', 'abc_thumb.webp']) == []
+    assert image_refs.still_referenced(['abc.webp']) == {'abc.webp'}
+    assert sorted(image_refs.release(['abc.webp', 'abc_thumb.webp'])) == ['abc.webp', 'abc_thumb.webp']
+    db.session.commit()
+    assert StoredObject.query.count() == 0
+    assert image_refs.find_existing(storage, ['abc']) == {}
+
+
+def test_untracked_keys_are_deleted_directly(db):
+    assert image_refs.release(['legacy.jpg', 'legacy.jpg']) == ['legacy.jpg']
+    assert image_refs.release([]) == []
+
+
+def test_staged_key_is_claimed_once(db, storage):
+    assert image_refs.claim_staged('staged/token.png') is True
+    assert image_refs.claim_staged('staged/token.png') is False
+    db.session.commit()
+    row = StoredObject.query.filter_by(key='staged/token.png').one()
+    assert (row.variant, row.refcount) == ('staged', 0)
+    assert image_refs.still_referenced(['staged/token.png']) == set()
@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+import jobs
+from models import Job
+
+calls = []
+
+
+@jobs.task('test_record', max_attempts=2)
+def record(value):
+    if value == 'fail':
+        raise RuntimeError('boom')
+    calls.append(value)
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_job_runs_only_after_commit(db):
+    jobs.enqueue('test_record', value='a')
+    db.session.rollback()
+    jobs.work(once=True, poll_interval=0)
+    assert calls == []
+
+    jobs.enqueue('test_record', value='b')
+    db.session.commit()
+    jobs.work(once=True, poll_interval=0)
+    assert calls == ['b']
+
+
+def test_failed_job_is_retried_then_marked_failed(db):
+    jobs.enqueue('test_record', value='fail')
+    db.session.commit()
+    jobs.work(once=True, poll_interval=0, backoff=0)
+    job = Job.query.filter_by(name='test_record').one()
+    assert (job.status, job.attempts, job.last_error) == (jobs.FAILED, 2, 'RuntimeError: boom')
+
+
+def test_inline_mode_runs_jobs_without_a_worker(app, db, monkeypatch):
+    monkeypatch.setitem(jobs._inline, 'app', app)
+    jobs.enqueue('test_record', value='inline')
+    db.session.commit()
+
+    for thread in threading.enumerate():
+        if thread.name == 'jobs-inline':
+            thread.join(timeout=10)
+    assert calls == ['inline']
+    db.session.expire_all()
+    assert Job.query.filter_by(name='test_record').one().finished_at <= datetime.utcnow()
+
+
+def test_inline_mode_is_off_by_default(db):
+    assert jobs._inline['app'] is None
+    jobs.enqueue('test_record', value='queued')
+    db.session.commit()
+    assert calls == []
+
+
+def test_log_partitions_are_scheduled_daily(db):
+    assert jobs._periodic['ensure_log_partitions'] == 86400
+    jobs.schedule_periodic()
+    assert Job.query.filter_by(name='ensure_log_partitions').count() == 1
+    # SQLite بدون تقسيم: المهمة لا تفعل شيئاً وتنجح
+    jobs.work(once=True, poll_interval=0)
+    statuses = [job.status for job in Job.query.filter_by(name='ensure_log_partitions').order_by(Job.id)]
+    # التشغيل التالي بعد يوم
+    assert statuses == [jobs.DONE, jobs.QUEUED]
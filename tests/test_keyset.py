@@ -0,0 +1,97 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import make_sale_offer
+from main import decode_cursor, encode_cursor
+from models import Log, Orders, RentalOffer
+
+
+@pytest.mark.parametrize('value', [datetime(2025, 3, 1, 12, 30, 15, 123456), 80000.0, 0.5])
+def test_cursor_round_trip(value):
+    assert decode_cursor(encode_cursor(value, 42)) == (value, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', None, 'not-base64!', 'YWJj'])
+def test_invalid_cursor_is_ignored(cursor):
+    assert decode_cursor(cursor) is None
+
+
+def walk(client, url):
+    """كل الأسماء في كل الصفحات مع اتباع رابط التالي، وأسماء الصفحة قبل الأخيرة عبر رابط السابق"""
+    names, body = [], ''
+    while url:
+        body = client.get(url).get_data(as_text=True)
+        names += re.findall(r'<td>(c\d+)</td>', body)
+        found = re.search(r'href="([^"]*after=[^"]*)"', body)
+        url = found.group(1).replace('&amp;', '&') if found else None
+    back = re.search(r'href="([^"]*before=[^"]*)"', body)
+    previous = None
+    if back:
+        previous = re.findall(r'<td>(c\d+)</td>', client.get(back.group(1).replace('&amp;', '&')).get_data(as_text=True))
+    return names, previous
+
+
+@pytest.fixture
+def orders(db):
+    start = datetime(2025, 1, 1)
+    for i in range(12):
+        db.session.add(Orders(customer_name=f'c{i}', unit_type='شقة', price=str(1000 * (i % 4)) if i % 3 else '',
+                              marketer='سعد' if i % 2 else 'علي', created_at=start + timedelta(days=i)))
+    db.session.commit()
+
+
+def test_orders_newest_pages(client, orders):
+    names, previous = walk(client, '/orders?per_page=5')
+    assert names == [f'c{i}' for i in range(11, -1, -1)]
+    assert previous == ['c6', 'c5', 'c4', 'c3', 'c2']
+
+
+def test_orders_oldest_pages(client, orders):
+    names, previous = walk(client, '/orders?per_page=5&sort=oldest')
+    assert names == [f'c{i}' for i in range(12)]
+    assert previous == ['c5', 'c6', 'c7', 'c8', 'c9']
+
+
+def test_orders_price_sort_skips_unpriced_and_breaks_ties_by_id(client, orders):
+    names, _ = walk(client, '/orders?per_page=3&sort=price_asc')
+    priced = [o for o in Orders.query.all() if o.price_min is not None]
+    assert names == [o.customer_name for o in sorted(priced, key=lambda o: (o.price_min, o.id))]
+
+
+def test_orders_filters_keep_paging(client, orders):
+    names, _ = walk(client, '/orders?per_page=2&marketer=سعد&from=2025-01-03&to=2025-01-08')
+    assert names == ['c7', 'c5', 'c3']
+
+
+def test_offer_list_pages(client, db):
+    for i in range(7):
+        db.session.add(RentalOffer(unit_type='شقة', floor='1', area=100, price=1000, details='-', owner_type='مالك',
+                                   location='-', marketer='-', notes='', status='متاح', district='وسط', images=[],
+                                   created_at=datetime(2025, 1, 1) + timedelta(days=i)))
+    db.session.commit()
+    first = client.get('/rentalm_offers?per_page=3').get_data(as_text=True)
+    assert 'after=' in first and 'before=' not in first
+
+
+def test_logs_pages_use_their_own_labels(client, db):
+    Log.query.delete()
+    for i in range(5):
+        db.session.add(Log(user='admin', action=f'a{i}', timestamp=datetime(2025, 1, 1) + timedelta(hours=i)))
+    db.session.commit()
+    first = client.get('/view_logs?per_page=2').get_data(as_text=True)
+    assert 'الأقدم ←' in first and '→ الأحدث' not in first
+    after = re.search(r'href="([^"]*after=[^"]*)"', first).group(1).replace('&amp;', '&')
+    second = client.get(after).get_data(as_text=True)
+    assert '→ الأحدث' in second and 'الأقدم ←' in second
+
+
+def test_unit_type_filter_treats_wildcards_literally(client, db):
+    make_sale_offer(unit_type='شقة 50%')
+    make_sale_offer(unit_type='فيلا_دوبلكس')
+    make_sale_offer(unit_type='فيلا كبيرة')
+    body = client.get('/salesm_offers?unit_type=%25').get_data(as_text=True)
+    assert 'شقة 50%' in body and 'فيلا كبيرة' not in body
+    body = client.get('/salesm_offers?unit_type=فيلا_').get_data(as_text=True)
+    assert 'فيلا_دوبلكس' in body and 'فيلا كبيرة' not in body
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import matching
+from conftest import make_sale_offer
+from models import Orders
+
+
+def test_closeness_inside_and_outside_range():
+    values = np.array([250.0, 200.0, 300.0, 150.0, 375.0, 400.0, np.nan])
+    scores = matching.closeness(values, 200.0, 300.0, 0.25)
+    assert scores[:3].tolist() == [1.0, 1.0, 1.0]
+    assert scores[3] == 0.0 and scores[4] == 0.0
+    assert scores[5] == 0.0
+    assert scores[6] == 0.5
+    assert matching.closeness(np.array([225.0]), 200.0, 300.0, 0.25)[0] == 1.0
+    assert matching.closeness(np.array([175.0]), 200.0, 300.0, 0.25)[0] == pytest.approx(0.5)
+
+
+def test_open_ended_range():
+    scores = matching.closeness(np.array([100.0, 10_000.0]), 0.0, 500.0, 0.25)
+    assert scores.tolist() == [1.0, 0.0]
+    assert matching.closeness(np.array([10_000.0]), 500.0, np.inf, 0.25)[0] == 1.0
+
+
+def test_unit_type_similarity():
+    values = np.array(['شقه', 'شقه مفروشه', 'فيلا', ''])
+    assert matching.unit_type_similarity(values, 'شقه').tolist() == [1.0, 0.6, 0.0, 0.0]
+
+
+def test_top_k_is_sorted_descending():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+    assert matching.top_k(scores, 3).tolist() == [1, 3, 2]
+    assert matching.top_k(scores, 10).tolist() == [1, 3, 2, 4, 0]
+
+
+def test_weights_cover_known_fields_only():
+    # طلب بنوع وحدة فقط: التطابق التام يعطي 1 مهما كان السعر
+    target = matching.make_target((None, None), (None, None), 'شقة', '')
+    scores = matching.score(matching._numbers([999999, 999999]), matching._numbers([10, 10]),
+                            matching._texts(['شقة', 'فيلا']), matching._texts(['الرياض', 'الرياض']), target)
+    assert scores.tolist() == [1.0, 0.0]
+
+
+def test_location_ignores_stopwords():
+    assert matching._location_tokens('حي النرجس') == ['النرجس']
+
+
+def test_match_offers_ranks_closest_first(db):
+    exact = make_sale_offer(price=500000, area=300, unit_type='فيلا', location='حي النرجس')
+    near = make_sale_offer(price=560000, area=300, unit_type='فيلا', location='حي الملقا')
+    make_sale_offer(price=5000000, area=300, unit_type='فيلا', location='حي النرجس')
+    order = Orders(customer_name='c', unit_type='فيلا', price='450-500 ألف', area='300', location='النرجس')
+    db.session.add(order)
+    db.session.commit()
+
+    matches = matching.match_offers(order)
+    assert [m['id'] for m in matches] == [exact.id, near.id]
+    assert matches[0]['score'] == 100
+    assert matching.match_offers(order, sources={'sale': []}) == []
+
+
+def test_match_orders_filters_by_order_range(db):
+    offer = make_sale_offer(price=500000, area=300, unit_type='فيلا', location='حي النرجس')
+    wanted = Orders(customer_name='wanted', unit_type='فيلا', price='400-550 ألف', location='النرجس')
+    cheap = Orders(customer_name='cheap', unit_type='فيلا', price='100 ألف')
+    any_price = Orders(customer_name='any', unit_type='شقة')
+    db.session.add_all([wanted, cheap, any_price])
+    db.session.commit()
+
+    matches = matching.match_orders(offer)
+    assert [m['customer_name'] for m in matches] == ['wanted', 'any']
+    assert matches[0]['score'] == 100
+
+
+def test_matches_pages(db, client):
+    offer = make_sale_offer(price=500000, unit_type='فيلا')
+    order = Orders(customer_name='wanted', unit_type='فيلا', price='500 ألف')
+    db.session.add(order)
+    db.session.commit()
+
+    assert client.get(f'/orders/{order.id}/matches').status_code == 200
+    assert 'wanted' in client.get(f'/offers/sale/{offer.id}/matches').get_data(as_text=True)
+    assert client.get(f'/offers/lease/{offer.id}/matches').status_code == 404
@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import login, make_employee
+from models import Orders
+from phones import normalize_phone
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('0551234567', '+966551234567'),
+    ('551234567', '+966551234567'),
+    ('+966551234567', '+966551234567'),
+    ('00966551234567', '+966551234567'),
+    ('966551234567', '+966551234567'),
+    ('055 123 4567', '+966551234567'),
+    ('055-123-4567', '+966551234567'),
+    ('(055) 123 4567', '+966551234567'),
+    ('٠٥٥ ١٢٣ ٤٥٦٧', '+966551234567'),
+    ('جوال: 0551234567', '+966551234567'),
+    ('0551234567 0567654321', '+966551234567'),
+    ('055 123 4567 056 765 4321', '+966551234567'),
+    ('0551234567, 0567654321', '+966551234567'),
+    ('0551234567/0567654321', '+966551234567'),
+    ('0551234567 أو 0567654321', '+966551234567'),
+    ('غير متوفر / 0567654321', '+966567654321'),
+    ('+44 20 7946 0958', '+442079460958'),
+    ('+44 20 7946 0958 +966551234567', '+442079460958'),
+    ('055 123', None),
+    ('12345', None),
+    ('', None),
+    (None, None),
+])
+def test_normalize_phone(value, expected):
+    assert normalize_phone(value) == expected
+
+
+def test_order_lookup_by_any_format(app, db, client):
+    db.session.add(Orders(customer_name='فهد', unit_type='شقة', phone='0551234567 / 0567654321'))
+    db.session.add(Orders(customer_name='غيره', unit_type='شقة', phone='0500000000'))
+    db.session.commit()
+
+    response = client.get('/orders/lookup?phone=٠٥٥ ١٢٣ ٤٥٦٧')
+    assert response.status_code == 200
+    assert response.json['phone'] == '+966551234567'
+    assert [o['customer_name'] for o in response.json['orders']] == ['فهد']
+    assert client.get('/orders/lookup?phone=123').status_code == 400
+
+    make_employee('viewer')
+    other = app.test_client()
+    login(other, 'viewer')
+    assert other.get('/orders/lookup?phone=0551234567').status_code != 200
@@ -0,0 +1,39 @@
+from sqlalchemy import event
+
+import search
+from models import Orders
+
+
+def test_normalize_arabic_folds_letter_forms():
+    assert search.normalize_arabic('مؤسسة') == search.normalize_arabic('موسسه')
+    assert search.tokenize('إستراحةٌ كبيرة') == ['استراحه', 'كبيره']
+
+
+def test_search_runs_no_ddl(db, client):
+    db.session.add(Orders(customer_name='أ', unit_type='إستراحة', location='النرجس'))
+    db.session.commit()
+
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        found = Orders.query.filter(search.match_condition(Orders, 'استراحه')).all()
+        body = client.get('/orders?q=استراحه').get_data(as_text=True)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    assert [o.customer_name for o in found] == ['أ']
+    assert '<td>أ</td>' in body
+    assert [s for s in statements if s.lstrip().upper().startswith('CREATE')] == []
+
+
+def test_deleted_rows_leave_the_index(db):
+    order = Orders(customer_name='ب', unit_type='فيلا')
+    db.session.add(order)
+    db.session.commit()
+    db.session.delete(order)
+    db.session.commit()
+    assert search.ranked_ids(Orders, 'فيلا') == []
@@ -0,0 +1,145 @@
+import io
+
+import pytest
+from PIL import Image
+
+import jobs
+from models import RentalOffer, StoredObject
+
+
+def png(color='red', size=(40, 30)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+@pytest.fixture
+def storage(app):
+    from storage import MemoryStorage
+
+    storage = MemoryStorage()
+    app.extensions['storage'] = storage
+    yield storage
+    app.extensions.pop('storage', None)
+
+
+@pytest.fixture
+def offers(db):
+    offers = [
+        RentalOffer(unit_type='شقة', floor='1', area=100, price=1000, details='-', owner_type='مالك', location='-',
+                    marketer='-', notes='', status='متاح', district='وسط', images=[])
+        for _ in range(2)
+    ]
+    db.session.add_all(offers)
+    db.session.commit()
+    return offers
+
+
+def presign(client):
+    response = client.post('/uploads/presign', json={'files': [{'name': 'p.png', 'content_type': 'image/png', 'size': 10}]})
+    return response.get_json()['uploads'][0]
+
+
+def upload(client, data):
+    target = presign(client)
+    response = client.put(target['url'], data=data, content_type='image/png')
+    return target['token'], response.status_code
+
+
+def attach(client, offer, token):
+    return client.post(f'/offers/rental/{offer.id}/images', json={'tokens': [token]})
+
+
+def test_confirmed_upload_is_optimized_and_refcounted(client, db, storage, offers):
+    token, status = upload(client, png())
+    assert status == 204
+
+    response = attach(client, offers[0], token)
+    assert response.status_code == 200
+    # الطلب يرفق الرابط المؤقت فقط، والمعالجة في مهمة process_direct_uploads
+    offer = db.session.get(RentalOffer, offers[0].id, populate_existing=True)
+    staged = offer.images[0]
+    assert staged.endswith('p.png') and offer.image_variants == [None]
+
+    jobs.work(once=True, poll_interval=0)
+    offer = db.session.get(RentalOffer, offers[0].id, populate_existing=True)
+    assert len(offer.images) == 1 and set(offer.image_variants[0]) == {'thumb', 'medium'}
+    key = offer.images[0].split('/')[-1]
+    assert db.session.get(StoredObject, key).refcount == 1
+
+    # الملف المؤقت يُحذف، والصورة النهائية تبقى
+    assert [k for k in storage.objects if k.endswith('p.png')] == []
+    assert key in storage.objects
+
+
+def test_confirm_does_not_read_the_upload(client, storage, offers, monkeypatch):
+    token, _ = upload(client, png())
+
+    def fail(key):
+        raise AssertionError('request read the uploaded object')
+
+    monkeypatch.setattr(storage, 'get', fail)
+    assert attach(client, offers[0], token).status_code == 200
+
+
+def test_staged_non_image_is_removed_from_offer(client, db, storage, offers):
+    # الرفع إلى S3 لا يمر بـ direct_upload، فالمحتوى يُفحص في المهمة
+    target = presign(client)
+    storage.put(io.BytesIO(b'<?php echo 1; ?>'), target['key'], 'image/png')
+    assert attach(client, offers[0], target['token']).status_code == 200
+
+    jobs.work(once=True, poll_interval=0)
+    offer = db.session.get(RentalOffer, offers[0].id, populate_existing=True)
+    assert offer.images == [] and offer.image_variants == []
+    assert target['key'] not in storage.objects
+
+
+def test_upload_removed_before_processing_is_skipped(client, db, storage, offers):
+    token, _ = upload(client, png())
+    attach(client, offers[0], token)
+    offer = db.session.get(RentalOffer, offers[0].id, populate_existing=True)
+    client.post(f'/rentalm_offers/delete/{offer.id}')
+
+    jobs.work(once=True, poll_interval=0)
+    assert storage.objects == {}
+    assert StoredObject.query.filter(StoredObject.refcount > 0).count() == 0
+
+
+def test_upload_token_is_single_use(client, storage, offers):
+    token, _ = upload(client, png())
+    assert attach(client, offers[0], token).status_code == 200
+    response = attach(client, offers[1], token)
+    assert response.status_code == 400
+    assert response.get_json()['images'] == []
+
+
+def test_shared_image_survives_deleting_one_offer(client, db, storage, offers):
+    for offer in offers:
+        token, _ = upload(client, png('blue'))
+        assert attach(client, offer, token).status_code == 200
+    jobs.work(once=True, poll_interval=0)
+    first, second = (db.session.get(RentalOffer, o.id, populate_existing=True) for o in offers)
+    assert first.images == second.images
+    key = first.images[0].split('/')[-1]
+
+    client.post(f'/rentalm_offers/delete/{first.id}')
+    jobs.work(once=True, poll_interval=0)
+    assert key in storage.objects
+    assert db.session.get(StoredObject, key, populate_existing=True).refcount == 1
+
+
+def test_direct_upload_rejects_non_images(client, storage):
+    _, status = upload(client, b'<?php echo 1; ?>')
+    assert status == 415
+
+
+def test_direct_upload_limits_bytes_read(app, client, storage):
+    app.config['DIRECT_UPLOAD_MAX_SIZE'] = 100
+    try:
+        target = presign(client)
+        response = client.put(target['url'], input_stream=io.BytesIO(png(size=(400, 400)) + b'\0' * 200),
+                              content_type='image/png')
+    finally:
+        app.config['DIRECT_UPLOAD_MAX_SIZE'] = 20 * 1024 * 1024
+    assert response.status_code == 413
+    assert storage.objects == {}
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import event
+
+import main
+from conftest import login, make_employee
+from models import Employee
+
+
+@pytest.fixture
+def viewer(app, admin):
+    employee = make_employee('viewer', ['orders_view'])
+    client = app.test_client()
+    login(client, 'viewer')
+    assert client.get('/orders').status_code == 200
+    assert employee.id in main.user_cache._items
+    return employee, client
+
+
+def expire(employee_id):
+    user, _ = main.user_cache._items[employee_id]
+    main.user_cache._items[employee_id] = (user, 0)
+
+
+def employee_queries(db, client, url):
+    """استعلامات الموظف بمفتاحه (load_user) أثناء طلب واحد"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return [s for s in statements if 'FROM employee' in s and 'employee.id = ' in s]
+
+
+def test_cache_hit_does_not_query_employee(db, viewer):
+    employee, client = viewer
+    assert employee_queries(db, client, '/orders') == []
+    expire(employee.id)
+    db.session.expunge_all()  # الجلسة مشتركة بين طلبات الاختبار؛ في الإنتاج كل طلب يبدأ بجلسة فارغة
+    assert len(employee_queries(db, client, '/orders')) == 1
+
+
+def test_deleted_employee_is_logged_out_after_ttl(db, viewer):
+    employee, client = viewer
+    employee_id = employee.id
+    # حذف من عامل آخر: قاعدة البيانات فقط، دون إبطال ذاكرة هذا العامل
+    db.session.execute(Employee.__table__.delete().where(Employee.id == employee_id))
+    db.session.commit()
+    assert client.get('/orders').status_code == 200
+
+    expire(employee_id)
+    response = client.get('/orders')
+    assert response.status_code == 302
+    assert '/login' in response.location
+    assert employee_id not in main.user_cache._items
+
+
+def test_demoted_employee_loses_permissions_after_ttl(db, viewer):
+    employee, client = viewer
+    db.session.execute(
+        Employee.__table__.update().where(Employee.id == employee.id)
+        .values(permissions='[]', auth_version=Employee.auth_version + 1)
+    )
+    db.session.commit()
+
+    expire(employee.id)
+    response = client.get('/orders')
+    assert response.status_code == 302
+    assert response.location.endswith('/')
+
+
+def test_edit_in_same_worker_applies_immediately(app, client, db, viewer):
+    employee, viewer_client = viewer
+    client.post(f'/employees/edit/{employee.id}', data={'name': 'x', 'role': 'y', 'username': 'viewer'})
+    assert employee.id not in main.user_cache._items
+    assert viewer_client.get('/orders').status_code == 302
+
+
+def test_unchanged_employee_is_served_from_cache(db, viewer):
+    employee, client = viewer
+    cached = main.user_cache._items[employee.id][0]
+    client.get('/orders')
+    assert main.user_cache._items[employee.id][0] is cached
+
+
+def test_edit_employee_bumps_version(client, db):
+    other = make_employee('other', ['orders_view'])
+    client.post(f'/employees/edit/{other.id}', data={'name': 'x', 'role': 'y', 'username': 'other'})
+    assert db.session.get(Employee, other.id, populate_existing=True).auth_version == 1
@@ -0,0 +1,73 @@
+"""
+ذاكرة مؤقتة لكل عامل (worker) لبيانات المستخدم المسجل دخوله.
+
+Flask-Login يستدعي load_user في كل طلب، فبدلاً من استعلام Employee في كل مرة
+نحتفظ بنسخة خفيفة منفصلة عن الجلسة (CachedUser) لمدة محدودة (TTL) وبحد أقصى للعدد (LRU).
+
+الإصابة لا تكلف أي استعلام؛ Employee يُقرأ فقط عند عدم وجود النسخة أو انتهاء مدتها.
+
+الإبطال:
+- edit_employee / delete_employee يبطلان النسخة فوراً في نفس العامل.
+- في العمال الآخرين يظهر التعديل أو الحذف بعد انتهاء المدة (USER_CACHE_TTL) على الأكثر.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+
+class CachedUser(UserMixin):
+    """نسخة للقراءة فقط من Employee تكفي لـ current_user"""
+
+    def __init__(self, employee):
+        self.id = employee.id
+        self.name = employee.name
+        self.role = employee.role
+        self.username = employee.username
+        self.auth_version = employee.auth_version or 0
+        self._permissions = employee.get_permission_set()
+
+    def get_permission_set(self):
+        return self._permissions
+
+    def has_permission(self, perm):
+        return str(perm) in self._permissions
+
+
+class UserCache:
+    def __init__(self, ttl=60, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """النسخة المخزنة إذا لم تنتهِ مدتها، وإلا None"""
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            user, expires = item
+            if expires < time.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return user
+
+    def put(self, employee):
+        user = CachedUser(employee)
+        with self._lock:
+            self._items[user.id] = (user, time.monotonic() + self.ttl)
+            self._items.move_to_end(user.id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()